@@ -0,0 +1,124 @@
+"""JSON decode micro-benchmark on realistic Clash payloads.
+
+    python -m benchmarks.bench_codec
+    python -m benchmarks.bench_codec --members 50 --cards 110 -n 500
+
+For clan, river race and player bodies (generated by FakeClashData) it
+reports, per available backend: decode time, the old cache-hit path
+(copy.deepcopy of a decoded dict) and the resident size of one decoded
+copy, measured with tracemalloc. Schema rows decode through the
+utils.codec TypedDicts (msgspec only).
+"""
+import os
+import gc
+import copy
+import json
+import time
+import argparse
+import platform
+import statistics
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.fake_api import FakeClashData, FakeConfig
+from utils import codec as codec_module
+from utils.codec import JSONCodec
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+PAYLOADS = {
+    # name: (FakeClashData method, args, schema)
+    "clan": ("clan", (0,), codec_module.Clan),
+    "currentriverrace": ("currentriverrace", (0,), codec_module.RiverRace),
+    "player": ("player", (0, 0), codec_module.PlayerCards),
+}
+
+
+def available_backends():
+    out = ["json"]
+    if codec_module.orjson is not None:
+        out.append("orjson")
+    if codec_module.msgspec is not None:
+        out.append("msgspec")
+    return out
+
+
+def time_us(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return round(statistics.median(samples), 1)
+
+
+def resident_bytes(fn, copies=20):
+    """Average bytes retained per decoded object."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    keep = [fn() for _ in range(copies)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del keep
+    return int(size / copies)
+
+
+def bench_payload(raw, schema, iterations):
+    rows = {}
+    for backend in available_backends():
+        c = JSONCodec(backend)
+        rows[backend] = {
+            "decode_us": time_us(lambda: c.decode(raw), iterations),
+            "resident_bytes": resident_bytes(lambda: c.decode(raw)),
+        }
+    if codec_module.msgspec is not None:
+        c = JSONCodec("msgspec")
+        rows["msgspec+schema"] = {
+            "decode_us": time_us(lambda: c.decode(raw, schema), iterations),
+            "resident_bytes": resident_bytes(lambda: c.decode(raw, schema)),
+        }
+    # What a cache hit used to cost: deepcopy of the stored dict
+    decoded = json.loads(raw)
+    rows["deepcopy (old hit path)"] = {
+        "decode_us": time_us(lambda: copy.deepcopy(decoded), iterations),
+        "resident_bytes": resident_bytes(lambda: copy.deepcopy(decoded)),
+    }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON codec benchmark")
+    parser.add_argument("-n", "--iterations", type=int, default=300)
+    parser.add_argument("--members", type=int, default=50)
+    parser.add_argument("--cards", type=int, default=110)
+    parser.add_argument("--battles", type=int, default=25)
+    parser.add_argument("--out", default=os.path.join(RESULTS_DIR, "codec.json"))
+    args = parser.parse_args()
+
+    data = FakeClashData(FakeConfig(clans=1, members=args.members, cards=args.cards, battles=args.battles))
+    results = {}
+    for name, (method, call_args, schema) in PAYLOADS.items():
+        raw = json.dumps(getattr(data, method)(*call_args)).encode("utf-8")
+        rows = bench_payload(raw, schema, args.iterations)
+        results[name] = {"raw_bytes": len(raw), "backends": rows}
+
+        print(f"\n{name} ({len(raw) / 1024:.1f} KiB raw)")
+        print(f"  {'backend':<26}{'decode µs':>12}{'resident KiB':>15}")
+        for backend, row in rows.items():
+            print(f"  {backend:<26}{row['decode_us']:>12.1f}{row['resident_bytes'] / 1024:>15.1f}")
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump({
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "config": vars(args),
+            "payloads": results,
+        }, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
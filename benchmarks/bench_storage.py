@@ -0,0 +1,154 @@
+"""Storage footprint of a year of daily audits, before and after
+utils/storage.py.
+
+    python -m benchmarks.bench_storage
+    python -m benchmarks.bench_storage --days 365 --members 50
+
+Simulates one audit per day for a clan (FakeClashData members, drifting
+trophies / donations / war decks) and reports, for the clan_history
+document and the GridFS CSV of each audit:
+
+  - BSON bytes of the legacy layout (members array + issues strings)
+    versus the packed layout (members_packed + issue_count)
+  - CSV bytes raw, zlib and zstd (when zstandard is installed)
+  - the per-document cost of packing and unpacking, and of compressing and
+    decompressing the CSV
+
+The clan_history total is the working set a full-history scan has to page
+through; GridFS totals are disk.
+"""
+import os
+import json
+import time
+import zlib
+import random
+import logging
+import argparse
+import platform
+import statistics
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+
+import bson
+
+from benchmarks.fake_api import FakeClashData, FakeConfig
+from utils import storage
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def audit_rows(data, rng, day):
+    """One day's members_summary, shaped like Admin._run_audit_scan's."""
+    clan = data.clan(0)
+    expected = 16 if day.weekday() >= 3 else 0  # war days (Thu-Sun) vs training days
+    rows = []
+    for m in clan["memberList"]:
+        seen = day - timedelta(minutes=rng.randint(0, 60 * 24 * 6))
+        war_decks = rng.randint(0, expected) if expected else 0
+        rows.append({
+            "tag": m["tag"].lstrip("#"),
+            "name": m["name"],
+            "role": m["role"],
+            "exp_level": m["expLevel"],
+            "trophies": m["trophies"] + rng.randint(-200, 200),
+            "arena": m["arena"]["name"],
+            "clan_rank": m["clanRank"],
+            "donations": rng.randint(0, 600),
+            "donations_received": rng.randint(0, 600),
+            "war_decks": war_decks,
+            "expected_decks": expected,
+            "deck_completion_pct": round(min(1.0, war_decks / expected), 4) if expected else 0,
+            "fame": war_decks * rng.choice([100, 200, 250]),
+            "repair_points": 0,
+            "last_seen": seen.strftime(storage.API_TIME_FORMAT),
+            "last_seen_ts": seen.replace(microsecond=0),
+            "days_since_seen": (day - seen).days,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit storage benchmark")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--members", type=int, default=50)
+    parser.add_argument("--out", default=os.path.join(RESULTS_DIR, "storage.json"))
+    args = parser.parse_args()
+
+    # The real CSV builder; it only needs a logger
+    from cogs.admin import Admin
+    build_csv = lambda rows: Admin._build_audit_csv(SimpleNamespace(log=logging.getLogger("bench")), rows)
+
+    data = FakeClashData(FakeConfig(clans=1, members=args.members))
+    rng = random.Random(1)
+    start = datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+
+    totals = {"legacy_doc": 0, "packed_doc": 0, "csv_raw": 0, "csv_zlib": 0, "csv_zstd": 0}
+    timings = {"pack_us": [], "unpack_us": [], "legacy_decode_us": [], "packed_decode_us": [],
+               "compress_us": [], "decompress_us": []}
+
+    for d in range(args.days):
+        day = start + timedelta(days=d)
+        rows = audit_rows(data, rng, day)
+        issues = [f"**{m['name']}** ({m['role']}): `{m['war_decks']}/{m['expected_decks']}`"
+                  for m in rows if m["war_decks"] < m["expected_decks"]]
+        base = {"clan_tag": "CLAN0", "timestamp": day, "periodType": "warDay", "season": 100,
+                "fame": 10000, "member_count": len(rows)}
+
+        legacy = bson.encode({**base, "members": rows, "issues": issues})
+        t0 = time.perf_counter()
+        packed_members = storage.pack_members(rows)
+        timings["pack_us"].append((time.perf_counter() - t0) * 1e6)
+        packed = bson.encode({**base, "members_packed": packed_members, "issue_count": len(issues)})
+        totals["legacy_doc"] += len(legacy)
+        totals["packed_doc"] += len(packed)
+
+        # Read path: BSON decode (+ unpack for the packed layout)
+        t0 = time.perf_counter()
+        bson.decode(legacy)
+        timings["legacy_decode_us"].append((time.perf_counter() - t0) * 1e6)
+        t0 = time.perf_counter()
+        storage.members_of(bson.decode(packed))
+        timings["packed_decode_us"].append((time.perf_counter() - t0) * 1e6)
+        t0 = time.perf_counter()
+        storage.unpack_members(packed_members)
+        timings["unpack_us"].append((time.perf_counter() - t0) * 1e6)
+
+        csv_bytes = build_csv(rows)
+        totals["csv_raw"] += len(csv_bytes)
+        totals["csv_zlib"] += len(zlib.compress(csv_bytes, storage.ZLIB_LEVEL))
+        t0 = time.perf_counter()
+        payload, encoding = storage.compress(csv_bytes)
+        timings["compress_us"].append((time.perf_counter() - t0) * 1e6)
+        t0 = time.perf_counter()
+        assert storage.decompress(payload, encoding) == csv_bytes
+        timings["decompress_us"].append((time.perf_counter() - t0) * 1e6)
+        if encoding == "zstd":
+            totals["csv_zstd"] += len(payload)
+
+    medians = {k: round(statistics.median(v), 1) for k, v in timings.items()}
+    kib = lambda n: n / 1024
+
+    print(f"\n{args.days} daily audits, {args.members} members")
+    print(f"  clan_history   legacy {kib(totals['legacy_doc']):>9.1f} KiB   packed {kib(totals['packed_doc']):>9.1f} KiB"
+          f"   ({1 - totals['packed_doc'] / totals['legacy_doc']:.0%} smaller)")
+    print(f"  GridFS CSV     raw    {kib(totals['csv_raw']):>9.1f} KiB   zlib   {kib(totals['csv_zlib']):>9.1f} KiB"
+          + (f"   zstd {kib(totals['csv_zstd']):>9.1f} KiB" if totals["csv_zstd"] else "   (zstandard not installed)"))
+    print(f"  per audit      pack {medians['pack_us']} µs, unpack {medians['unpack_us']} µs, "
+          f"decode legacy {medians['legacy_decode_us']} µs vs packed+unpack {medians['packed_decode_us']} µs")
+    print(f"                 CSV compress {medians['compress_us']} µs, decompress {medians['decompress_us']} µs")
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump({
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "config": vars(args),
+            "csv_encoding": "zstd" if storage.zstandard is not None else "zlib",
+            "totals_bytes": totals,
+            "median_us": medians,
+        }, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
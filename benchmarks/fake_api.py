@@ -0,0 +1,344 @@
+"""Local stand-in for the proxy.royaleapi.dev/v1 endpoints the cogs use.
+
+Run standalone:  python -m benchmarks.fake_api --port 8765 --latency-ms 80
+Then start the bot with CR_API_BASE=http://127.0.0.1:8765/v1
+"""
+import json
+import random
+import asyncio
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from aiohttp import web
+
+CARD_NAMES = [
+    "Knight", "Archers", "Goblins", "Giant", "P.E.K.K.A", "Minions", "Balloon", "Witch",
+    "Barbarians", "Golem", "Skeletons", "Valkyrie", "Skeleton Army", "Bomber", "Musketeer",
+    "Baby Dragon", "Prince", "Wizard", "Mini P.E.K.K.A", "Spear Goblins", "Giant Skeleton",
+    "Hog Rider", "Minion Horde", "Ice Wizard", "Royal Giant", "Guards", "Princess",
+    "Dark Prince", "Three Musketeers", "Lava Hound", "Ice Spirit", "Fire Spirit", "Miner",
+    "Sparky", "Bowler", "Lumberjack", "Battle Ram", "Inferno Dragon", "Ice Golem",
+    "Mega Minion", "Dart Goblin", "Goblin Gang", "Electro Wizard", "Elite Barbarians",
+    "Hunter", "Executioner", "Bandit", "Royal Recruits", "Night Witch", "Bats",
+    "Royal Ghost", "Ram Rider", "Zappies", "Rascals", "Cannon Cart", "Mega Knight",
+    "Skeleton Barrel", "Flying Machine", "Wall Breakers", "Royal Hogs", "Goblin Giant",
+    "Fisherman", "Magic Archer", "Electro Dragon", "Firecracker", "Mighty Miner",
+    "Elixir Golem", "Battle Healer", "Skeleton King", "Archer Queen", "Golden Knight",
+    "Monk", "Skeleton Dragons", "Mother Witch", "Electro Spirit", "Electro Giant",
+    "Phoenix", "Little Prince", "Goblin Demolisher", "Cannon", "Goblin Hut", "Mortar",
+    "Inferno Tower", "Bomb Tower", "Barbarian Hut", "Tesla", "Elixir Collector",
+    "X-Bow", "Tombstone", "Furnace", "Goblin Cage", "Goblin Drill", "Fireball", "Arrows",
+    "Rage", "Rocket", "Goblin Barrel", "Freeze", "Mirror", "Lightning", "Zap", "Poison",
+    "Graveyard", "The Log", "Tornado", "Clone", "Earthquake", "Barbarian Barrel",
+    "Heal Spirit", "Giant Snowball", "Royal Delivery",
+]
+CHEST_NAMES = ["Silver Chest", "Golden Chest", "Magical Chest", "Giant Chest", "Epic Chest", "Legendary Chest", "Mega Lightning Chest"]
+ROLES = ["leader", "coLeader", "coLeader", "elder", "elder", "elder", "elder", "elder"]
+
+
+class FakeConfig:
+    def __init__(self, clans=3, members=50, cards=110, battles=25, latency_ms=50.0,
+                 jitter_ms=10.0, rate_429=0.0, seed=1):
+        self.clans = clans
+        self.members = members
+        self.cards = cards
+        self.battles = battles
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.seed = seed
+
+
+# --- Deterministic tag scheme so players map back to their clan ---
+
+def clan_tag(i):
+    return f"#CLAN{i}"
+
+def player_tag(clan_idx, member_idx):
+    return f"#C{clan_idx}M{member_idx:02d}"
+
+def parse_player_tag(tag):
+    """'#C2M07' -> (2, 7), or None for tags this server doesn't know."""
+    t = tag.lstrip("#")
+    if not t.startswith("C") or "M" not in t:
+        return None
+    c, m = t[1:].split("M", 1)
+    if not (c.isdigit() and m.isdigit()):
+        return None
+    return int(c), int(m)
+
+def parse_clan_tag(tag):
+    t = tag.lstrip("#")
+    if t.startswith("CLAN") and t[4:].isdigit():
+        return int(t[4:])
+    return None
+
+
+class FakeClashData:
+    """Generates realistic-sized payloads. Same tag -> same payload."""
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.now = datetime.now(timezone.utc)
+
+    def _rng(self, *key):
+        return random.Random(f"{self.cfg.seed}:{':'.join(map(str, key))}")
+
+    @staticmethod
+    def _iso(dt):
+        return dt.strftime("%Y%m%dT%H%M%S.000Z")
+
+    def _card(self, rng, idx):
+        name = CARD_NAMES[idx] if idx < len(CARD_NAMES) else f"Card {idx}"
+        max_level = rng.choice([14, 12, 9, 6])
+        return {
+            "name": name,
+            "id": 26000000 + idx,
+            "level": rng.randint(max(1, max_level - 5), max_level),
+            "maxLevel": max_level,
+            "count": rng.randint(0, 5000),
+            "iconUrls": {"medium": f"https://api-assets.clashroyale.com/cards/300/{idx}.png"},
+        }
+
+    def _deck(self, rng):
+        return [self._card(rng, i) for i in rng.sample(range(min(self.cfg.cards, len(CARD_NAMES))), 8)]
+
+    def member(self, c, m):
+        rng = self._rng("member", c, m)
+        seen = self.now - timedelta(minutes=rng.randint(0, 60 * 24 * 10))
+        return {
+            "tag": player_tag(c, m),
+            "name": f"Player {c}-{m}",
+            "role": ROLES[m] if m < len(ROLES) else "member",
+            "lastSeen": self._iso(seen),
+            "expLevel": rng.randint(30, 60),
+            "trophies": rng.randint(4000, 9000),
+            "arena": {"id": 54000000 + m % 20, "name": f"Arena {m % 20}"},
+            "clanRank": m + 1,
+            "previousClanRank": m + 1,
+            "donations": rng.randint(0, 600),
+            "donationsReceived": rng.randint(0, 600),
+            "clanChestPoints": 0,
+        }
+
+    def clan(self, c):
+        members = [self.member(c, m) for m in range(self.cfg.members)]
+        return {
+            "tag": clan_tag(c),
+            "name": f"Bench Clan {c}",
+            "type": "inviteOnly",
+            "description": "Synthetic clan for benchmarks " * 4,
+            "badgeId": 16000000 + c,
+            "clanScore": 60000 + c,
+            "clanWarTrophies": 3000 + c,
+            "location": {"id": 57000000, "name": "International", "isCountry": False},
+            "requiredTrophies": 5000,
+            "donationsPerWeek": sum(m["donations"] for m in members),
+            "members": len(members),
+            "memberList": members,
+        }
+
+    def participant(self, c, m, decks_used):
+        rng = self._rng("participant", c, m)
+        return {
+            "tag": player_tag(c, m),
+            "name": f"Player {c}-{m}",
+            "fame": decks_used * rng.choice([100, 150, 200, 250]),
+            "repairPoints": 0,
+            "boatAttacks": rng.randint(0, 2),
+            "decksUsed": decks_used,
+            "decksUsedToday": min(4, decks_used % 5),
+        }
+
+    def currentriverrace(self, c):
+        rng = self._rng("race", c)
+        participants = [self.participant(c, m, rng.randint(0, 16)) for m in range(self.cfg.members)]
+        clan = {"tag": clan_tag(c), "name": f"Bench Clan {c}", "fame": sum(p["fame"] for p in participants),
+                "repairPoints": 0, "participants": participants}
+        return {
+            "state": "active",
+            "periodType": "warDay",
+            "periodIndex": 5,
+            "sectionIndex": 1,
+            "startTime": self._iso(self.now - timedelta(days=2)),
+            "clan": clan,
+            "clans": [clan] + [{"tag": f"#RIVAL{i}", "name": f"Rival {i}", "fame": rng.randint(0, 10000),
+                                "participants": []} for i in range(4)],
+        }
+
+    def riverracelog(self, c, limit=10):
+        items = []
+        for week in range(limit):
+            rng = self._rng("log", c, week)
+            participants = [self.participant(c, m, rng.randint(0, 16)) for m in range(self.cfg.members)]
+            items.append({
+                "seasonId": 100 - week // 4,
+                "sectionIndex": week % 4,
+                "createdDate": self._iso(self.now - timedelta(weeks=week + 1)),
+                "standings": [{"rank": 1, "trophyChange": 20, "clan": {
+                    "tag": clan_tag(c), "name": f"Bench Clan {c}",
+                    "fame": sum(p["fame"] for p in participants), "participants": participants}}],
+            })
+        return {"items": items}
+
+    def player(self, c, m):
+        rng = self._rng("player", c, m)
+        member = self.member(c, m)
+        return {
+            "tag": member["tag"],
+            "name": member["name"],
+            "expLevel": member["expLevel"],
+            "trophies": member["trophies"],
+            "bestTrophies": member["trophies"] + rng.randint(0, 500),
+            "wins": rng.randint(500, 9000),
+            "losses": rng.randint(500, 9000),
+            "battleCount": rng.randint(2000, 20000),
+            "threeCrownWins": rng.randint(0, 2000),
+            "role": member["role"],
+            "donations": member["donations"],
+            "donationsReceived": member["donationsReceived"],
+            "clan": {"tag": clan_tag(c), "name": f"Bench Clan {c}", "badgeId": 16000000 + c},
+            "arena": member["arena"],
+            "cards": [self._card(rng, i) for i in range(self.cfg.cards)],
+            "currentDeck": self._deck(rng),
+            "currentFavouriteCard": self._card(rng, 0),
+        }
+
+    def _battle_side(self, rng, tag, name):
+        return {"tag": tag, "name": name, "startingTrophies": rng.randint(4000, 9000),
+                "trophyChange": rng.choice([-30, 30]), "crowns": rng.randint(0, 3),
+                "kingTowerHitPoints": 4824, "princessTowersHitPoints": [3052, 3052],
+                "cards": self._deck(rng), "elixirLeaked": round(rng.random() * 5, 2)}
+
+    def battlelog(self, c, m):
+        out = []
+        for b in range(self.cfg.battles):
+            rng = self._rng("battle", c, m, b)
+            team = self._battle_side(rng, player_tag(c, m), f"Player {c}-{m}")
+            opp = self._battle_side(rng, f"#OPP{c}{m}{b}", f"Opponent {b}")
+            opp["trophies"] = opp["startingTrophies"]
+            out.append({
+                "type": "PvP",
+                "battleTime": self._iso(self.now - timedelta(minutes=7 * (b + 1) + m)),
+                "isLadderTournament": False,
+                "arena": {"id": 54000015, "name": "Legendary Arena"},
+                "gameMode": {"id": 72000006, "name": "Ladder"},
+                "deckSelection": "collection",
+                "team": [team],
+                "opponent": [opp],
+            })
+        return out
+
+    def upcomingchests(self, c, m):
+        rng = self._rng("chests", c, m)
+        return {"items": [{"index": i, "name": rng.choice(CHEST_NAMES)} for i in range(9)]}
+
+
+class FakeClashAPI:
+    """aiohttp app serving FakeClashData with latency and 429 injection."""
+
+    def __init__(self, cfg=None):
+        self.cfg = cfg or FakeConfig()
+        self.data = FakeClashData(self.cfg)
+        self.hits = Counter()
+        self.throttled = 0
+        self._rng = random.Random(self.cfg.seed)
+        self._runner = None
+        self.base_url = None
+
+        self.app = web.Application()
+        self.app.add_routes([
+            web.get("/v1/clans/{tag}", self.h_clan),
+            web.get("/v1/clans/{tag}/currentriverrace", self.h_race),
+            web.get("/v1/clans/{tag}/riverracelog", self.h_racelog),
+            web.get("/v1/players/{tag}", self.h_player),
+            web.get("/v1/players/{tag}/battlelog", self.h_battlelog),
+            web.get("/v1/players/{tag}/upcomingchests", self.h_chests),
+            web.get("/__stats", self.h_stats),
+        ])
+
+    async def _respond(self, endpoint, payload_fn):
+        self.hits[endpoint] += 1
+        delay = max(0.0, self.cfg.latency_ms + self._rng.uniform(-self.cfg.jitter_ms, self.cfg.jitter_ms))
+        await asyncio.sleep(delay / 1000)
+        if self.cfg.rate_429 and self._rng.random() < self.cfg.rate_429:
+            self.throttled += 1
+            return web.json_response({"reason": "requestThrottled"}, status=429)
+        payload = payload_fn()
+        if payload is None:
+            return web.json_response({"reason": "notFound"}, status=404)
+        return web.Response(body=json.dumps(payload).encode("utf-8"), content_type="application/json")
+
+    def _clan_idx(self, request):
+        c = parse_clan_tag(request.match_info["tag"])
+        return c if c is not None and c < self.cfg.clans else None
+
+    def _player_idx(self, request):
+        parsed = parse_player_tag(request.match_info["tag"])
+        if not parsed or parsed[0] >= self.cfg.clans or parsed[1] >= self.cfg.members:
+            return None
+        return parsed
+
+    async def h_clan(self, request):
+        c = self._clan_idx(request)
+        return await self._respond("clans", lambda: None if c is None else self.data.clan(c))
+
+    async def h_race(self, request):
+        c = self._clan_idx(request)
+        return await self._respond("currentriverrace", lambda: None if c is None else self.data.currentriverrace(c))
+
+    async def h_racelog(self, request):
+        c = self._clan_idx(request)
+        limit = int(request.query.get("limit", "10"))
+        return await self._respond("riverracelog", lambda: None if c is None else self.data.riverracelog(c, limit))
+
+    async def h_player(self, request):
+        p = self._player_idx(request)
+        return await self._respond("players", lambda: None if p is None else self.data.player(*p))
+
+    async def h_battlelog(self, request):
+        p = self._player_idx(request)
+        return await self._respond("battlelog", lambda: None if p is None else self.data.battlelog(*p))
+
+    async def h_chests(self, request):
+        p = self._player_idx(request)
+        return await self._respond("upcomingchests", lambda: None if p is None else self.data.upcomingchests(*p))
+
+    async def h_stats(self, request):
+        return web.json_response({"hits": dict(self.hits), "throttled": self.throttled})
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{bound}/v1"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Clash Royale API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clans", type=int, default=3)
+    parser.add_argument("--members", type=int, default=50)
+    parser.add_argument("--cards", type=int, default=110)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    args = parser.parse_args()
+
+    cfg = FakeConfig(clans=args.clans, members=args.members, cards=args.cards, latency_ms=args.latency_ms,
+                     jitter_ms=args.jitter_ms, rate_429=args.rate_429)
+    api = FakeClashAPI(cfg)
+    web.run_app(api.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
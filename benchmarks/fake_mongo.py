@@ -0,0 +1,496 @@
+"""In-memory stand-in for the small slice of pymongo/GridFS the bot uses.
+
+Not a general Mongo emulator: it supports the filters, updates and
+results the cogs actually issue, which is enough to benchmark them without
+a database.
+"""
+import io
+import re
+import copy
+import threading
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, BulkWriteError, OperationFailure
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+class UpdateResult:
+    def __init__(self, matched, modified, upserted_id=None):
+        self.matched_count = matched
+        self.modified_count = modified
+        self.upserted_id = upserted_id
+
+class BulkWriteResult:
+    def __init__(self, matched, modified, upserted, deleted):
+        self.matched_count = matched
+        self.modified_count = modified
+        self.upserted_count = upserted
+        self.deleted_count = deleted
+
+
+class DeleteResult:
+    def __init__(self, deleted):
+        self.deleted_count = deleted
+
+
+_MISSING = object()
+
+def _get_path(doc, path):
+    cur = doc
+    for part in path.split("."):
+        if isinstance(cur, dict) and part in cur:
+            cur = cur[part]
+        else:
+            return _MISSING
+    return cur
+
+def _set_path(doc, path, value):
+    parts = path.split(".")
+    cur = doc
+    for part in parts[:-1]:
+        cur = cur.setdefault(part, {})
+    cur[parts[-1]] = value
+
+def _match_op(value, op, arg):
+    if op == "$in":
+        return value is not _MISSING and value in arg
+    if op == "$nin":
+        return value is _MISSING or value not in arg
+    if op == "$ne":
+        return value != arg
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if value is _MISSING or value is None:
+        return False
+    if op == "$gte":
+        return value >= arg
+    if op == "$gt":
+        return value > arg
+    if op == "$lte":
+        return value <= arg
+    if op == "$lt":
+        return value < arg
+    if op == "$regex":
+        return isinstance(value, str) and re.search(arg, value) is not None
+    if op == "$type":
+        names = {"int": int, "long": int, "number": (int, float), "string": str, "double": float, "objectId": ObjectId}
+        return isinstance(value, names.get(arg, ())) and not (arg == "int" and isinstance(value, bool))
+    raise NotImplementedError(f"FakeCollection: unsupported operator {op}")
+
+def matches(doc, flt):
+    for key, cond in (flt or {}).items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in cond):
+                return False
+            continue
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in cond):
+                return False
+            continue
+        value = _get_path(doc, key)
+        if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            if not all(_match_op(value, op, arg) for op, arg in cond.items()):
+                return False
+        elif value is _MISSING or (value != cond and not (isinstance(value, list) and cond in value)):
+            # A scalar matches an array field holding it, as in Mongo
+            return False
+    return True
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    out = {"_id": doc.get("_id")} if projection.get("_id", 1) else {}
+    for key, on in projection.items():
+        if key != "_id" and on:
+            value = _get_path(doc, key)
+            if value is not _MISSING:
+                _set_path(out, key, copy.deepcopy(value))
+    return out
+
+
+def _bson_key(value):
+    # null/missing sort below everything else, like BSON comparison order
+    return (0, 0) if value is None or value is _MISSING else (1, value)
+
+def _expr(doc, e):
+    """Aggregation expression subset used by utils.rollups."""
+    if isinstance(e, str) and e.startswith("$"):
+        value = _get_path(doc, e[1:])
+        return None if value is _MISSING else value
+    if isinstance(e, dict):
+        if len(e) == 1:
+            op, arg = next(iter(e.items()))
+            if op == "$literal":
+                return arg
+            if op == "$concat":
+                parts = [_expr(doc, a) for a in arg]
+                return None if any(p is None for p in parts) else "".join(parts)
+            if op == "$cond":
+                return _expr(doc, arg[1]) if _expr(doc, arg[0]) else _expr(doc, arg[2])
+            if op == "$and":
+                return all(_expr(doc, a) for a in arg)
+            if op in ("$gte", "$lte", "$gt", "$lt", "$eq", "$ne"):
+                a, b = (_bson_key(_expr(doc, x)) for x in arg)
+                return {"$gte": a >= b, "$lte": a <= b, "$gt": a > b, "$lt": a < b, "$eq": a == b, "$ne": a != b}[op]
+            if op.startswith("$"):
+                raise NotImplementedError(f"FakeCollection: unsupported expression {op}")
+        return {k: _expr(doc, v) for k, v in e.items()}
+    return e
+
+def _group(docs, spec):
+    groups = {}
+    for doc in docs:
+        key = _expr(doc, spec["_id"])
+        hkey = tuple(sorted(key.items())) if isinstance(key, dict) else key
+        groups.setdefault(hkey, (key, []))[1].append(doc)
+
+    out = []
+    for key, members in groups.values():
+        row = {"_id": key}
+        for field, acc in spec.items():
+            if field == "_id":
+                continue
+            (op, arg), = acc.items()
+            values = [_expr(d, arg) for d in members]
+            numbers = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+            present = [v for v in values if v is not None]
+            if op == "$last":
+                row[field] = values[-1]
+            elif op == "$first":
+                row[field] = values[0]
+            elif op == "$sum":
+                row[field] = sum(numbers)
+            elif op == "$avg":
+                row[field] = sum(numbers) / len(numbers) if numbers else None
+            elif op == "$max":
+                row[field] = max(present) if present else None
+            elif op == "$min":
+                row[field] = min(present) if present else None
+            else:
+                raise NotImplementedError(f"FakeCollection: unsupported accumulator {op}")
+        out.append(row)
+    return out
+
+def _project_stage(doc, spec):
+    out = {}
+    for field, e in spec.items():
+        if e == 1 or e is True:
+            value = _get_path(doc, field)
+            if value is not _MISSING:
+                out[field] = value
+        elif e != 0 and e is not False:
+            out[field] = _expr(doc, e)
+    return out
+
+
+class FakeCursor(list):
+    def sort(self, key, direction=1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for k, d in reversed(keys):
+            super().sort(key=lambda doc: (_get_path(doc, k) is _MISSING, _get_path(doc, k)), reverse=d < 0)
+        return self
+
+    def limit(self, n):
+        if n:
+            del self[n:]
+        return self
+
+    def skip(self, n):
+        del self[:n]
+        return self
+
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._docs = {}
+        self._lock = threading.Lock()
+        # Only recorded for index_information(); queries never use them
+        self._indexes = {"_id_": {"key": [("_id", 1)]}}
+
+    def _key(self, _id):
+        return repr(_id) if not isinstance(_id, (str, int, ObjectId)) else _id
+
+    def create_index(self, keys, **kwargs):
+        keys = [tuple(k) for k in keys] if isinstance(keys, list) else [(keys, 1)]
+        name = kwargs.pop("name", None) or "_".join(f"{k}_{d}" for k, d in keys)
+        self._indexes.setdefault(name, {"key": keys, **kwargs})
+        return name
+
+    def index_information(self):
+        return copy.deepcopy(self._indexes)
+
+    def drop_index(self, index_or_name):
+        name = index_or_name
+        if not isinstance(index_or_name, str):
+            name = "_".join(f"{k}_{d}" for k, d in index_or_name)
+        if name not in self._indexes:
+            raise OperationFailure(f"index not found with name [{name}]")
+        del self._indexes[name]
+
+    def _coll_mod(self, index):
+        key = list(index["keyPattern"].items())
+        info = next((i for i in self._indexes.values() if i["key"] == key), None)
+        if info is None:
+            raise OperationFailure(f"cannot find index {index['keyPattern']}")
+        if "expireAfterSeconds" in index:
+            info["expireAfterSeconds"] = index["expireAfterSeconds"]
+
+    def insert_one(self, doc):
+        with self._lock:
+            doc.setdefault("_id", ObjectId())
+            if self._key(doc["_id"]) in self._docs:
+                raise DuplicateKeyError(f"E11000 duplicate key in {self.name}: {doc['_id']!r}")
+            self._docs[self._key(doc["_id"])] = copy.deepcopy(doc)
+        return InsertOneResult(doc["_id"])
+
+    def insert_many(self, docs, ordered=True):
+        if ordered:
+            return InsertManyResult([self.insert_one(d).inserted_id for d in docs])
+        ids, errors = [], []
+        for i, d in enumerate(docs):
+            try:
+                ids.append(self.insert_one(d).inserted_id)
+            except DuplicateKeyError as e:
+                errors.append({"index": i, "code": 11000, "errmsg": str(e)})
+        if errors:
+            raise BulkWriteError({"nInserted": len(ids), "writeErrors": errors})
+        return InsertManyResult(ids)
+
+    def find(self, flt=None, projection=None):
+        with self._lock:
+            docs = list(self._docs.values())
+        return FakeCursor(_project(d, projection) for d in docs if matches(d, flt))
+
+    def _by_id(self, flt):
+        """Primary-key fast path, like Mongo's _id index."""
+        if flt and len(flt) == 1 and "_id" in flt and not isinstance(flt["_id"], dict):
+            doc = self._docs.get(self._key(flt["_id"]))
+            return [doc] if doc is not None else []
+        return None
+
+    def find_one(self, flt=None, projection=None):
+        with self._lock:
+            docs = self._by_id(flt)
+            if docs is None:
+                docs = list(self._docs.values())
+        for d in docs:
+            if matches(d, flt):
+                return _project(d, projection)
+        return None
+
+    def count_documents(self, flt):
+        return len(self.find(flt))
+
+    def distinct(self, key, flt=None):
+        seen = []
+        for d in self.find(flt):
+            v = _get_path(d, key)
+            if v is not _MISSING and v not in seen:
+                seen.append(v)
+        return seen
+
+    def aggregate(self, pipeline):
+        docs = list(self.find())
+        for stage in pipeline:
+            (op, arg), = stage.items()
+            if op == "$match":
+                docs = [d for d in docs if matches(d, arg)]
+            elif op == "$sort":
+                docs = FakeCursor(docs).sort(list(arg.items()))
+            elif op == "$group":
+                docs = _group(docs, arg)
+            elif op == "$project":
+                docs = [_project_stage(d, arg) for d in docs]
+            elif op == "$merge":
+                target = self.database[arg["into"]]
+                for d in docs:
+                    target.replace_one({"_id": d["_id"]}, d, upsert=True)
+                return FakeCursor()
+            else:
+                raise NotImplementedError(f"FakeCollection: unsupported stage {op}")
+        return FakeCursor(docs)
+
+    def _apply_update(self, doc, update):
+        for op, fields in update.items():
+            for path, value in fields.items():
+                if op == "$set" or op == "$setOnInsert":
+                    _set_path(doc, path, copy.deepcopy(value))
+                elif op == "$inc":
+                    cur = _get_path(doc, path)
+                    _set_path(doc, path, (0 if cur is _MISSING else cur) + value)
+                elif op == "$max":
+                    cur = _get_path(doc, path)
+                    if cur is _MISSING or value > cur:
+                        _set_path(doc, path, copy.deepcopy(value))
+                elif op == "$unset":
+                    parent_path, _, leaf = path.rpartition(".")
+                    parent = _get_path(doc, parent_path) if parent_path else doc
+                    if isinstance(parent, dict):
+                        parent.pop(leaf, None)
+                elif op == "$addToSet":
+                    cur = _get_path(doc, path)
+                    cur = [] if cur is _MISSING else cur
+                    if value not in cur:
+                        cur.append(copy.deepcopy(value))
+                    _set_path(doc, path, cur)
+                elif op == "$push":
+                    cur = _get_path(doc, path)
+                    cur = [] if cur is _MISSING else cur
+                    cur.append(copy.deepcopy(value))
+                    _set_path(doc, path, cur)
+                else:
+                    raise NotImplementedError(f"FakeCollection: unsupported update {op}")
+
+    def update_one(self, flt, update, upsert=False):
+        with self._lock:
+            candidates = self._by_id(flt)
+            for d in (candidates if candidates is not None else self._docs.values()):
+                if matches(d, flt):
+                    self._apply_update(d, {k: v for k, v in update.items() if k != "$setOnInsert"})
+                    return UpdateResult(1, 1)
+            if not upsert:
+                return UpdateResult(0, 0)
+            doc = {k: v for k, v in flt.items() if not k.startswith("$") and not isinstance(v, dict)}
+            self._apply_update(doc, update)
+            doc.setdefault("_id", ObjectId())
+            self._docs[self._key(doc["_id"])] = doc
+            return UpdateResult(0, 0, doc["_id"])
+
+    def find_one_and_update(self, flt, update, upsert=False, sort=None, return_document=False):
+        """return_document is pymongo's ReturnDocument (BEFORE is False)."""
+        with self._lock:
+            candidates = self._by_id(flt)
+            hits = [d for d in (candidates if candidates is not None else self._docs.values()) if matches(d, flt)]
+            if sort:
+                hits = FakeCursor(hits).sort(sort)
+            if hits:
+                doc = hits[0]
+                before = copy.deepcopy(doc)
+                self._apply_update(doc, {k: v for k, v in update.items() if k != "$setOnInsert"})
+                return copy.deepcopy(doc) if return_document else before
+            if not upsert:
+                return None
+            doc = {k: v for k, v in flt.items() if not k.startswith("$") and not isinstance(v, dict)}
+            self._apply_update(doc, update)
+            doc.setdefault("_id", ObjectId())
+            if self._key(doc["_id"]) in self._docs:
+                # The filter missed an existing _id, as with a real unique index
+                raise DuplicateKeyError(f"E11000 duplicate key in {self.name}: {doc['_id']!r}")
+            self._docs[self._key(doc["_id"])] = doc
+            return copy.deepcopy(doc) if return_document else None
+
+    def bulk_write(self, requests, ordered=True):
+        """UpdateOne/UpdateMany/DeleteOne/DeleteMany/InsertOne, read from the
+        same private attributes pymongo's bulk API uses."""
+        matched = modified = upserted = deleted = 0
+        for op in requests:
+            kind = type(op).__name__
+            if kind == "InsertOne":
+                self.insert_one(op._doc)
+            elif kind in ("UpdateOne", "UpdateMany"):
+                res = (self.update_one(op._filter, op._doc, upsert=bool(op._upsert)) if kind == "UpdateOne"
+                       else self.update_many(op._filter, op._doc))
+                matched += res.matched_count
+                modified += res.modified_count
+                upserted += res.upserted_id is not None
+            elif kind in ("DeleteOne", "DeleteMany"):
+                res = self.delete_one(op._filter) if kind == "DeleteOne" else self.delete_many(op._filter)
+                deleted += res.deleted_count
+            else:
+                raise NotImplementedError(f"FakeCollection: unsupported bulk op {kind}")
+        return BulkWriteResult(matched, modified, upserted, deleted)
+
+    def update_many(self, flt, update):
+        with self._lock:
+            hits = [d for d in self._docs.values() if matches(d, flt)]
+            for d in hits:
+                self._apply_update(d, update)
+        return UpdateResult(len(hits), len(hits))
+
+    def replace_one(self, flt, doc, upsert=False):
+        with self._lock:
+            for key, d in list(self._docs.items()):
+                if matches(d, flt):
+                    doc = copy.deepcopy(doc)
+                    doc["_id"] = d["_id"]
+                    self._docs[key] = doc
+                    return UpdateResult(1, 1)
+        if upsert:
+            res = self.insert_one(dict(doc))
+            return UpdateResult(0, 0, res.inserted_id)
+        return UpdateResult(0, 0)
+
+    def delete_one(self, flt):
+        with self._lock:
+            for key, d in list(self._docs.items()):
+                if matches(d, flt):
+                    del self._docs[key]
+                    return DeleteResult(1)
+        return DeleteResult(0)
+
+    def delete_many(self, flt):
+        with self._lock:
+            keys = [k for k, d in self._docs.items() if matches(d, flt)]
+            for k in keys:
+                del self._docs[k]
+        return DeleteResult(len(keys))
+
+    def estimated_document_count(self):
+        return len(self._docs)
+
+
+class FakeDatabase:
+    def __init__(self, name="ClashBotDB"):
+        self.name = name
+        self.client = None
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def list_collection_names(self):
+        return list(self._collections)
+
+    def command(self, name, value=None, **kwargs):
+        if name == "collMod":
+            self[value]._coll_mod(kwargs["index"])
+            return {"ok": 1.0}
+        raise OperationFailure(f"no such command: '{name}'")
+
+
+class FakeGridFS:
+    def __init__(self, database=None):
+        self._files = {}
+
+    def put(self, data, **kwargs):
+        file_id = ObjectId()
+        self._files[file_id] = (bytes(data), kwargs)
+        return file_id
+
+    def get(self, file_id):
+        data, meta = self._files[file_id]
+        out = io.BytesIO(data)
+        out.filename = meta.get("filename")
+        out.metadata = meta.get("metadata")
+        return out
+
+    def exists(self, file_id):
+        return file_id in self._files
+
+    def delete(self, file_id):
+        self._files.pop(file_id, None)
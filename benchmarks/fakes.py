@@ -0,0 +1,261 @@
+"""Discord-side fakes and bot bootstrap shared by the benchmark scripts."""
+import os
+import asyncio
+import itertools
+from discord.ext import tasks
+
+from benchmarks.fake_api import player_tag
+from benchmarks.fake_mongo import FakeDatabase, FakeGridFS
+
+_ids = itertools.count(1)
+# Every FakeChannel by id, so the bot and guilds can resolve them like Discord's cache
+_channels = {}
+
+
+def get_channel(channel_id):
+    return _channels.get(channel_id)
+
+
+async def fetch_channel(channel_id):
+    """Like Client.fetch_channel: channels not seen yet are created on demand."""
+    await asyncio.sleep(0)
+    return _channels.get(channel_id) or FakeChannel(channel_id)
+
+
+class FakeRole:
+    def __init__(self, name, position=1):
+        self.id = next(_ids)
+        self.name = name
+        self.position = position
+        self.mention = f"<@&{self.id}>"
+
+    def __repr__(self):
+        return f"<FakeRole {self.name}>"
+
+
+class FakeMember:
+    def __init__(self, discord_id, name, roles=None, guild=None):
+        self.id = discord_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{discord_id}>"
+        self.bot = False
+        self.roles = list(roles or [])
+        self.guild = guild
+        self.top_role = max(self.roles, key=lambda r: r.position) if self.roles else FakeRole("@everyone", 0)
+
+    async def add_roles(self, *roles, reason=None):
+        await asyncio.sleep(0)
+        for r in roles:
+            if r not in self.roles:
+                self.roles.append(r)
+
+    async def remove_roles(self, *roles, reason=None):
+        await asyncio.sleep(0)
+        self.roles = [r for r in self.roles if r not in roles]
+
+
+class FakeGuild:
+    def __init__(self, guild_id, role_names=("Member", "Elder", "Co-Leader", "Leader")):
+        self.id = guild_id
+        self.name = f"Guild {guild_id}"
+        self.roles = [FakeRole(n, position=i + 1) for i, n in enumerate(role_names)]
+        self.members = {}
+        self.me = FakeMember(0, "GraveyardBot", roles=[FakeRole("Bot", position=100)], guild=self)
+
+    def add_member(self, member):
+        member.guild = self
+        self.members[member.id] = member
+        return member
+
+    def get_member(self, member_id):
+        return self.members.get(member_id)
+
+    def get_role(self, role_id):
+        return next((r for r in self.roles if r.id == role_id), None)
+
+    def get_channel(self, channel_id):
+        return get_channel(channel_id)
+
+    async def fetch_channel(self, channel_id):
+        return await fetch_channel(channel_id)
+
+
+class FakeMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self, content=None, embed=None, view=None, attachments=None):
+        self.id = next(self._ids)
+        self.content = content
+        self.embed = embed
+        self.view = view
+        self.attachments = list(attachments or [])
+
+    async def edit(self, **kwargs):
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+        return self
+
+    async def delete(self, delay=None):
+        return None
+
+
+class FakeInteractionResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def _respond(self):
+        if self._done:
+            raise RuntimeError("This interaction has already been responded to before")
+        self._done = True
+        self._interaction.responded_at = asyncio.get_running_loop().time()
+
+    async def defer(self, *args, **kwargs):
+        await self._respond()
+
+    async def send_message(self, content=None, **kwargs):
+        await self._respond()
+        return FakeMessage(content=content, embed=kwargs.get("embed"), view=kwargs.get("view"))
+
+
+class FakeFollowup:
+    async def send(self, content=None, **kwargs):
+        return FakeMessage(content=content, embed=kwargs.get("embed"), view=kwargs.get("view"))
+
+
+class FakeInteraction:
+    """Slash-command interaction. Discord drops interactions that aren't
+    answered within 3 seconds, so the creation time is kept to check that."""
+
+    DEADLINE_S = 3.0
+
+    def __init__(self, user, guild=None):
+        self.id = next(_ids)
+        self.user = user
+        self.guild = guild
+        self.created_at = asyncio.get_running_loop().time()
+        self.responded_at = None
+        self.response = FakeInteractionResponse(self)
+        self.followup = FakeFollowup()
+
+    @property
+    def missed_deadline(self):
+        if self.responded_at is None:
+            return True
+        return self.responded_at - self.created_at > self.DEADLINE_S
+
+
+class FakeContext:
+    """Duck-typed commands.Context for calling command callbacks directly.
+
+    Replies are recorded (and optionally delayed to emulate Discord's
+    message latency) instead of being sent anywhere. With an interaction
+    the first reply answers it and later ones go through the followup,
+    like a hybrid command invoked as a slash command."""
+
+    def __init__(self, bot, author, guild=None, channel_id=None, send_latency_ms=0.0, interaction=None):
+        self.bot = bot
+        self.author = author
+        self.guild = guild
+        self.channel = FakeChannel(channel_id or next(_ids), self)
+        self.message = FakeMessage()
+        self.interaction = interaction
+        self.send_latency_ms = send_latency_ms
+        self.replies = []
+        self.deferred = False
+
+    async def _emit(self, content=None, **kwargs):
+        if self.send_latency_ms:
+            await asyncio.sleep(self.send_latency_ms / 1000)
+        if self.interaction is not None:
+            if self.interaction.response.is_done():
+                msg = await self.interaction.followup.send(content, **kwargs)
+            else:
+                msg = await self.interaction.response.send_message(content, **kwargs)
+        else:
+            msg = FakeMessage(content=content, embed=kwargs.get("embed"), view=kwargs.get("view"))
+        self.replies.append(msg)
+        return msg
+
+    async def reply(self, content=None, **kwargs):
+        return await self._emit(content, **kwargs)
+
+    async def send(self, content=None, **kwargs):
+        return await self._emit(content, **kwargs)
+
+    async def defer(self, *args, **kwargs):
+        self.deferred = True
+        if self.interaction is not None and not self.interaction.response.is_done():
+            await self.interaction.response.defer()
+
+
+class FakeChannel:
+    def __init__(self, channel_id, ctx=None):
+        self.id = channel_id
+        self.mention = f"<#{channel_id}>"
+        self._ctx = ctx
+        self.sent = []
+        _channels[channel_id] = self
+
+    async def send(self, content=None, **kwargs):
+        msg = FakeMessage(content=content, embed=kwargs.get("embed"), view=kwargs.get("view"))
+        self.sent.append(msg)
+        return msg
+
+
+def seed_users(db, clans, linked_per_clan):
+    """Links the first N members of every fake clan to a fake discord id.
+
+    Returns {clan_idx: [discord_id, ...]} with the clan leader first."""
+    users = db["users"]
+    linked = {}
+    for c in range(clans):
+        linked[c] = []
+        for m in range(linked_per_clan):
+            discord_id = 100000 + c * 1000 + m
+            users.update_one({"_id": str(discord_id)}, {"$set": {"player_id": player_tag(c, m).lstrip("#")}}, upsert=True)
+            linked[c].append(discord_id)
+    return linked
+
+
+def stop_background_loops(bot):
+    """Cancels every tasks.loop on the loaded cogs so they don't skew timings."""
+    for cog in bot.cogs.values():
+        for attr in dir(cog):
+            value = getattr(cog, attr, None)
+            if isinstance(value, tasks.Loop):
+                value.cancel()
+
+
+async def build_bot(api_base, db=None, fs=None, cogs=None):
+    """Imports bot.py against a fake API and DB and loads the cogs (default:
+    bot.EXTENSIONS) without logging in to Discord. Returns (bot_module, bot)."""
+    os.environ["CR_API_BASE"] = api_base
+    import bot as bot_module
+    from dashboard import create_app
+
+    db = db if db is not None else FakeDatabase()
+    fs = fs if fs is not None else FakeGridFS()
+
+    b = bot_module.bot
+    # Private discord.py hook that normally runs at login: binds the loop
+    # and creates the ready event.
+    await b._async_setup_hook()
+    await b._init_runtime(db, None, fs=fs)
+    b.api_base = api_base
+    # Not logged in, so Discord's channel cache is empty and fetches would fail
+    b.get_channel = get_channel
+    b.fetch_channel = fetch_channel
+
+    # Built but not served; benchmarks drive it through the test client
+    b.dashboard_app = create_app(b)
+
+    for ext in bot_module.EXTENSIONS if cogs is None else cogs:
+        await b.load_extension(ext)
+    stop_background_loops(b)
+    b._ready.set()
+    return bot_module, b
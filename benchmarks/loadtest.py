@@ -0,0 +1,284 @@
+"""Multi-guild load test: war-day bursts against the fake API.
+
+    python -m benchmarks.loadtest --guilds 200 --users 10 --rate 40 --duration 60
+    python -m benchmarks.loadtest --mix race=50,stats=20,log=20,audit=2,whohas=8 --slash 0.7
+
+Commands arrive open-loop (Poisson at --rate per second) from random users
+in N synthetic guilds, as prefix or slash invocations. Reports achieved
+throughput, queueing delay (arrival -> start, plus time waiting for an
+api_semaphore slot), API calls per command, interaction deadline misses
+and event-loop lag.
+"""
+import os
+import json
+import random
+import asyncio
+import argparse
+import statistics
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from benchmarks.fake_api import FakeClashAPI, FakeConfig, CARD_NAMES
+from benchmarks.fakes import FakeContext, FakeGuild, FakeMember, FakeInteraction, seed_users, build_bot
+from benchmarks.run_benchmarks import percentile, git_revision, RESULTS_DIR
+
+DEFAULT_MIX = "race=35,stats=25,log=20,audit=5,whohas=15"
+
+
+class QueuedSemaphore:
+    """Wraps the bot's api_semaphore so time spent waiting for a slot is
+    recorded as an 'api.queue' span on the command's trace."""
+
+    def __init__(self, inner, tracer):
+        self.inner = inner
+        self.tracer = tracer
+
+    async def __aenter__(self):
+        with self.tracer.span("api.queue"):
+            await self.inner.acquire()
+
+    async def __aexit__(self, *exc):
+        self.inner.release()
+
+
+class LoopLagMonitor:
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, (loop.time() - start - self.interval) * 1000))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"race", "stats", "log", "audit", "whohas"}
+    if unknown:
+        raise SystemExit(f"Unknown commands in mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.mix = parse_mix(args.mix)
+        self.records = []
+        self.lag = LoopLagMonitor()
+
+    async def setup(self):
+        a = self.args
+        cfg = FakeConfig(clans=a.guilds, members=max(a.users, 15), cards=a.cards, latency_ms=a.latency_ms,
+                         jitter_ms=a.jitter_ms, rate_429=a.rate_429)
+        self.api = FakeClashAPI(cfg)
+        base = await self.api.start()
+        self.bot_module, self.bot = await build_bot(base)
+        self.bot.tracer.slow_threshold_ms = float("inf")
+        self.bot.api_semaphore = QueuedSemaphore(self.bot.api_semaphore, self.bot.tracer)
+
+        # Guild g is clan g; user 0 is the clan leader
+        self.linked = seed_users(self.bot.db, a.guilds, a.users)
+        self.guilds = []
+        for g, ids in self.linked.items():
+            guild = FakeGuild(500000 + g)
+            for discord_id in ids:
+                guild.add_member(FakeMember(discord_id, f"user{discord_id}"))
+            self.guilds.append((guild, ids))
+
+    async def teardown(self):
+        await self.bot.http_session.close()
+        await self.api.stop()
+
+    def _invoke(self, name, ctx):
+        war = self.bot.get_cog("War")
+        link = self.bot.get_cog("Link")
+        admin = self.bot.get_cog("Admin")
+        if name == "race":
+            return war.race.callback(war, ctx)
+        if name == "stats":
+            return link.stats.callback(link, ctx)
+        if name == "log":
+            return link.log.callback(link, ctx)
+        if name == "audit":
+            return admin.audit.callback(admin, ctx)
+        return admin.whohas.callback(admin, ctx, card_name=self.rng.choice(CARD_NAMES[:40]))
+
+    async def _run_command(self, name, guild, user_id, arrival, slash):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        author = guild.get_member(user_id)
+        interaction = FakeInteraction(author, guild) if slash else None
+        if interaction is not None:
+            interaction.created_at = arrival
+        ctx = FakeContext(self.bot, author, guild=guild, interaction=interaction, send_latency_ms=self.args.send_latency_ms)
+
+        root = self.bot.tracer.start_trace(f"!{name}", guild=guild.id)
+        error = None
+        try:
+            await self._invoke(name, ctx)
+        except Exception as e:
+            error = type(e).__name__
+        finally:
+            self.bot.tracer.finish_trace(root, error=error)
+
+        fetches = [s for s in _walk(root) if s.name == "fetch_api"]
+        totals = root.totals()
+        self.records.append({
+            "command": name,
+            "slash": slash,
+            "latency_ms": (loop.time() - arrival) * 1000,
+            "start_delay_ms": (started - arrival) * 1000,
+            "api_queue_ms": totals.get("api.queue", (0, 0.0))[1],
+            "api_calls": sum(1 for s in fetches if s.tags.get("cache") != "hit"),
+            "cache_hits": sum(1 for s in fetches if s.tags.get("cache") == "hit"),
+            "error": error,
+            "deadline_missed": bool(interaction and interaction.missed_deadline),
+        })
+
+    async def run(self):
+        a = self.args
+        loop = asyncio.get_running_loop()
+        names, weights = zip(*self.mix.items())
+        pending = set()
+
+        self.lag.start()
+        t0 = loop.time()
+        next_arrival = t0
+        while next_arrival - t0 < a.duration:
+            delay = next_arrival - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = self.rng.choices(names, weights)[0]
+            guild, ids = self.rng.choice(self.guilds)
+            user_id = ids[0] if name == "audit" else self.rng.choice(ids)
+            slash = self.rng.random() < a.slash
+            task = asyncio.create_task(self._run_command(name, guild, user_id, next_arrival, slash))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            next_arrival += self.rng.expovariate(a.rate)
+
+        offered_end = loop.time()
+        if pending:
+            await asyncio.wait(pending, timeout=a.drain_timeout)
+        drained_end = loop.time()
+        await self.lag.stop()
+        return self.report(offered_end - t0, drained_end - t0, len(pending))
+
+    def report(self, offered_s, total_s, unfinished):
+        by_cmd = defaultdict(list)
+        for r in self.records:
+            by_cmd[r["command"]].append(r)
+
+        def block(rows):
+            lat = [r["latency_ms"] for r in rows]
+            queue = [r["start_delay_ms"] + r["api_queue_ms"] for r in rows]
+            return {
+                "count": len(rows),
+                "errors": sum(1 for r in rows if r["error"]),
+                "p50_ms": round(percentile(lat, 50), 1),
+                "p99_ms": round(percentile(lat, 99), 1),
+                "queue_p50_ms": round(percentile(queue, 50), 1),
+                "queue_p99_ms": round(percentile(queue, 99), 1),
+                "api_calls_per_cmd": round(statistics.fmean(r["api_calls"] for r in rows), 2) if rows else 0.0,
+                "cache_hits_per_cmd": round(statistics.fmean(r["cache_hits"] for r in rows), 2) if rows else 0.0,
+                "deadline_misses": sum(1 for r in rows if r["deadline_missed"]),
+            }
+
+        lag = self.lag.samples
+        return {
+            "offered_rate_per_s": self.args.rate,
+            "achieved_throughput_per_s": round(len(self.records) / total_s, 2) if total_s else 0.0,
+            "duration_s": round(total_s, 1),
+            "arrival_window_s": round(offered_s, 1),
+            "completed": len(self.records),
+            "unfinished": unfinished,
+            "upstream_requests": sum(self.api.hits.values()),
+            "upstream_429": self.api.throttled,
+            "loop_lag_ms": {
+                "p50": round(percentile(lag, 50), 2),
+                "p99": round(percentile(lag, 99), 2),
+                "max": round(max(lag), 2) if lag else 0.0,
+            },
+            "overall": block(self.records),
+            "commands": {name: block(rows) for name, rows in sorted(by_cmd.items())},
+        }
+
+
+def _walk(span):
+    stack = [span]
+    while stack:
+        s = stack.pop()
+        yield s
+        stack.extend(s.children)
+
+
+def print_report(r):
+    print(f"\n📈 Offered {r['offered_rate_per_s']}/s for {r['arrival_window_s']}s -> "
+          f"achieved {r['achieved_throughput_per_s']}/s ({r['completed']} done, {r['unfinished']} unfinished)")
+    print(f"   Upstream requests: {r['upstream_requests']} ({r['upstream_429']} throttled)")
+    lag = r["loop_lag_ms"]
+    print(f"   Event-loop lag: p50 {lag['p50']}ms  p99 {lag['p99']}ms  max {lag['max']}ms")
+    print(f"\n{'command':<10}{'count':>7}{'err':>5}{'p50':>9}{'p99':>9}{'q p50':>9}{'q p99':>9}{'api/cmd':>9}{'3s miss':>9}")
+    for name, b in list(r["commands"].items()) + [("ALL", r["overall"])]:
+        print(f"{name:<10}{b['count']:>7}{b['errors']:>5}{b['p50_ms']:>9.0f}{b['p99_ms']:>9.0f}"
+              f"{b['queue_p50_ms']:>9.0f}{b['queue_p99_ms']:>9.0f}{b['api_calls_per_cmd']:>9.2f}{b['deadline_misses']:>9}")
+
+
+async def amain(args):
+    lt = LoadTest(args)
+    await lt.setup()
+    try:
+        return await lt.run()
+    finally:
+        await lt.teardown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GraveyardBot multi-guild load test")
+    parser.add_argument("--guilds", type=int, default=100)
+    parser.add_argument("--users", type=int, default=10, help="linked users per guild")
+    parser.add_argument("--rate", type=float, default=20.0, help="commands per second (Poisson)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of arrivals")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--slash", type=float, default=0.5, help="fraction invoked as slash commands")
+    parser.add_argument("--send-latency-ms", type=float, default=80.0, help="simulated Discord send latency")
+    parser.add_argument("--cards", type=int, default=110)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=30.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=os.path.join(RESULTS_DIR, "loadtest.json"))
+    args = parser.parse_args()
+
+    result = asyncio.run(amain(args))
+    print_report(result)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump({"meta": {"timestamp": datetime.now(timezone.utc).isoformat(), "git": git_revision(),
+                            "config": {k: v for k, v in vars(args).items() if k != "out"}},
+                   "results": result}, f, indent=2)
+    print(f"\n💾 Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Offline benchmark suite: fake Clash API + in-memory Mongo.
+
+    python -m benchmarks.run_benchmarks                      # all scenarios
+    python -m benchmarks.run_benchmarks -s audit -s whohas -n 20
+    python -m benchmarks.run_benchmarks --baseline benchmarks/results/baseline.json
+
+Results are written as JSON (default benchmarks/results/latest.json). With
+--baseline, p50/p99 are compared and the exit code is 1 on regressions.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+import statistics
+from datetime import datetime, timezone
+
+from benchmarks.fake_api import FakeClashAPI, FakeConfig
+from benchmarks.fakes import FakeContext, FakeGuild, FakeMember, seed_users, build_bot
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(latencies_ms, wall_s, api_calls):
+    n = len(latencies_ms)
+    return {
+        "iterations": n,
+        "throughput_per_s": round(n / wall_s, 3) if wall_s else 0.0,
+        "mean_ms": round(statistics.fmean(latencies_ms), 2) if n else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "max_ms": round(max(latencies_ms), 2) if n else 0.0,
+        "api_calls_per_op": round(api_calls / n, 2) if n else 0.0,
+    }
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.api = None
+        self.bot = None
+        self.bot_module = None
+        self.linked = {}
+        self.guilds = {}
+
+    async def setup(self):
+        cfg = FakeConfig(clans=self.args.clans, members=self.args.members, cards=self.args.cards,
+                         latency_ms=self.args.latency_ms, jitter_ms=self.args.jitter_ms,
+                         rate_429=self.args.rate_429)
+        self.api = FakeClashAPI(cfg)
+        base = await self.api.start()
+        self.bot_module, self.bot = await build_bot(base)
+        self.linked = seed_users(self.bot.db, self.args.clans, self.args.linked)
+
+        # One guild per clan with every linked user as a member
+        for c, ids in self.linked.items():
+            guild = FakeGuild(9000 + c)
+            for i, discord_id in enumerate(ids):
+                guild.add_member(FakeMember(discord_id, f"user{discord_id}", roles=[guild.roles[0]] if i % 2 else []))
+            self.guilds[c] = guild
+
+    async def teardown(self):
+        await self.bot.http_session.close()
+        await self.api.stop()
+
+    def ctx_for(self, clan_idx, member_idx=0):
+        guild = self.guilds[clan_idx]
+        author = guild.get_member(self.linked[clan_idx][member_idx])
+        return FakeContext(self.bot, author, guild=guild)
+
+    # --- Scenarios: each returns an awaitable factory for iteration i ---
+
+    def scenario_audit(self, i):
+        admin = self.bot.get_cog("Admin")
+        return admin._run_audit_scan(f"CLAN{i % self.args.clans}")
+
+    def scenario_scout(self, i):
+        admin = self.bot.get_cog("Admin")
+        return admin.scout.callback(admin, self.ctx_for(i % self.args.clans), arg="clan")
+
+    def scenario_whohas(self, i):
+        admin = self.bot.get_cog("Admin")
+        return admin.whohas.callback(admin, self.ctx_for(i % self.args.clans), card_name="Hog Rider")
+
+    def scenario_rolesync(self, i):
+        admin = self.bot.get_cog("Admin")
+        return admin.rolesync.callback(admin, self.ctx_for(i % self.args.clans))
+
+    def scenario_dashboard(self, i):
+        client = self.bot.dashboard_app.test_client()
+        return asyncio.to_thread(self._http_get, client, "/")
+
+    def scenario_view_report(self, i):
+        if not hasattr(self, "_report_ids"):
+            self._report_ids = [d["_id"] for d in self.bot.db["clan_history"].find({}, {"_id": 1})]
+        client = self.bot.dashboard_app.test_client()
+        rid = self._report_ids[i % len(self._report_ids)]
+        return asyncio.to_thread(self._http_get, client, f"/report/audit/{rid}")
+
+    @staticmethod
+    def _http_get(client, path):
+        resp = client.get(path)
+        if resp.status_code != 200:
+            raise RuntimeError(f"GET {path} -> {resp.status_code}")
+        return resp
+
+    async def run_scenario(self, name):
+        factory = getattr(self, f"scenario_{name}")
+        if name == "view_report" and not self.bot.db["clan_history"].count_documents({}):
+            for c in range(self.args.clans):
+                await self.bot.get_cog("Admin")._run_audit_scan(f"CLAN{c}")
+
+        latencies = []
+        sem = asyncio.Semaphore(self.args.concurrency)
+
+        async def one(i):
+            async with sem:
+                if self.args.cache == "cold":
+                    self.bot.api_cache.clear()
+                start = time.perf_counter()
+                await factory(i)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        for i in range(self.args.warmup):
+            await factory(i)
+        calls_before = sum(self.api.hits.values())
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(self.args.iterations)))
+        wall = time.perf_counter() - wall_start
+        return summarize(latencies, wall, sum(self.api.hits.values()) - calls_before)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = json.load(f).get("results", {})
+    regressions = 0
+    print(f"\n{'scenario':<14}{'metric':<8}{'baseline':>12}{'current':>12}{'delta':>10}")
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            b, c = base.get(metric, 0), cur.get(metric, 0)
+            delta = (c - b) / b if b else 0.0
+            flag = "  ⚠️ REGRESSION" if delta > tolerance else ""
+            regressions += bool(flag)
+            print(f"{name:<14}{metric:<8}{b:>12.1f}{c:>12.1f}{delta:>+9.1%}{flag}")
+    return regressions
+
+
+SCENARIOS = ["audit", "scout", "whohas", "rolesync", "dashboard", "view_report"]
+
+
+async def amain(args):
+    bench = Bench(args)
+    await bench.setup()
+    results = {}
+    try:
+        for name in args.scenario or SCENARIOS:
+            print(f"▶ {name} ({args.iterations} iterations, concurrency {args.concurrency}, {args.cache} cache)...", flush=True)
+            results[name] = await bench.run_scenario(name)
+            r = results[name]
+            print(f"  p50 {r['p50_ms']:.1f}ms  p99 {r['p99_ms']:.1f}ms  {r['throughput_per_s']:.2f} op/s  {r['api_calls_per_op']} API calls/op")
+    finally:
+        await bench.teardown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GraveyardBot offline benchmarks")
+    parser.add_argument("-s", "--scenario", action="append", choices=SCENARIOS)
+    parser.add_argument("-n", "--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--cache", choices=["cold", "warm"], default="cold")
+    parser.add_argument("--clans", type=int, default=3)
+    parser.add_argument("--members", type=int, default=50)
+    parser.add_argument("--linked", type=int, default=20, help="linked users per clan")
+    parser.add_argument("--cards", type=int, default=110)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--out", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p50/p99 slowdown before flagging")
+    args = parser.parse_args()
+
+    results = asyncio.run(amain(args))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.out}")
+
+    if args.baseline:
+        sys.exit(1 if compare(results, args.baseline, args.tolerance) else 0)
+
+
+if __name__ == "__main__":
+    main()
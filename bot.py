@@ -1,18 +1,35 @@
 import os
+import json
+import time
+import asyncio
+import hashlib
 import logging
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 import discord
 import aiohttp
-import redis
-import threading
-import time
-import traceback
-import asyncio
-import copy
-from bson import ObjectId
-from flask import Flask, render_template_string
 from discord.ext import commands
 from dotenv import load_dotenv
 from pymongo import MongoClient
+from utils.tracing import Tracer
+from utils.codec import codec
+from utils import rollups
+from utils import leaderboard
+from utils import retention
+from utils import battles
+from utils.ttl import TTLPolicy
+from utils.shared_cache import SharedCache
+from utils.leases import LeaseManager
+from utils.jobs import AuditJobQueue
+from utils.identity import IdentityResolver
+from utils.activity import ActivityTracker
+from utils.cache_store import CacheSnapshotStore
+from utils.http import build_session, CircuitBreaker
+
+# Heavy / optional modules (flask, gridfs, redis) are imported on first use,
+# see ClashBot._start_dashboard(), ClashBot.fs and _connect_redis().
 
 load_dotenv()
 
@@ -25,383 +42,476 @@ DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 CR_TOKEN = os.getenv("CR_TOKEN")
 MONGO_URL = os.getenv("MONGO_URL")
 REDIS_URL = os.getenv("REDIS_URL")
+# Overridable so benchmarks / local runs can point at a fake API
+API_BASE = os.getenv("CR_API_BASE", "https://proxy.royaleapi.dev/v1")
 # Replace with your actual Render URL
-PUBLIC_URL = "https://graveyardbot.onrender.com" 
-
-if not DISCORD_TOKEN:
-    raise RuntimeError("DISCORD_TOKEN is missing")
-
-# --- DATABASE ---
-mongo = MongoClient(MONGO_URL)
-db = mongo["ClashBotDB"]
-users_collection = db["users"]
-clan_history = db["clan_history"]
-scout_history = db["scout_history"] # New collection for scout reports
-
-# --- REDIS (OPTIONAL) ---
-redis_client = None
-if REDIS_URL:
+PUBLIC_URL = "https://graveyardbot.onrender.com"
+# Set to 1 to push the slash command tree even if it hasn't changed
+FORCE_TREE_SYNC = os.getenv("FORCE_TREE_SYNC", "0") == "1"
+# api_cache persistence (Redis when available, else this file) and warm-up
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH", "api_cache.snapshot")
+CACHE_SNAPSHOT_INTERVAL = int(os.getenv("CACHE_SNAPSHOT_INTERVAL", "300"))
+CACHE_SNAPSHOT_SIZE = int(os.getenv("CACHE_SNAPSHOT_SIZE", "500"))
+PREFETCH_MAX_PLAYERS = int(os.getenv("PREFETCH_MAX_PLAYERS", "200"))
+# Expired entries are kept this long to serve while the API is degraded
+STALE_GRACE = int(os.getenv("API_STALE_GRACE", "3600"))
+
+# Cluster mode (see cluster.py): which shards this process runs. Cluster 0
+# is the primary and owns the global background loops.
+CLUSTER_ID = int(os.getenv("CLUSTER_ID", "0"))
+SHARD_IDS = [int(s) for s in os.getenv("SHARD_IDS", "").split(",") if s.strip()] or None
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+# "thread" serves the dashboard from this process, "off" leaves it to dashboard.py
+DASHBOARD_MODE = os.getenv("DASHBOARD_MODE", "thread")
+# Share api_cache entries between processes through Redis
+SHARED_CACHE = os.getenv("SHARED_CACHE", "1") == "1"
+
+EXTENSIONS = ["cogs.link", "cogs.admin", "cogs.war", "cogs.reminders", "cogs.diagnostics", "cogs.prefetch", "cogs.maintenance", "cogs.battles"]
+
+# --- DATABASE / REDIS ---
+def _connect_mongo():
+    # mongodb+srv:// URLs resolve DNS in the constructor, so this runs off the loop
+    mongo = MongoClient(MONGO_URL)
+    return mongo["ClashBotDB"]
+
+def _connect_redis():
+    if not REDIS_URL:
+        return None
     try:
-        redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+        import redis
+        client = redis.from_url(REDIS_URL, decode_responses=True)
+        client.ping()
         log.info("✅ Redis connected")
+        return client
     except Exception as e:
         log.error(f"❌ Redis failed: {e}")
-
-# --- FLASK DASHBOARD ---
-app = Flask(__name__)
-
-# --- TEMPLATES ---
-DASHBOARD_TEMPLATE = """
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Graveyard Bot Dashboard</title>
-    <style>
-        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #f0f2f5; padding: 20px; color: #333; }
-        h1 { text-align: center; color: #444; margin-bottom: 30px; }
-        .container { max-width: 1000px; margin: 0 auto; background: white; padding: 20px; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.1); }
-        table { border-collapse: collapse; width: 100%; margin-top: 20px; }
-        th, td { padding: 15px; text-align: left; border-bottom: 1px solid #eee; }
-        th { background-color: #4CAF50; color: white; font-weight: 600; text-transform: uppercase; font-size: 0.9em; }
-        tr:hover { background-color: #f8f9fa; }
-        .tag { font-family: monospace; color: #666; background: #eee; padding: 2px 6px; border-radius: 4px; }
-        .trophy { color: #d32f2f; font-weight: bold; }
-        .rank { font-weight: 500; color: #2c3e50; }
-        .empty { text-align: center; color: #999; padding: 40px; }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>🏆 Graveyard Bot Dashboard</h1>
-        {% if users %}
-        <table>
-            <thead>
-                <tr>
-                    <th>Discord User</th>
-                    <th>Player Tag</th>
-                    <th>Rank / Arena</th>
-                    <th>Trophies</th>
-                </tr>
-            </thead>
-            <tbody>
-                {% for user in users %}
-                <tr>
-                    <td><b>{{ user.discord_name }}</b></td>
-                    <td><span class="tag">{{ user.player_tag }}</span></td>
-                    <td class="rank">{{ user.rank }}</td>
-                    <td class="trophy">🏆 {{ user.trophies }}</td>
-                </tr>
-                {% endfor %}
-            </tbody>
-        </table>
-        {% else %}
-        <div class="empty">No linked users found. Use <code>!link</code> in Discord!</div>
-        {% endif %}
-    </div>
-</body>
-</html>
-"""
-
-REPORT_TEMPLATE = """
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Graveyard Bot Report</title>
-    <style>
-        body { font-family: 'Segoe UI', sans-serif; background-color: #e9ecef; padding: 20px; }
-        .container { max-width: 1100px; margin: 0 auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
-        .header { background: #343a40; color: white; padding: 20px; display: flex; justify-content: space-between; align-items: center; }
-        .header h1 { margin: 0; font-size: 1.5em; }
-        .meta { font-size: 0.9em; color: #adb5bd; }
-        
-        table { width: 100%; border-collapse: collapse; }
-        th { background: #f8f9fa; color: #495057; font-weight: 600; text-align: left; padding: 12px 15px; border-bottom: 2px solid #dee2e6; }
-        td { padding: 12px 15px; border-bottom: 1px solid #dee2e6; vertical-align: middle; }
-        
-        /* Expandable Rows */
-        .main-row { cursor: pointer; transition: background 0.2s; }
-        .main-row:hover { background-color: #f1f3f5; }
-        .detail-row { background-color: #fafafa; display: none; }
-        .detail-content { padding: 20px; border-left: 4px solid #4CAF50; margin: 10px 0; }
-        
-        .grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(200px, 1fr)); gap: 15px; }
-        .stat-box { background: white; padding: 10px; border: 1px solid #eee; border-radius: 4px; }
-        .stat-label { font-size: 0.8em; color: #888; text-transform: uppercase; margin-bottom: 4px; }
-        .stat-value { font-weight: bold; color: #333; }
-        
-        .tag { font-family: monospace; background: #e2e6ea; padding: 2px 6px; border-radius: 4px; font-size: 0.9em; }
-        .warn { color: #dc3545; font-weight: bold; }
-        .good { color: #28a745; font-weight: bold; }
-        
-        .toggle-icon { display: inline-block; width: 20px; text-align: center; transition: transform 0.2s; }
-        .expanded .toggle-icon { transform: rotate(90deg); }
-    </style>
-    <script>
-        function toggleRow(id) {
-            var detailRow = document.getElementById('detail-' + id);
-            var mainRow = document.getElementById('main-' + id);
-            if (detailRow.style.display === 'table-row') {
-                detailRow.style.display = 'none';
-                mainRow.classList.remove('expanded');
-            } else {
-                detailRow.style.display = 'table-row';
-                mainRow.classList.add('expanded');
-            }
-        }
-    </script>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <div>
-                <h1>{{ title }}</h1>
-                <div class="meta">ID: {{ report_id }} • {{ timestamp }}</div>
-            </div>
-            <a href="/" style="color:white; text-decoration:none; border:1px solid white; padding:5px 10px; border-radius:4px;">Back to Dashboard</a>
-        </div>
-
-        <table>
-            <thead>
-                <tr>
-                    <th style="width: 30px;"></th>
-                    {% for col in columns %}
-                    <th>{{ col }}</th>
-                    {% endfor %}
-                </tr>
-            </thead>
-            <tbody>
-                {% for row in data %}
-                <tr id="main-{{ loop.index }}" class="main-row" onclick="toggleRow('{{ loop.index }}')">
-                    <td><span class="toggle-icon">▶</span></td>
-                    {% for cell in row.summary %}
-                    <td>{{ cell|safe }}</td>
-                    {% endfor %}
-                </tr>
-                <tr id="detail-{{ loop.index }}" class="detail-row">
-                    <td colspan="{{ columns|length + 1 }}">
-                        <div class="detail-content">
-                            <div class="grid">
-                                {% for key, val in row.details.items() %}
-                                <div class="stat-box">
-                                    <div class="stat-label">{{ key }}</div>
-                                    <div class="stat-value">{{ val }}</div>
-                                </div>
-                                {% endfor %}
-                            </div>
-                        </div>
-                    </td>
-                </tr>
-                {% endfor %}
-            </tbody>
-        </table>
-    </div>
-</body>
-</html>
-"""
-
-# --- ROUTES ---
-
-@app.route("/")
-def home():
-    if not bot or not bot.is_ready():
-        return "<h1>Bot is starting...</h1><p>Please wait a moment for the data to load.</p>", 503
-
-    try:
-        db_users = list(users_collection.find())
-        dashboard_data = []
-
-        for user in db_users:
-            try:
-                discord_id = int(user["_id"])
-                player_tag = user.get("player_id", "")
-                clean_tag = player_tag.replace("#", "")
-
-                discord_obj = bot.get_user(discord_id)
-                discord_name = discord_obj.name if discord_obj else f"Unknown ({discord_id})"
-
-                trophies = "N/A"
-                rank = "N/A"
-
-                if clean_tag:
-                    url = f"https://proxy.royaleapi.dev/v1/players/%23{clean_tag}"
-                    try:
-                        future = asyncio.run_coroutine_threadsafe(bot.fetch_api(url), bot.loop)
-                        clash_data = future.result(timeout=5)
-                        if clash_data:
-                            trophies = clash_data.get("trophies", 0)
-                            rank = clash_data.get("arena", {}).get("name", "Unknown")
-                    except Exception:
-                        pass
-
-                dashboard_data.append({
-                    "discord_name": discord_name,
-                    "player_tag": player_tag,
-                    "rank": rank,
-                    "trophies": trophies
-                })
-            except Exception:
-                continue
-
-        dashboard_data.sort(key=lambda x: x["trophies"] if isinstance(x["trophies"], int) else -1, reverse=True)
-        return render_template_string(DASHBOARD_TEMPLATE, users=dashboard_data)
-
-    except Exception:
-        log.exception("Dashboard: Critical error in home route")
-        return "<h1>Internal Server Error</h1>", 500
-
-@app.route("/report/<rtype>/<rid>")
-def view_report(rtype, rid):
-    try:
-        if rtype == "audit":
-            doc = clan_history.find_one({"_id": ObjectId(rid)})
-            if not doc: return "Report not found", 404
-            
-            title = f"🛡️ Audit Log: {doc.get('clan_tag')}"
-            columns = ["Name", "Role", "War Decks", "Status"]
-            data = []
-            
-            for m in doc.get("members", []):
-                used = m.get('war_decks', 0)
-                expected = m.get('expected_decks', 0)
-                
-                # Logic for status color
-                if expected > 0 and used < expected:
-                    status = f"<span class='warn'>Missed ({used}/{expected})</span>"
-                else:
-                    status = "<span class='good'>OK</span>"
-
-                data.append({
-                    "summary": [
-                        m.get('name', 'Unknown'), 
-                        m.get('role', 'Member').capitalize(),
-                        f"{used} / {expected}",
-                        status
-                    ],
-                    "details": {
-                        "Tag": f"#{m.get('tag')}",
-                        "Trophies": m.get('trophies', 0),
-                        "Arena": m.get('arena', 'Unknown'),
-                        "Donations Sent": m.get('donations', 0),
-                        "Donations Received": m.get('donations_received', 0),
-                        "Fame Earned": m.get('fame', 0),
-                        "Last Seen": m.get('last_seen', 'Unknown').replace('T', ' ')[:16],
-                        "Days Inactive": m.get('days_since_seen', 'N/A')
-                    }
-                })
-            
-            return render_template_string(REPORT_TEMPLATE, title=title, report_id=rid, timestamp=doc.get('timestamp'), columns=columns, data=data)
-
-        elif rtype == "scout":
-            doc = scout_history.find_one({"_id": ObjectId(rid)})
-            if not doc: return "Report not found", 404
-            
-            title = f"⚔️ Scout Report: {doc.get('clan_tag')}"
-            columns = ["Opponent", "Trophies", "Deck Archetype"]
-            data = []
-            
-            for battle in doc.get("battles", []):
-                cards = battle.get("cards", [])
-                # Simple archetype guess based on first 3 cards
-                archetype = ", ".join(cards[:3]) + "..." if cards else "Unknown"
-                
-                data.append({
-                    "summary": [
-                        battle.get('opponent', 'Unknown'),
-                        f"🏆 {battle.get('trophies', 0)}",
-                        archetype
-                    ],
-                    "details": {
-                        "Full Deck": ", ".join(cards),
-                        "Result": "Analyzed from Recent Battles"
-                    }
-                })
-                
-            return render_template_string(REPORT_TEMPLATE, title=title, report_id=rid, timestamp=doc.get('timestamp'), columns=columns, data=data)
-
-    except Exception:
-        log.exception("Error rendering report")
-        return "Internal Server Error", 500
-
-def run_flask():
-    port = int(os.getenv("PORT", 10000))
-    try:
-        app.run(host="0.0.0.0", port=port)
-    except OSError:
-        app.run(host="0.0.0.0", port=5001)
-
-threading.Thread(target=run_flask, daemon=True).start()
+        return None
 
 # --- DISCORD BOT ---
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
+class TracedContext(commands.Context):
+    """Context whose Discord sends show up as spans in the command trace."""
+
+    async def send(self, *args, **kwargs):
+        with self.bot.tracer.span("discord.send"):
+            return await super().send(*args, **kwargs)
+
+    async def defer(self, *args, **kwargs):
+        with self.bot.tracer.span("discord.defer"):
+            return await super().defer(*args, **kwargs)
+
 class ClashBot(commands.AutoShardedBot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tracer = Tracer(slow_threshold_ms=float(os.getenv("SLOW_COMMAND_MS", "2000")))
+        self.before_invoke(self._start_command_trace)
+        self.after_invoke(self._finish_command_trace)
+        self.startup_timings = {}
+        self.dashboard_app = None
+        self.cluster_id = CLUSTER_ID
+        # True when only the runtime (DB, cache, API) is up, no gateway
+        self.standalone = False
+        self._fs = None
+        self._background_tasks = []
+
+    @property
+    def is_primary(self):
+        """Whether this process runs the once-per-deployment work."""
+        return self.cluster_id == 0
+
+    def owns_guild(self, guild_id):
+        """Whether guild_id lives on one of this process's shards."""
+        if not self.shard_ids or not self.shard_count:
+            return True
+        return (int(guild_id) >> 22) % self.shard_count in self.shard_ids
+
+    async def get_context(self, origin, *, cls=TracedContext):
+        return await super().get_context(origin, cls=cls)
+
+    async def _start_command_trace(self, ctx):
+        ctx.trace = self.tracer.start_trace(
+            f"!{ctx.command.qualified_name}",
+            guild=getattr(ctx.guild, "id", None),
+            user=ctx.author.id,
+        )
+
+    async def _finish_command_trace(self, ctx):
+        error = "failed" if getattr(ctx, "command_failed", False) else None
+        self.tracer.finish_trace(getattr(ctx, "trace", None), error=error)
+
+    @contextmanager
+    def _timed(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_timings[phase] = (time.perf_counter() - start) * 1000
+
     async def setup_hook(self):
+        loop = asyncio.get_running_loop()
+        boot = time.perf_counter()
+
+        async def timed_executor(phase, fn):
+            with self._timed(phase):
+                return await loop.run_in_executor(None, fn)
+
+        database, redis_conn = await asyncio.gather(
+            timed_executor("mongo.connect", _connect_mongo),
+            timed_executor("redis.connect", _connect_redis),
+        )
+        with self._timed("runtime.init"):
+            await self._init_runtime(database, redis_conn)
+        with self._timed("cache.restore"):
+            await self._restore_api_cache()
+
+        # Warm the cache while the gateway connects, and keep a snapshot fresh
+        if self.is_primary:
+            self._background_tasks += [
+                asyncio.create_task(self._prefetch_active_clans()),
+                asyncio.create_task(self._cache_snapshot_loop()),
+            ]
+
+        # Extensions and the dashboard don't depend on each other
+        with self._timed("extensions+dashboard"):
+            await asyncio.gather(
+                *(self._load_extension_timed(ext) for ext in EXTENSIONS),
+                self._start_dashboard() if DASHBOARD_MODE == "thread" else asyncio.sleep(0),
+            )
+
+        if self.is_primary:
+            with self._timed("tree.sync"):
+                await self._sync_command_tree()
+
+        self.startup_timings["total"] = (time.perf_counter() - boot) * 1000
+        breakdown = "\n".join(f"  {phase:<28}{ms:8.1f}ms" for phase, ms in self.startup_timings.items())
+        log.info(f"⏱️ Startup breakdown:\n{breakdown}")
+
+    async def _load_extension_timed(self, ext):
+        with self._timed(f"ext.{ext}"):
+            try:
+                await self.load_extension(ext)
+                log.info(f"✅ Loaded extension: {ext}")
+            except Exception as e:
+                log.error(f"❌ Failed to load extension {ext}: {e}")
+
+    async def _start_dashboard(self):
+        def blocking_start():
+            from dashboard import start_dashboard
+            return start_dashboard(self)
+        with self._timed("dashboard.start"):
+            try:
+                self.dashboard_app = await asyncio.get_running_loop().run_in_executor(None, blocking_start)
+            except Exception:
+                log.exception("❌ Failed to start dashboard")
+
+    async def _init_runtime(self, database, redis_conn, fs=None):
+        """Everything the cogs rely on, minus Discord. Benchmarks call this
+        directly with an in-memory database."""
         headers = {"Accept": "application/json"}
         if CR_TOKEN:
             headers["Authorization"] = f"Bearer {CR_TOKEN}"
-        self.http_session = aiohttp.ClientSession(headers=headers)
+        self.http_session = build_session(headers)
+        self.api_breaker = CircuitBreaker(
+            threshold=int(os.getenv("API_BREAKER_THRESHOLD", "5")),
+            reset_after=float(os.getenv("API_BREAKER_RESET", "30")),
+        )
+
+        self.mongo = database.client
+        self.db = database
+        self.db_users = database["users"]
+        self._fs = fs
+        self.redis = redis_conn
 
-        self.mongo = mongo
-        self.db = db
-        self.db_users = users_collection
-        self.redis = redis_client
-        
         # Helper to get the public URL for commands
-        self.public_url = PUBLIC_URL 
+        self.public_url = PUBLIC_URL
+        self.api_base = API_BASE
 
         self.api_cache = {}
+        self.api_cache_hits = Counter()
+        self.ttl_policy = TTLPolicy()
+        self.shared_cache = SharedCache(redis_conn) if redis_conn and SHARED_CACHE else None
+        # Scheduled jobs run under these so each runs once per period across replicas
+        self.leases = LeaseManager(database)
+        self.cache_store = CacheSnapshotStore(redis_conn, path=CACHE_SNAPSHOT_PATH, max_entries=CACHE_SNAPSHOT_SIZE)
         self.api_semaphore = asyncio.Semaphore(int(os.getenv("API_CONCURRENCY", "6")))
+        # Clan tags (no #) worth keeping warm; see cogs/prefetch.py
+        self.active_clans = set()
+        # discord id -> player / clan / role, shared by every cog
+        self.identity = IdentityResolver(self)
+        # Hour-of-week activity per clan, fed by every fresh clan fetch
+        self.activity_tracker = ActivityTracker(database)
 
         await self._ensure_db_indexes()
 
-        extensions = ["cogs.link", "cogs.admin", "cogs.war", "cogs.reminders"]
-        for ext in extensions:
-            try:
-                await self.load_extension(ext)
-                log.info(f"✅ Loaded extension: {ext}")
-            except Exception as e:
-                log.error(f"❌ Failed to load extension {ext}: {e}")
-        await self.tree.sync()
+    @property
+    def fs(self):
+        """GridFS bucket, created (and gridfs imported) on first use."""
+        if self._fs is None:
+            import gridfs
+            self._fs = gridfs.GridFS(self.db)
+        return self._fs
 
     async def _ensure_db_indexes(self):
-        # Basic indexing
-        pass # (Existing indexing logic is fine, kept brief for this block)
+        loop = asyncio.get_running_loop()
+        builders = {
+            "rollups": lambda: rollups.ensure_indexes(self.db),
+            "audit_jobs": AuditJobQueue(self.db).ensure_indexes,
+            "leaderboard": lambda: leaderboard.ensure_indexes(self.db),
+            "battles": lambda: battles.ensure_indexes(self.db),
+            "retention": lambda: retention.ensure_indexes(self.db),
+        }
+        # Each on its own, so one failure doesn't skip the rest
+        for name, build in builders.items():
+            try:
+                await loop.run_in_executor(None, build)
+            except Exception:
+                log.exception(f"❌ Failed to ensure {name} indexes")
 
-    async def fetch_api(self, url, ttl=300):
-        now = time.time()
-        cached = self.api_cache.get(url)
-        if cached and cached[0] > now:
-            return copy.deepcopy(cached[1])
+    def _command_tree_hash(self):
+        payload = []
+        for cmd in sorted(self.tree.get_commands(), key=lambda c: c.name):
+            try:
+                payload.append(cmd.to_dict(self.tree))
+            except TypeError:
+                # discord.py < 2.4 takes no tree argument
+                payload.append(cmd.to_dict())
+        blob = json.dumps({"app": self.application_id, "commands": payload}, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    async def _sync_command_tree(self):
+        """Syncs slash commands only when the tree differs from the last sync."""
+        digest = self._command_tree_hash()
+        meta = self.db["bot_meta"]
+        loop = asyncio.get_running_loop()
+
+        def blocking_get():
+            return meta.find_one({"_id": "command_tree"})
+        try:
+            stored = await loop.run_in_executor(None, blocking_get)
+        except Exception:
+            log.exception("Could not read stored command tree hash")
+            stored = None
+
+        if stored and stored.get("hash") == digest and not FORCE_TREE_SYNC:
+            log.info("🌳 Command tree unchanged, skipping sync")
+            return False
+
+        await self.tree.sync()
+        log.info("🌳 Command tree synced")
+
+        def blocking_save():
+            return meta.update_one(
+                {"_id": "command_tree"},
+                {"$set": {"hash": digest, "synced_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+        try:
+            await loop.run_in_executor(None, blocking_save)
+        except Exception:
+            log.exception("Could not store command tree hash")
+        return True
+
+    @property
+    def api_degraded(self):
+        return self.api_breaker.degraded
+
+    def api_status_note(self):
+        """Suffix for replies while the circuit breaker is not closed."""
+        if not self.api_degraded:
+            return ""
+        return "\n⚠️ *Clash API degraded — showing cached data where available.*"
+
+    @staticmethod
+    def _shared_cache_written(fut):
+        """Done callback for the fire-and-forget shared cache writes."""
+        if not fut.cancelled() and fut.exception():
+            log.warning(f"Shared cache write failed: {fut.exception()!r}")
+
+    async def fetch_api(self, url, ttl=None, schema=None, force=False):
+        """GET + cache. The cache holds the raw response body; every caller
+        gets its own freshly decoded copy. `schema` (see utils.codec) limits
+        decoding to the fields the caller reads when msgspec is installed.
+        `ttl` defaults to the endpoint's adaptive TTL (utils.ttl).
+        `force` skips a fresh cache entry (background refreshes)."""
+        with self.tracer.span("fetch_api", path=url.split("/v1", 1)[-1]) as span:
+            now = time.time()
+            cached = self.api_cache.get(url)
+            if cached and cached[0] > now and not force:
+                if span: span.tags["cache"] = "hit"
+                self.api_cache_hits[url] += 1
+                self.ttl_policy.record(url, "hit")
+                return codec.decode(cached[1], schema)
+
+            # Another process may have fetched it already
+            if self.shared_cache and not force:
+                shared = await asyncio.get_running_loop().run_in_executor(None, self.shared_cache.get, url)
+                if shared:
+                    if span: span.tags["cache"] = "shared"
+                    self.api_cache[url] = shared
+                    self.api_cache_hits[url] += 1
+                    self.ttl_policy.record(url, "hit")
+                    return codec.decode(shared[1], schema)
+
+            def stale():
+                if span: span.tags["cache"] = "stale" if cached else "miss"
+                if not force:
+                    self.ttl_policy.record(url, "stale" if cached else "miss")
+                return codec.decode(cached[1], schema) if cached else None
+
+            # Fail fast to whatever we have while upstream is struggling
+            if not self.api_breaker.allow():
+                if span: span.tags["breaker"] = self.api_breaker.state
+                return stale()
 
-        async with self.api_semaphore:
             try:
-                async with self.http_session.get(url) as resp:
-                    if resp.status != 200: return None
-                    data = await resp.json()
-                    self.api_cache[url] = (now + ttl, copy.deepcopy(data))
-                    return copy.deepcopy(data)
+                async with self.api_semaphore:
+                    try:
+                        async with self.http_session.get(url) as resp:
+                            if span: span.tags["status"] = resp.status
+                            if resp.status == 429 or resp.status >= 500:
+                                self.api_breaker.record_failure(f"HTTP {resp.status}")
+                                return stale()
+                            # 404 and friends are answers, not outages
+                            self.api_breaker.record_success()
+                            if not force:
+                                self.ttl_policy.record(url, "miss")
+                            if resp.status != 200: return None
+                            raw = await resp.read()
+                            data = codec.decode(raw, schema)
+                            self.ttl_policy.observe(url, None if cached is None else cached[1] != raw, data)
+                            if ttl is None:
+                                ttl = self.ttl_policy.ttl_for(url)
+                            if span: span.tags["ttl"] = ttl
+                            self.api_cache[url] = (now + ttl, raw)
+                            if self.shared_cache:
+                                fut = asyncio.get_running_loop().run_in_executor(None, self.shared_cache.set, url, now + ttl, raw)
+                                fut.add_done_callback(self._shared_cache_written)
+                            self.activity_tracker.observe_url(url, data)
+                            return data
+                    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                        self.api_breaker.record_failure(type(e).__name__)
+                        return stale()
+                    except Exception as e:
+                        # e.g. an HTML error page instead of JSON
+                        self.api_breaker.record_failure(type(e).__name__)
+                        return stale()
+            except BaseException:
+                # Cancelled mid-call: a half-open probe must not stay in flight
+                self.api_breaker.release_probe()
+                raise
+
+    # --------------------
+    # Cache persistence / warm-up
+    # --------------------
+    async def _restore_api_cache(self):
+        loop = asyncio.get_running_loop()
+        try:
+            entries = await loop.run_in_executor(None, self.cache_store.load)
+        except Exception:
+            log.exception("❌ Failed to restore API cache snapshot")
+            return
+        for url, expires_at, raw in entries:
+            self.api_cache[url] = (expires_at, raw)
+        if entries:
+            log.info(f"♨️ Restored {len(entries)} API cache entries")
+
+    async def save_api_cache(self):
+        now = time.time()
+        # Drop long-expired entries so the cache doesn't grow forever
+        for url in [u for u, entry in self.api_cache.items() if entry[0] + STALE_GRACE <= now]:
+            del self.api_cache[url]
+            self.api_cache_hits.pop(url, None)
+        entries = self.cache_store.pick_hottest(self.api_cache, self.api_cache_hits, now)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.cache_store.save, entries, now)
+
+    async def _cache_snapshot_loop(self):
+        while True:
+            await asyncio.sleep(CACHE_SNAPSHOT_INTERVAL)
+            try:
+                await self.save_api_cache()
             except Exception:
-                return None
+                log.exception("❌ API cache snapshot failed")
+
+    async def _prefetch_active_clans(self):
+        """Fetches clan, river race and linked player profiles for clans that
+        were audited recently, so the first commands after a deploy are warm."""
+        loop = asyncio.get_running_loop()
+        since = datetime.now(timezone.utc) - timedelta(days=14)
+
+        def blocking_targets():
+            clans = self.db["clan_history"].distinct("clan_tag", {"timestamp": {"$gte": since}})
+            players = [(u["_id"], u.get("player_id")) for u in self.db_users.find({}, {"player_id": 1}).limit(PREFETCH_MAX_PLAYERS)]
+            return clans, [p for p in players if p[1]]
+
+        try:
+            clans, players = await loop.run_in_executor(None, blocking_targets)
+            clans = set(clans)
+            stats = {}
+
+            async def warm_player(discord_id, tag):
+                data = await self.fetch_api(f"{self.api_base}/players/%23{tag.replace('#', '')}")
+                if not data:
+                    return
+                stats[discord_id] = leaderboard.player_fields(data)
+                clan_tag = data.get("clan", {}).get("tag", "").replace("#", "")
+                if clan_tag:
+                    clans.add(clan_tag)
+
+            # api_semaphore already bounds concurrency
+            await asyncio.gather(*(warm_player(d, t) for d, t in players))
+            # Refresh the dashboard leaderboard from the profiles we just fetched
+            await loop.run_in_executor(None, leaderboard.store, self.db_users, stats)
+            await asyncio.gather(*(
+                self.fetch_api(f"{self.api_base}/clans/%23{c}{suffix}")
+                for c in clans for suffix in ("", "/currentriverrace")
+            ))
+            self.active_clans.update(clans)
+            log.info(f"♨️ Prefetched {len(clans)} clans and {len(players)} player profiles")
+        except Exception:
+            log.exception("❌ Cache prefetch failed")
+
+    async def start_runtime(self):
+        """DB, Redis and the API client without a gateway connection, for
+        processes that only serve reads (python dashboard.py)."""
+        await self._async_setup_hook()
+        loop = asyncio.get_running_loop()
+        database, redis_conn = await asyncio.gather(
+            loop.run_in_executor(None, _connect_mongo),
+            loop.run_in_executor(None, _connect_redis),
+        )
+        await self._init_runtime(database, redis_conn)
+        self.standalone = True
+
+    async def on_ready(self):
+        shards = f"shards {sorted(self.shards)}" if self.shard_ids else f"{self.shard_count or 1} shards"
+        log.info(f"✅ Logged in as {self.user} (cluster {self.cluster_id}, {shards})")
 
     async def close(self):
+        for task in self._background_tasks:
+            task.cancel()
+        if hasattr(self, "cache_store") and self.is_primary:
+            try:
+                await self.save_api_cache()
+            except Exception:
+                log.exception("❌ Final API cache snapshot failed")
         if hasattr(self, "http_session"): await self.http_session.close()
         await super().close()
 
-bot = ClashBot(command_prefix="!", intents=intents)
-
-@bot.event
-async def on_ready():
-    log.info(f"✅ Logged in as {bot.user}")
+bot = ClashBot(command_prefix="!", intents=intents, shard_ids=SHARD_IDS, shard_count=SHARD_COUNT)
 
 if __name__ == "__main__":
     try:
+        if not DISCORD_TOKEN:
+            raise RuntimeError("DISCORD_TOKEN is missing")
         bot.run(DISCORD_TOKEN)
     except Exception as e:
         # These lines will print the actual error to your logs
         log.error(f"❌ CRITICAL ERROR: {e}")
-        traceback.print_exc() 
-        
+        traceback.print_exc()
+
         # Keep the container alive so you can read the logs
         while True: time.sleep(3600)
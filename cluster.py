@@ -0,0 +1,144 @@
+"""Cluster launcher: runs the bot as several processes, each owning a
+contiguous range of shards, plus the dashboard as a process of its own.
+
+    python cluster.py                          # shard count from Discord, one cluster per core
+    CLUSTER_COUNT=4 TOTAL_SHARDS=16 python cluster.py
+
+Processes share the API cache through Redis (REDIS_URL). Cluster 0 is the
+primary and runs the global background loops; crashed processes are
+restarted with exponential backoff.
+"""
+import os
+import sys
+import time
+import signal
+import asyncio
+import logging
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger("clashbot.cluster")
+
+DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
+TOTAL_SHARDS = os.getenv("TOTAL_SHARDS", "auto")
+CLUSTER_COUNT = int(os.getenv("CLUSTER_COUNT", "0")) or os.cpu_count() or 1
+# Discord allows one IDENTIFY per 5s per concurrency bucket
+IDENTIFY_INTERVAL = float(os.getenv("CLUSTER_IDENTIFY_INTERVAL", "5"))
+DASHBOARD_PROCESS = os.getenv("DASHBOARD_PROCESS", "1") == "1"
+MAX_BACKOFF = 60.0
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+async def recommended_shards(token):
+    """(shard count, max_concurrency) as suggested by Discord."""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot",
+            headers={"Authorization": f"Bot {token}"},
+        ) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+    return data["shards"], data.get("session_start_limit", {}).get("max_concurrency", 1)
+
+
+def shard_ranges(total, clusters):
+    """Splits shard ids 0..total-1 into contiguous, near-equal ranges."""
+    clusters = max(1, min(clusters, total))
+    base, extra = divmod(total, clusters)
+    ranges, start = [], 0
+    for i in range(clusters):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+class Worker:
+    """One supervised child process."""
+
+    def __init__(self, name, argv, env, start_delay=0.0):
+        self.name = name
+        self.argv = argv
+        self.env = env
+        self.start_delay = start_delay
+        self.proc = None
+
+    async def run(self, stopping):
+        await asyncio.sleep(self.start_delay)
+        backoff = 1.0
+        while not stopping.is_set():
+            started = time.monotonic()
+            self.proc = await asyncio.create_subprocess_exec(*self.argv, env=self.env, cwd=ROOT)
+            log.info(f"▶️ {self.name} started (pid {self.proc.pid})")
+            code = await self.proc.wait()
+            if stopping.is_set():
+                break
+            # A process that stayed up for a while gets a fresh backoff
+            if time.monotonic() - started > MAX_BACKOFF:
+                backoff = 1.0
+            log.error(f"💥 {self.name} exited with {code}, restarting in {backoff:.0f}s")
+            await asyncio.sleep(backoff)
+            backoff = min(MAX_BACKOFF, backoff * 2)
+
+    async def stop(self, timeout=15):
+        if not self.proc or self.proc.returncode is not None:
+            return
+        self.proc.terminate()
+        try:
+            await asyncio.wait_for(self.proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"{self.name} did not exit, killing")
+            self.proc.kill()
+
+
+async def main():
+    if not DISCORD_TOKEN:
+        raise SystemExit("DISCORD_TOKEN is missing")
+    if not os.getenv("REDIS_URL"):
+        log.warning("⚠️ REDIS_URL is not set: clusters will not share their API cache")
+
+    if TOTAL_SHARDS == "auto":
+        total, concurrency = await recommended_shards(DISCORD_TOKEN)
+    else:
+        total, concurrency = int(TOTAL_SHARDS), 1
+    ranges = shard_ranges(total, CLUSTER_COUNT)
+    log.info(f"🧩 {total} shards across {len(ranges)} clusters: " + ", ".join(f"{r[0]}-{r[-1]}" for r in ranges))
+
+    workers, identified = [], 0
+    for cluster_id, shard_ids in enumerate(ranges):
+        env = dict(
+            os.environ,
+            CLUSTER_ID=str(cluster_id),
+            SHARD_IDS=",".join(map(str, shard_ids)),
+            SHARD_COUNT=str(total),
+            DASHBOARD_MODE="off",
+        )
+        # Start each cluster once the shards before it have had their IDENTIFY slots
+        delay = identified * IDENTIFY_INTERVAL / max(1, concurrency)
+        workers.append(Worker(f"cluster-{cluster_id}", [sys.executable, "bot.py"], env, start_delay=delay))
+        identified += len(shard_ids)
+
+    if DASHBOARD_PROCESS:
+        env = dict(os.environ, CLUSTER_ID="-1")
+        workers.append(Worker("dashboard", [sys.executable, "dashboard.py"], env))
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    tasks = [asyncio.create_task(w.run(stopping)) for w in workers]
+    await stopping.wait()
+    log.info("🛑 Stopping cluster...")
+    await asyncio.gather(*(w.stop() for w in workers))
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,14 +3,28 @@ import io
 import csv
 import asyncio
 import logging
-import gridfs
 import math
 from collections import Counter
 from datetime import datetime, timezone
 import discord
 from discord.ext import commands, tasks
+from utils import codec as schemas
+from utils import rollups
+from utils import leaderboard
+from utils import storage
+from utils import activity
+from utils.leases import LeaseLost
+from utils.jobs import AuditJobQueue, QUEUED, RUNNING, DONE
+from utils.paginator import Paginator
+from utils.forecast import RaceForecaster, GOAL
+from utils.meta import MetaEngine, BRACKETS, META_HALF_LIFE_DAYS, bracket_of, bracket_label
 
 MAX_CARD_LEVEL = int(os.getenv("MAX_CARD_LEVEL", "16"))
+# How often scheduled jobs check whether their period is due
+SCHEDULER_TICK_MINUTES = float(os.getenv("SCHEDULER_TICK_MINUTES", "5"))
+# Audit worker pool: concurrent scans per process, and how often to look for queued jobs
+AUDIT_WORKERS = int(os.getenv("AUDIT_WORKERS", "2"))
+AUDIT_POLL_SECONDS = float(os.getenv("AUDIT_POLL_SECONDS", "5"))
 
 class Admin(commands.Cog):
     def __init__(self, bot):
@@ -20,16 +34,28 @@ class Admin(commands.Cog):
         self.history = self.db["clan_history"]
         self.player_history = self.db["player_history"]
         self.scout_history = self.db["scout_history"] # New collection for scout reports
-        self.fs = gridfs.GridFS(self.db)
+        # Card frequency / co-occurrence over all scout reports, folded forward incrementally
+        self.meta_engine = MetaEngine(bot)
+        self.forecaster = RaceForecaster(bot)
         self.redis = bot.redis
-        self.api_base = "https://proxy.royaleapi.dev/v1"
+        self.api_base = bot.api_base
         self.log = logging.getLogger("clashbot")
+
+        # Audits run from a queue shared by all replicas (see utils/jobs.py)
+        self.jobs = AuditJobQueue(self.db)
+        self._active_jobs = set()
+        self._dispatch_tasks = set()
+        self._dispatch_lock = asyncio.Lock()
         
-        # Start the daily scheduled task
+        # Start the daily scheduled task (runs under a lease, see utils/leases.py)
         self.daily_audit_task.start()
+        self.audit_dispatch.start()
 
     def cog_unload(self):
         self.daily_audit_task.cancel()
+        self.audit_dispatch.cancel()
+        for task in self._active_jobs | self._dispatch_tasks:
+            task.cancel()
 
     # --------------------
     # Helpers
@@ -59,19 +85,6 @@ class Admin(commands.Cog):
         except Exception:
             pass
 
-    def _chunk_message(self, header, lines, limit=1900):
-        chunks = []
-        current_chunk = header + "\n"
-        for line in lines:
-            if len(current_chunk) + len(line) + 1 > limit:
-                chunks.append(current_chunk)
-                current_chunk = line + "\n"
-            else:
-                current_chunk += line + "\n"
-        if current_chunk:
-            chunks.append(current_chunk)
-        return chunks
-
     def _compute_expected_decks(self, war_data):
         try:
             if not war_data:
@@ -140,49 +153,59 @@ class Admin(commands.Cog):
         loop = asyncio.get_running_loop()
         def blocking():
             return list(self.users.find())
-        return await loop.run_in_executor(None, blocking)
-
-    async def _find_user_by_discord(self, discord_id):
-        loop = asyncio.get_running_loop()
-        def blocking():
-            return self.users.find_one({"_id": str(discord_id)})
-        return await loop.run_in_executor(None, blocking)
+        with self.bot.tracer.span("mongo.users.find"):
+            return await loop.run_in_executor(None, blocking)
 
     async def get_clan_tag(self, ctx):
-        discord_id = str(ctx.author.id)
-        if self.redis:
-            val = self.redis.get(f"clan_tag:{discord_id}")
-            if val:
-                return val.decode('utf-8') if isinstance(val, bytes) else val
-        
-        user_data = await self._find_user_by_discord(ctx.author.id)
-        if not user_data:
-            return None
-        clean_tag = user_data["player_id"].replace("#", "")
-        url = f"{self.api_base}/players/%23{clean_tag}"
-        data = await self.bot.fetch_api(url, ttl=3600)
-        if not data:
-            return None
-        
-        clan_tag = data.get("clan", {}).get("tag", "").replace("#", "")
-        if clan_tag and self.redis:
-            self.redis.setex(f"clan_tag:{discord_id}", 3600, clan_tag)
-        return clan_tag
-    
+        return await self.bot.identity.clan_tag(ctx.author.id)
+
     async def is_leader(self, discord_id):
-        user_data = await self._find_user_by_discord(discord_id)
-        if not user_data:
-            return False
-        clean_tag = user_data["player_id"].replace("#", "")
-        url = f"{self.api_base}/players/%23{clean_tag}"
-        data = await self.bot.fetch_api(url, ttl=60)
-        if data:
-            return data.get("role") in ("leader", "coLeader")
-        return False
+        return await self.bot.identity.is_leader(discord_id)
 
     # --------------------
     # Core Audit Logic
     # --------------------
+    def _build_audit_csv(self, members_summary):
+        """Renders the audit members as CSV bytes (None on failure)."""
+        try:
+            output = io.StringIO()
+            writer = csv.writer(output)
+            
+            # THOROUGH HEADERS
+            headers = [
+                "Rank", "Name", "Tag", "Role", "Level", "Trophies", "Arena",
+                "Donations Sent", "Donations Rcvd", 
+                "War Decks Used", "Expected Decks", "Completion %", "Fame", "Repair Points",
+                "Days Inactive", "Last Seen (ISO)"
+            ]
+            writer.writerow(headers)
+            
+            for m in members_summary:
+                writer.writerow([
+                    m.get("clan_rank"),
+                    m.get("name"),
+                    f"#{m.get('tag')}",
+                    m.get("role"),
+                    m.get("exp_level"),
+                    m.get("trophies"),
+                    m.get("arena"),
+                    m.get("donations"),
+                    m.get("donations_received"),
+                    m.get("war_decks"),
+                    m.get("expected_decks"),
+                    f"{m.get('deck_completion_pct')*100:.1f}%",
+                    m.get("fame"),
+                    m.get("repair_points"),
+                    m.get("days_since_seen") if m.get("days_since_seen") is not None else "N/A",
+                    m.get("last_seen") or "Unknown"
+                ])
+                
+            output.seek(0)
+            return output.getvalue().encode("utf-8")
+        except Exception:
+            self.log.exception("Error generating CSV for audit")
+            return None
+
     async def _run_audit_scan(self, clan_tag):
         """Fetches data, saves to DB, and returns the snapshot dict."""
         self.log.info(f"🏁 Starting audit scan for clan {clan_tag}...")
@@ -190,12 +213,12 @@ class Admin(commands.Cog):
         c_url = f"{self.api_base}/clans/%23{clan_tag}"
         w_url = f"{self.api_base}/clans/%23{clan_tag}/currentriverrace"
 
-        clan = await self.bot.fetch_api(c_url, ttl=30)
+        clan = await self.bot.fetch_api(c_url)
         if not clan:
             self.log.error(f"❌ Failed to fetch CLAN data for {clan_tag}")
             return None
         
-        war = await self.bot.fetch_api(w_url, ttl=30)
+        war = await self.bot.fetch_api(w_url)
         if not war:
              war = {}
 
@@ -249,44 +272,8 @@ class Admin(commands.Cog):
             })
 
         # --- CSV Generation (In-Memory) ---
-        try:
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # THOROUGH HEADERS
-            headers = [
-                "Rank", "Name", "Tag", "Role", "Level", "Trophies", "Arena",
-                "Donations Sent", "Donations Rcvd", 
-                "War Decks Used", "Expected Decks", "Completion %", "Fame", "Repair Points",
-                "Days Inactive", "Last Seen (ISO)"
-            ]
-            writer.writerow(headers)
-            
-            for m in members_summary:
-                writer.writerow([
-                    m.get("clan_rank"),
-                    m.get("name"),
-                    f"#{m.get('tag')}",
-                    m.get("role"),
-                    m.get("exp_level"),
-                    m.get("trophies"),
-                    m.get("arena"),
-                    m.get("donations"),
-                    m.get("donations_received"),
-                    m.get("war_decks"),
-                    m.get("expected_decks"),
-                    f"{m.get('deck_completion_pct')*100:.1f}%",
-                    m.get("fame"),
-                    m.get("repair_points"),
-                    m.get("days_since_seen") if m.get("days_since_seen") is not None else "N/A",
-                    m.get("last_seen") or "Unknown"
-                ])
-                
-            output.seek(0)
-            csv_bytes = output.getvalue().encode("utf-8")
-        except Exception:
-            self.log.exception("Error generating CSV for audit")
-            csv_bytes = None
+        with self.bot.tracer.span("csv.build", rows=len(members_summary)):
+            csv_bytes = self._build_audit_csv(members_summary)
 
         # --- DB Storage ---
         snapshot = {
@@ -307,39 +294,64 @@ class Admin(commands.Cog):
             # Store CSV in GridFS
             csv_gridfs_id = None
             if csv_bytes:
-                def blocking_put_csv(data, filename):
-                    return self.fs.put(data, filename=filename)
-                
                 filename = f"audit_{clan_tag}_{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.csv"
                 try:
-                    csv_gridfs_id = await loop.run_in_executor(None, blocking_put_csv, csv_bytes, filename)
+                    with self.bot.tracer.span("gridfs.put", bytes=len(csv_bytes)):
+                        csv_gridfs_id = await loop.run_in_executor(None, storage.put_blob, self.bot.fs, csv_bytes, filename)
                     snapshot["csv_gridfs_id"] = csv_gridfs_id
                 except Exception:
                     self.log.exception("GridFS store failed")
 
+            # Stored compactly (utils/storage.py); callers keep the full snapshot
+            stored = {k: v for k, v in snapshot.items() if k not in ("members", "issues")}
+            stored["members_packed"] = storage.pack_members(members_summary)
+            stored["issue_count"] = len(snapshot["issues"])
+
             def blocking_insert_snapshot(doc):
                 return self.history.insert_one(doc)
-            res = await loop.run_in_executor(None, blocking_insert_snapshot, snapshot)
-            snapshot_id = res.inserted_id
+            with self.bot.tracer.span("mongo.clan_history.insert"):
+                res = await loop.run_in_executor(None, blocking_insert_snapshot, stored)
+            snapshot_id = snapshot["_id"] = res.inserted_id
 
             # Store Player History
             def blocking_fetch_linked(tags):
                 return list(self.users.find({"player_id": {"$in": tags}}, {"player_id": 1, "_id": 1}))
             
-            linked_docs = await loop.run_in_executor(None, blocking_fetch_linked, clean_tags)
+            with self.bot.tracer.span("mongo.users.find_linked"):
+                linked_docs = await loop.run_in_executor(None, blocking_fetch_linked, clean_tags)
             linked_map = {d.get("player_id"): d.get("_id") for d in linked_docs if d.get("player_id")}
 
+            try:
+                # Role/clan changes seen here refresh cached identities (utils/identity.py)
+                await self.bot.identity.observe_members(clan_tag, members_summary, linked_map)
+            except Exception:
+                self.log.exception("Failed to refresh cached identities")
+
+            # Dashboard leaderboard stats for linked members, from data we already have
+            stats = {linked_map[m["tag"]]: leaderboard.member_fields(m, clan_tag, snapshot["timestamp"])
+                     for m in members_summary if m["tag"] in linked_map}
+            try:
+                with self.bot.tracer.span("mongo.users.bulk_write", ops=len(stats)):
+                    await loop.run_in_executor(None, leaderboard.store, self.users, stats)
+            except Exception:
+                self.log.exception("Failed to store leaderboard stats")
+
             player_docs = []
             for m in members_summary:
                 last_seen_ts = m.get("last_seen_ts")
                 doc = {
                     "player_tag": m.get("tag"),
+                    "name": m.get("name"),
                     "clan_tag": clan_tag,
                     "timestamp": snapshot["timestamp"],
+                    "day": rollups.day_key(snapshot["timestamp"]),
+                    "week": rollups.week_key(snapshot["timestamp"]),
                     "war_decks": m.get("war_decks"),
                     "expected_decks": m.get("expected_decks"),
                     "deck_completion_pct": m.get("deck_completion_pct"),
                     "donations": m.get("donations"),
+                    "fame": m.get("fame"),
+                    "days_since_seen": m.get("days_since_seen"),
                     "last_seen_ts": last_seen_ts.isoformat() if last_seen_ts else None,
                     "discord_id": linked_map.get(m.get("tag")),
                     "snapshot_id": snapshot_id
@@ -349,7 +361,14 @@ class Admin(commands.Cog):
             if player_docs:
                 def blocking_insert_players(docs):
                     return self.player_history.insert_many(docs)
-                await loop.run_in_executor(None, blocking_insert_players, player_docs)
+                with self.bot.tracer.span("mongo.player_history.insert", docs=len(player_docs)):
+                    await loop.run_in_executor(None, blocking_insert_players, player_docs)
+
+                try:
+                    with self.bot.tracer.span("mongo.rollups.merge"):
+                        await loop.run_in_executor(None, rollups.update_rollups, self.db, clan_tag, snapshot["timestamp"])
+                except Exception:
+                    self.log.exception(f"Failed to update trend rollups for {clan_tag}")
 
             self.log.info(f"✅ Saved audit snapshot {snapshot_id} for clan {clan_tag}")
         except Exception:
@@ -360,65 +379,168 @@ class Admin(commands.Cog):
     # --------------------
     # Scheduled Task
     # --------------------
-    @tasks.loop(hours=24)
+    @tasks.loop(minutes=SCHEDULER_TICK_MINUTES)
     async def daily_audit_task(self):
-        """Runs audit once/day. Checks DB to prevent duplicates on restart."""
-        self.log.info("⏰ Daily audit task woke up. Checking schedule...")
+        """Runs audit once/day across all replicas: whoever holds the
+        daily_audit lease runs it; the others skip until tomorrow's period."""
+        period = datetime.now(timezone.utc).strftime("%Y-%m-%d")
         try:
-            all_users = await self._find_all_users()
-            scanned_clans = set()
-            
-            if not all_users:
-                self.log.info("No users found to audit.")
-                return
+            async with self.bot.leases.exclusive_run("daily_audit", period) as run:
+                if run is None:
+                    return
+                self.log.info(f"⏰ Daily audit for {period} (lease token {run.token})")
+                await self._daily_audit(run)
+        except LeaseLost:
+            self.log.warning("🔒 Lost the daily_audit lease mid-run; another replica will finish it")
+        except Exception:
+            self.log.exception("❌ Error in daily audit task")
 
-            # Pick the first user to seed the clan tag
-            first_user = all_users[0] 
-            clean_tag = first_user.get("player_id", "").replace("#", "")
-            
-            if not clean_tag:
-                return
+    async def _daily_audit(self, run):
+        all_users = await self._find_all_users()
 
-            p_url = f"{self.api_base}/players/%23{clean_tag}"
-            p_data = await self.bot.fetch_api(p_url, ttl=3600)
-            
-            if p_data and "clan" in p_data:
-                clan_tag = p_data["clan"]["tag"].replace("#", "")
-                
-                if clan_tag not in scanned_clans:
-                    # --- DUPLICATE CHECK START ---
-                    now = datetime.utcnow()
-                    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-                    
-                    loop = asyncio.get_running_loop()
-                    def blocking_check():
-                        return self.history.find_one({
-                            "clan_tag": clan_tag,
-                            "timestamp": {"$gte": today_start}
-                        })
-                    
-                    exists = await loop.run_in_executor(None, blocking_check)
-                    
-                    if exists:
-                        self.log.info(f"☕ Audit already completed for {clan_tag} today. Skipping.")
-                    else:
-                        self.log.info(f"🚀 No audit found for today. Running scan for {clan_tag}...")
-                        await self._run_audit_scan(clan_tag)
-                    
-                    scanned_clans.add(clan_tag)
-            else:
-                 self.log.warning(f"Could not resolve clan for seeded user {first_user.get('_id')}")
+        if not all_users:
+            self.log.info("No users found to audit.")
+            return
 
-        except Exception:
-            self.log.exception("❌ Error in daily audit task")
+        # Pick the first user to seed the clan tag
+        first_user = all_users[0]
+        clean_tag = first_user.get("player_id", "").replace("#", "")
+
+        if not clean_tag:
+            return
+
+        p_url = f"{self.api_base}/players/%23{clean_tag}"
+        p_data = await self.bot.fetch_api(p_url)
+
+        if not (p_data and "clan" in p_data):
+            self.log.warning(f"Could not resolve clan for seeded user {first_user.get('_id')}")
+            return
+
+        clan_tag = p_data["clan"]["tag"].replace("#", "")
+        if clan_tag in run.done:
+            return
+
+        # Coalesces with a manual !audit today; the worker pool reuses any
+        # snapshot that already exists
+        loop = asyncio.get_running_loop()
+        job = await loop.run_in_executor(None, self.jobs.submit, clan_tag)
+        self.log.info(f"🚀 Daily audit for {clan_tag} is {job['status']}")
+        self._kick_dispatch()
+
+        await run.mark(clan_tag)
 
     @daily_audit_task.before_loop
     async def before_daily_audit(self):
         await self.bot.wait_until_ready()
 
+    # --------------------
+    # Audit Worker Pool
+    # --------------------
+    @tasks.loop(seconds=AUDIT_POLL_SECONDS)
+    async def audit_dispatch(self):
+        # Picks up jobs submitted by other replicas and ones whose worker died
+        try:
+            await self._dispatch_once()
+        except Exception:
+            self.log.exception("❌ Error dispatching audit jobs")
+
+    @audit_dispatch.before_loop
+    async def before_audit_dispatch(self):
+        await self.bot.wait_until_ready()
+
+    def _kick_dispatch(self):
+        task = asyncio.create_task(self._dispatch_once())
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_done)
+
+    def _dispatch_done(self, task):
+        self._dispatch_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            self.log.error("❌ Error dispatching audit jobs", exc_info=task.exception())
+
+    async def _dispatch_once(self):
+        async with self._dispatch_lock:
+            loop = asyncio.get_running_loop()
+            while len(self._active_jobs) < AUDIT_WORKERS:
+                job = await loop.run_in_executor(None, self.jobs.claim)
+                if not job:
+                    return
+                task = asyncio.create_task(self._execute_job(job))
+                self._active_jobs.add(task)
+                task.add_done_callback(self._active_jobs.discard)
+
+    def _today_snapshot(self, clan_tag):
+        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        return self.history.find_one({
+            "clan_tag": clan_tag,
+            "timestamp": {"$gte": today_start}
+        })
+
+    def _delete_today_audit(self, clan_tag):
+        old_doc = self._today_snapshot(clan_tag)
+        if old_doc:
+            old_id = old_doc["_id"]
+            self.history.delete_one({"_id": old_id})
+            self.player_history.delete_many({"snapshot_id": old_id})
+        if self.redis:
+            self.redis.delete(f"audit_report:{clan_tag}")
+        return old_doc is not None
+
+    async def _execute_job(self, job):
+        clan_tag = job["clan_tag"]
+        loop = asyncio.get_running_loop()
+        try:
+            with self.bot.tracer.span("audit.job", clan=clan_tag, attempt=job.get("attempts", 1)):
+                snapshot = None
+                if job.get("force"):
+                    await loop.run_in_executor(None, self._delete_today_audit, clan_tag)
+                else:
+                    # The daily task or an earlier attempt may already have produced it
+                    snapshot = await loop.run_in_executor(None, self._today_snapshot, clan_tag)
+                if not snapshot:
+                    snapshot = await self._run_audit_scan(clan_tag)
+                if not snapshot or "_id" not in snapshot:
+                    raise RuntimeError("audit scan returned no data" + self.bot.api_status_note())
+
+            subscribers = await loop.run_in_executor(None, self.jobs.complete, job, snapshot["_id"])
+            report_url = f"{self.bot.public_url}/report/audit/{snapshot['_id']}"
+            msg = f"📉 **Audit Complete:** {snapshot.get('member_count', 0)} members scanned.\n"
+            issue_count = snapshot.get("issue_count", len(snapshot.get("issues", [])))
+            msg += f"⚠️ **{issue_count}** members flagged for low activity.\n"
+            msg += f"🔗 **[Click here to View Detailed Web Report]({report_url})**"
+            await self._notify(subscribers, msg)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.log.exception(f"Audit job {job['_id']} failed (attempt {job.get('attempts', 1)})")
+            subscribers = await loop.run_in_executor(None, self.jobs.fail, job, e)
+            await self._notify(subscribers, f"❌ Failed to generate audit data for #{clan_tag}: {e}")
+        finally:
+            # Free our slot and take the next job without waiting for the poll
+            self._active_jobs.discard(asyncio.current_task())
+            self._kick_dispatch()
+
+    async def _notify(self, subscribers, msg):
+        for sub in subscribers:
+            channel = self.bot.get_channel(sub["channel_id"])
+            try:
+                if not channel:
+                    channel = await self.bot.fetch_channel(sub["channel_id"])
+                await channel.send(f"<@{sub['user_id']}> {msg}")
+            except Exception:
+                self.log.exception(f"Failed to post audit result to channel {sub['channel_id']}")
+
     # --------------------
     # Commands
     # --------------------
+    async def _submit_audit(self, ctx, clan_tag, force=False):
+        loop = asyncio.get_running_loop()
+        subscriber = {"channel_id": ctx.channel.id, "user_id": ctx.author.id}
+        job = await loop.run_in_executor(None, lambda: self.jobs.submit(clan_tag, subscriber, force=force))
+        if job["status"] in (QUEUED, RUNNING):
+            self._kick_dispatch()
+        return job
+
     @commands.hybrid_command(name="audit")
     async def audit(self, ctx):
         """Generates a detailed web report of clan activity."""
@@ -430,24 +552,21 @@ class Admin(commands.Cog):
             return await ctx.reply("❌ Link your account first.", mention_author=False)
 
         await self._safe_defer(ctx)
-        
-        # Run the heavy scan and save it
-        snapshot = await self._run_audit_scan(clan_tag)
-        
-        if snapshot:
-            # Generate Link to Website
-            report_url = f"{self.bot.public_url}/report/audit/{snapshot.get('_id')}"
-            
-            issues_count = len(snapshot.get("issues", []))
-            member_count = snapshot.get("member_count", 0)
-            
-            msg = f"📉 **Audit Complete:** {member_count} members scanned.\n"
-            msg += f"⚠️ **{issues_count}** members flagged for low activity.\n"
-            msg += f"🔗 **[Click here to View Detailed Web Report]({report_url})**"
-            
-            await ctx.reply(msg, mention_author=False)
+
+        job = await self._submit_audit(ctx, clan_tag)
+
+        if job["status"] == DONE:
+            report_url = f"{self.bot.public_url}/report/audit/{job.get('snapshot_id')}"
+            msg = "📉 **Today's audit is already done.**\n"
+            msg += f"🔗 **[Click here to View Detailed Web Report]({report_url})**\n"
+            msg += "*(Use `!forceaudit` to rescan.)*"
+        elif job["status"] == RUNNING:
+            msg = "⏳ **Audit in progress** for this clan. I'll post the report link here when it's done."
         else:
-            await ctx.reply("❌ Failed to generate audit data.", mention_author=False)
+            loop = asyncio.get_running_loop()
+            ahead = await loop.run_in_executor(None, self.jobs.position, job)
+            msg = f"🕒 **Audit queued** ({ahead} ahead of it). I'll post the report link here when it's done."
+        await ctx.reply(msg, mention_author=False)
 
     @commands.hybrid_command(name="forceaudit")
     async def forceaudit(self, ctx):
@@ -460,44 +579,14 @@ class Admin(commands.Cog):
             return await ctx.reply("❌ Link your account first.", mention_author=False)
 
         await self._safe_defer(ctx)
-        await ctx.send("🔄 **Overwriting Audit:** Clearing old data...", delete_after=5)
-
-        now = datetime.utcnow()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
 
-        loop = asyncio.get_running_loop()
-        def blocking_cleanup():
-            old_doc = self.history.find_one({
-                "clan_tag": clan_tag,
-                "timestamp": {"$gte": today_start}
-            })
-            if old_doc:
-                old_id = old_doc["_id"]
-                self.history.delete_one({"_id": old_id})
-                self.player_history.delete_many({"snapshot_id": old_id})
-                return True
-            return False
-
-        was_deleted = await loop.run_in_executor(None, blocking_cleanup)
-        
-        # Run new scan
-        snapshot = await self._run_audit_scan(clan_tag)
+        job = await self._submit_audit(ctx, clan_tag, force=True)
 
-        # Clear cache so normal !audit picks up new data if we were using it (optional now that we use links)
-        if self.redis:
-            self.redis.delete(f"audit_report:{clan_tag}")
-
-        if snapshot:
-            report_url = f"{self.bot.public_url}/report/audit/{snapshot.get('_id')}"
-            
-            msg = "✅ **Success:** Today's audit has been overwritten with fresh data."
-            if was_deleted:
-                msg += "\n🗑️ *(Previous report was found and deleted)*"
-            
-            msg += f"\n🔗 **[View New Web Report]({report_url})**"
-            await ctx.reply(msg, mention_author=False)
+        if job["status"] == RUNNING:
+            msg = "⏳ **Audit already running** for this clan; its fresh report will be posted here."
         else:
-            await ctx.reply("❌ Failed to generate new audit.", mention_author=False)
+            msg = "🔄 **Overwriting Audit:** today's report will be replaced. I'll post the new link here when it's done."
+        await ctx.reply(msg, mention_author=False)
 
     @commands.hybrid_command(name="scout")
     async def scout(self, ctx, *, arg: str = None):
@@ -511,9 +600,9 @@ class Admin(commands.Cog):
         
         # Fetch Race Data
         url = f"{self.api_base}/clans/%23{clan_tag}/currentriverrace"
-        data = await self.bot.fetch_api(url, ttl=30)
+        data = await self.bot.fetch_api(url)
         if not data:
-            return await ctx.reply("❌ Failed to fetch race data.", mention_author=False)
+            return await ctx.reply("❌ Failed to fetch race data." + self.bot.api_status_note(), mention_author=False)
 
         participants = data.get("clan", {}).get("participants", [])
         if not participants:
@@ -521,9 +610,9 @@ class Admin(commands.Cog):
 
         # Select Targets
         if not clan_flag:
-            user_data = await self.bot.db_users.find_one({"_id": str(ctx.author.id)})
-            if user_data and user_data.get("player_id"):
-                player_tag = "#" + user_data["player_id"].replace("#", "")
+            linked_tag = await self.bot.identity.player_tag(ctx.author.id)
+            if linked_tag:
+                player_tag = "#" + linked_tag
                 target = next((p for p in participants if p.get("tag") == player_tag), None)
                 if target:
                     top_players = [target]
@@ -542,7 +631,7 @@ class Admin(commands.Cog):
         for p in top_players:
             tag = p.get('tag', '').lstrip("#")
             b_url = f"{self.api_base}/players/%23{tag}/battlelog"
-            logs = await self.bot.fetch_api(b_url, ttl=30)
+            logs = await self.bot.fetch_api(b_url)
             
             if logs:
                 for battle in logs[:5]: # Analyze last 5 battles per player
@@ -552,8 +641,11 @@ class Admin(commands.Cog):
                         all_cards.extend(cards)
                         battles_data.append({
                             "opponent": opp.get("name", "Unknown"),
-                            "trophies": opp.get("trophies", 0),
-                            "cards": cards
+                            "trophies": opp.get("trophies") or opp.get("startingTrophies", 0),
+                            "cards": cards,
+                            # For the meta engine (utils/meta.py): card ids, and a key to skip rescouted battles
+                            "card_ids": [c.get('id') for c in opp.get("cards", [])],
+                            "key": f"{opp.get('tag')}:{battle.get('battleTime')}",
                         })
             await asyncio.sleep(0.25)
 
@@ -567,7 +659,9 @@ class Admin(commands.Cog):
             "mode": "clan" if clan_flag else "personal",
             "battles": battles_data
         }
-        res = self.scout_history.insert_one(scout_doc)
+        loop = asyncio.get_running_loop()
+        with self.bot.tracer.span("mongo.scout_history.insert"):
+            res = await loop.run_in_executor(None, self.scout_history.insert_one, scout_doc)
         
         # Generate Report Link
         report_url = f"{self.bot.public_url}/report/scout/{res.inserted_id}"
@@ -582,6 +676,62 @@ class Admin(commands.Cog):
         
         await ctx.reply(msg, mention_author=False)
 
+    @commands.hybrid_command(name="meta")
+    async def meta(self, ctx, trophies: int = None):
+        """Card meta across every scout report. Usage: !meta [trophies] (e.g. !meta 7500 for that bracket)"""
+        try:
+            await self.meta_engine.refresh()
+        except Exception:
+            self.log.exception("Meta refresh failed")
+        engine = self.meta_engine
+        if not engine.total_battles():
+            return await ctx.reply("❌ No scouted battles yet. Run `!scout` or `!scout clan` first.", mention_author=False)
+
+        pct = lambda x: f"{x * 100:.0f}%"
+        embed = discord.Embed(title="🃏 Scouted Meta", color=0x9B59B6)
+        if trophies is not None:
+            b = bracket_of(trophies)
+            label = bracket_label(b)
+            cards = engine.top_cards(8, bracket=b)
+            embed.add_field(
+                name=f"🏆 Most used at {label} ({engine.total_battles(b)} battles)",
+                value="\n".join(f"{name} — {pct(share)}" for name, share in cards) or "No battles in this bracket.",
+                inline=False,
+            )
+            brackets = [b]
+        else:
+            cards = engine.top_cards(8)
+            embed.add_field(name="🏆 Most used", value="\n".join(f"{name} — {pct(share)}" for name, share in cards), inline=False)
+            brackets = range(len(BRACKETS))
+
+        pairs = engine.top_pairs(5)
+        if pairs:
+            embed.add_field(
+                name="🤝 Top pairs",
+                value="\n".join(f"{a} + {b} — {n} ({pct(share)})" for a, b, n, share in pairs),
+                inline=False,
+            )
+        clusters = engine.clusters(4)
+        if clusters:
+            embed.add_field(
+                name="🎯 Win conditions",
+                value="\n".join(
+                    f"**{w}** {pct(share)}: " + ", ".join(f"{c} {pct(p)}" for c, p in support)
+                    for w, share, support in clusters
+                ),
+                inline=False,
+            )
+        trending = []
+        for b in brackets:
+            rising = engine.trending(b, 3)
+            if rising:
+                trending.append(f"**{bracket_label(b)}:** " + ", ".join(f"{name} {pct(share)} (+{d * 100:.0f}pt)" for name, share, d in rising))
+        if trending:
+            embed.add_field(name=f"📈 Trending (last ~{META_HALF_LIFE_DAYS:g}d vs all time)", value="\n".join(trending), inline=False)
+
+        embed.set_footer(text=f"{engine.total_battles()} battles from scout reports")
+        await ctx.reply(embed=embed, mention_author=False)
+
     @commands.hybrid_command(name="whohas")
     async def whohas(self, ctx, *, card_name: str):
         """Find clan members who have a specific card (checks top 15)."""
@@ -594,9 +744,9 @@ class Admin(commands.Cog):
         await ctx.reply(f"🔍 Searching clan for **{card_name}**... (Checking Top 15)", mention_author=False)
 
         c_url = f"{self.api_base}/clans/%23{clan_tag}"
-        clan_data = await self.bot.fetch_api(c_url, ttl=30)
+        clan_data = await self.bot.fetch_api(c_url, schema=schemas.Clan)
         if not clan_data:
-            return await ctx.reply("❌ Failed to fetch clan.", mention_author=False)
+            return await ctx.reply("❌ Failed to fetch clan." + self.bot.api_status_note(), mention_author=False)
 
         members = clan_data.get("memberList", [])[:15]
         hits = []
@@ -604,7 +754,7 @@ class Admin(commands.Cog):
         for member in members:
             tag = member.get("tag", "").lstrip("#")
             p_url = f"{self.api_base}/players/%23{tag}"
-            p_data = await self.bot.fetch_api(p_url, ttl=60)
+            p_data = await self.bot.fetch_api(p_url, schema=schemas.PlayerCards)
             if p_data:
                 for card in p_data.get("cards", []):
                     if card.get("name", "").lower() == card_name.lower():
@@ -618,42 +768,52 @@ class Admin(commands.Cog):
             await asyncio.sleep(0.25)
 
         if hits:
-            msg = f"🃏 **Found {card_name} Owners:**\n" + "\n".join(hits)
-            await ctx.reply(msg, mention_author=False)
+            await Paginator(f"🃏 Found {card_name} Owners", hits, author_id=ctx.author.id).send(ctx)
         else:
             await ctx.reply(f"❌ Not found in Top 15 members.", mention_author=False)
 
     @commands.hybrid_command(name="forecast")
     async def forecast(self, ctx):
-        """Predicts race finish."""
+        """Race finish odds by day, from a Monte Carlo over each player's history (utils/forecast.py)."""
         clan_tag = await self.get_clan_tag(ctx)
         if not clan_tag:
             return await ctx.reply("❌ Link your account first.", mention_author=False)
 
         await self._safe_defer(ctx)
         url = f"{self.api_base}/clans/%23{clan_tag}/currentriverrace"
-        data = await self.bot.fetch_api(url, ttl=30)
+        data = await self.bot.fetch_api(url)
         if not data:
-            return await ctx.reply("❌ Failed to fetch race data.", mention_author=False)
+            return await ctx.reply("❌ Failed to fetch race data." + self.bot.api_status_note(), mention_author=False)
 
         clan = data.get("clan", {})
         fame = clan.get("fame", 0)
         if data.get("periodType") == "training":
             return await ctx.reply("😴 **Training Day:** No forecast available.", mention_author=False)
 
-        GOAL = 10000
         if fame >= GOAL:
             return await ctx.reply("🎉 **Race Finished!**", mention_author=False)
+        if not clan.get("participants"):
+            return await ctx.reply("📉 Not enough data.", mention_author=False)
 
-        remaining = GOAL - fame
-        decks_used = sum(p.get('decksUsed', 0) for p in clan.get("participants", []))
-        avg_fame = fame / decks_used if decks_used > 0 else 0
-
-        if avg_fame > 0:
-            needed = int(remaining / avg_fame)
-            await ctx.reply(f"🔮 **Forecast:**\n🏁 Fame: `{fame}/{GOAL}`\n🚀 Left: `{remaining}`\n🃏 Est. Decks: `{needed}`", mention_author=False)
-        else:
-            await ctx.reply("📉 Not enough data.", mention_author=False)
+        try:
+            result = await self.forecaster.forecast(clan_tag, data)
+        except Exception:
+            self.log.exception("Forecast failed")
+            return await ctx.reply("❌ Forecast failed, try again shortly.", mention_author=False)
+
+        days = []
+        for i, p in enumerate(result["p_by_day"]):
+            label = "Today" if i == 0 else f"Day {result['first_day'] + i}"
+            days.append(f"{label}: **{p * 100:.0f}%**")
+        msg = f"🔮 **Forecast** ({result['sims']} simulated races, {result['players']} players)\n"
+        msg += f"🏁 Fame: `{fame}/{GOAL}` • 🚀 Left: `{GOAL - fame}`\n"
+        msg += "📅 Finished by: " + " • ".join(days) + "\n"
+        if result["decks"]:
+            lo, mid, hi = result["decks"]
+            msg += f"🃏 Decks needed: `{mid}` (likely {lo}–{hi})\n"
+        lo, mid, hi = result["fame_end"]
+        msg += f"📈 Fame at war end: `{mid}` (likely {lo}–{hi})"
+        await ctx.reply(msg + self.bot.api_status_note(), mention_author=False)
 
     @commands.hybrid_command(name="rolesync")
     @commands.has_permissions(manage_roles=True)
@@ -668,9 +828,9 @@ class Admin(commands.Cog):
 
         await self._safe_defer(ctx)
         c_url = f"{self.api_base}/clans/%23{clan_tag}"
-        clan_data = await self.bot.fetch_api(c_url, ttl=30)
+        clan_data = await self.bot.fetch_api(c_url)
         if not clan_data:
-            return await ctx.reply("❌ Failed to fetch clan.", mention_author=False)
+            return await ctx.reply("❌ Failed to fetch clan." + self.bot.api_status_note(), mention_author=False)
 
         role_map = {
             "member": discord.utils.get(ctx.guild.roles, name="Member"),
@@ -709,35 +869,40 @@ class Admin(commands.Cog):
 
     @commands.hybrid_command(name="primetime")
     async def primetime(self, ctx):
-        """Shows the hour (UTC) when the clan is most active."""
+        """Clan activity heatmap by hour of week (UTC) and each member's peak."""
         clan_tag = await self.get_clan_tag(ctx)
         if not clan_tag:
             return await ctx.reply("❌ Link your account first.", mention_author=False)
 
-        await self._safe_defer(ctx)
-        c_url = f"{self.api_base}/clans/%23{clan_tag}"
-        data = await self.bot.fetch_api(c_url, ttl=30)
-        if not data:
-            return await ctx.reply("❌ Could not fetch clan data.", mention_author=False)
-
-        hours = []
-        for member in data.get("memberList", []):
-            if "lastSeen" in member:
-                try:
-                    ls = member['lastSeen']
-                    if 'T' in ls:
-                        hour_str = ls.split('T')[1][:2]
-                        if hour_str.isdigit():
-                            hours.append(int(hour_str))
-                except Exception:
-                     self.log.warning(f"Failed to parse time for {member.get('name')}")
-
-        if not hours:
-            return await ctx.reply("❌ No activity data available.", mention_author=False)
-
-        peak_hour, count = Counter(hours).most_common(1)[0]
+        loop = asyncio.get_running_loop()
+        with self.bot.tracer.span("mongo.activity.find"):
+            buckets, members = await loop.run_in_executor(None, self.bot.activity_tracker.load, clan_tag)
+        if not any(buckets):
+            # Nothing observed yet: seed from the current member list
+            await self._safe_defer(ctx)
+            data = await self.bot.fetch_api(f"{self.api_base}/clans/%23{clan_tag}")
+            if not data:
+                return await ctx.reply("❌ Could not fetch clan data." + self.bot.api_status_note(), mention_author=False)
+            await self.bot.activity_tracker.observe(clan_tag, data)
+            buckets, members = await loop.run_in_executor(None, self.bot.activity_tracker.load, clan_tag)
+            if not any(buckets):
+                return await ctx.reply("❌ No activity data available.", mention_author=False)
+
+        peak_week, peak_hour = activity.peak(buckets)
         note = "Morning" if 5 <= peak_hour < 12 else "Afternoon" if 12 <= peak_hour < 17 else "Evening" if 17 <= peak_hour < 22 else "Night"
-        await ctx.reply(f"🕒 **Prime Time:** The clan is most active around **{peak_hour}:00 UTC** ({note}).\n📊 Based on {len(hours)} active members.", mention_author=False)
+        description = (
+            f"🕒 Most active around **{peak_hour}:00 UTC** ({note}); busiest slot **{activity.hour_label(peak_week)}**.\n"
+            f"```\n{activity.heatmap(buckets)}\n```"
+        )
+        ranked = sorted(members.values(), key=lambda nb: sum(nb[1]), reverse=True)
+        rows = []
+        for name, mb in ranked:
+            p = activity.peak(mb)
+            if p:
+                rows.append(f"**{name}** — usually {p[1]:02d}:00, peak {activity.hour_label(p[0])}")
+        footer = f"Seen {sum(buckets):.0f} times recently (decaying, {activity.ACTIVITY_HALF_LIFE_DAYS:g}-day half-life)"
+        await Paginator("🕒 Prime Time", rows, author_id=ctx.author.id, description=description,
+                        footer=footer, page_lines=10).send(ctx)
 
     @commands.hybrid_command(name="clan")
     async def clan(self, ctx):
@@ -748,9 +913,9 @@ class Admin(commands.Cog):
 
         await self._safe_defer(ctx)
         c_url = f"{self.api_base}/clans/%23{clan_tag}"
-        data = await self.bot.fetch_api(c_url, ttl=30)
+        data = await self.bot.fetch_api(c_url)
         if not data:
-            return await ctx.reply("❌ Could not fetch clan data.", mention_author=False)
+            return await ctx.reply("❌ Could not fetch clan data." + self.bot.api_status_note(), mention_author=False)
 
         embed = discord.Embed(title=f"{data.get('name')} (#{data.get('tag').replace('#','')})", color=0xF1C40F)
         embed.description = data.get("description", "No description.")
@@ -761,7 +926,72 @@ class Admin(commands.Cog):
         embed.add_field(name="🌍 Location", value=loc, inline=True)
         req = data.get("requiredTrophies", 0)
         embed.add_field(name="🚪 Required", value=f"{req}+ Trophies", inline=True)
+        if self.bot.api_degraded:
+            embed.set_footer(text="⚠️ Clash API degraded — this may be cached data.")
         await ctx.reply(embed=embed, mention_author=False)
 
+    @staticmethod
+    def _sparkline(values):
+        bars = "▁▂▃▄▅▆▇█"
+        return "".join(bars[min(len(bars) - 1, int((v or 0) * len(bars)))] for v in values)
+
+    @commands.hybrid_command(name="trend")
+    async def trend(self, ctx, target: str = "me", weeks: int = 8):
+        """Weekly deck completion, donations and activity. Usage: !trend [me|clan|#TAG] [weeks]"""
+        weeks = max(1, min(weeks, 26))
+        target = target.strip()
+
+        if target.lower() == "clan":
+            kind, tag = "clan", await self.get_clan_tag(ctx)
+            if not tag:
+                return await ctx.reply("❌ Link your account and join a clan first.", mention_author=False)
+        elif target.startswith("#"):
+            kind, tag = "player", target.lstrip("#").upper()
+        else:
+            kind, tag = "player", await self.bot.identity.player_tag(ctx.author.id)
+            if not tag:
+                return await ctx.reply("❌ Link your account first.", mention_author=False)
+
+        loop = asyncio.get_running_loop()
+        with self.bot.tracer.span("mongo.rollups.find", kind=kind):
+            rows = await loop.run_in_executor(None, rollups.load_trend, self.db, kind, tag, weeks)
+        if not rows:
+            return await ctx.reply(f"❌ No audit history for #{tag} in the last {weeks} weeks.", mention_author=False)
+
+        if kind == "clan":
+            title = f"📈 **Clan #{tag}** — last {len(rows)} weeks"
+            lines = [f"{'Week':<9}{'Decks':>7}{'Active':>8}{'Donations':>11}"]
+            for r in rows:
+                lines.append(f"{r['week']:<9}{(r.get('avg_completion') or 0):>7.0%}{(r.get('avg_active_members') or 0):>8.1f}{r.get('donations') or 0:>11}")
+        else:
+            title = f"📈 **{rows[-1].get('name') or '#' + tag}** — last {len(rows)} weeks"
+            lines = [f"{'Week':<9}{'Decks':>7}{'Active':>8}{'Donations':>11}"]
+            for r in rows:
+                lines.append(f"{r['week']:<9}{(r.get('avg_completion') or 0):>7.0%}{r.get('days_active', 0):>5}/{r.get('days_sampled', 0):<2}{r.get('donations') or 0:>11}")
+
+        spark = self._sparkline(r.get("avg_completion") for r in rows)
+        trend_url = f"{self.bot.public_url}/trend/{kind}/{tag}?weeks={weeks}"
+        await ctx.reply(
+            f"{title}\nDeck completion: `{spark}`\n```\n" + "\n".join(lines) + f"\n```\n🔗 **[Daily detail]({trend_url})**",
+            mention_author=False
+        )
+
+    @commands.hybrid_command(name="rebuildtrends")
+    @commands.is_owner()
+    async def rebuildtrends(self, ctx):
+        """Rebuilds every trend rollup from player_history."""
+        await self._safe_defer(ctx)
+        loop = asyncio.get_running_loop()
+
+        def blocking_rebuild():
+            clans = rollups.backfill_history(self.db)
+            for clan_tag in clans:
+                rollups.update_rollups(self.db, clan_tag)
+            return len(clans)
+
+        with self.bot.tracer.span("mongo.rollups.rebuild"):
+            count = await loop.run_in_executor(None, blocking_rebuild)
+        await ctx.reply(f"✅ Rebuilt trend rollups for {count} clans.", mention_author=False)
+
 async def setup(bot):
     await bot.add_cog(Admin(bot))
@@ -0,0 +1,92 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timezone
+from discord.ext import commands, tasks
+from utils import battles
+
+# Every linked player's battlelog is ingested once per cycle
+BATTLE_INGEST_MINUTES = float(os.getenv("BATTLE_INGEST_MINUTES", "30"))
+# Battlelog fetches per second while a cycle runs
+BATTLE_INGEST_RATE = float(os.getenv("BATTLE_INGEST_RATE", "1"))
+
+
+class Battles(commands.Cog):
+    """Keeps the `battles` collection (utils/battles.py) filled for every
+    linked player, so history goes back further than the API's last 25."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.db = bot.db
+        self.api_base = bot.api_base
+        self.log = logging.getLogger("clashbot")
+
+        self.ingested = 0
+        self.fetched = 0
+        self.failed = 0
+        self.last_cycle = None
+
+        # Stored battles are shared, so one cluster ingests for all
+        if bot.is_primary:
+            self.ingest_loop.start()
+
+    def cog_unload(self):
+        self.ingest_loop.cancel()
+
+    async def ingest_player(self, tag, log=None):
+        """Fetches (unless given) and stores a player's new battles. Returns how many."""
+        tag = tag.lstrip("#")
+        if log is None:
+            log = await self.bot.fetch_api(f"{self.api_base}/players/%23{tag}/battlelog")
+            if log is None:
+                self.failed += 1
+                return 0
+            self.fetched += 1
+        loop = asyncio.get_running_loop()
+        with self.bot.tracer.span("mongo.battles.ingest", player=tag):
+            added = await loop.run_in_executor(None, battles.ingest, self.db, tag, log)
+        self.ingested += added
+        return added
+
+    @tasks.loop(minutes=BATTLE_INGEST_MINUTES)
+    async def ingest_loop(self):
+        loop = asyncio.get_running_loop()
+        try:
+            tags = await loop.run_in_executor(None, self.bot.db_users.distinct, "player_id")
+            before = self.ingested
+            for tag in tags:
+                # Leave the API to commands while it's struggling
+                if self.bot.api_degraded:
+                    break
+                if not isinstance(tag, str) or not tag:
+                    continue
+                try:
+                    await self.ingest_player(tag)
+                except Exception:
+                    self.log.exception(f"Battle ingest failed for {tag}")
+                await asyncio.sleep(1 / max(BATTLE_INGEST_RATE, 0.01))
+            self.last_cycle = datetime.now(timezone.utc)
+            self.log.info(f"⚔️ Battle ingest: {self.ingested - before} new battles from {len(tags)} players")
+        except Exception:
+            self.log.exception("❌ Battle ingest cycle failed")
+
+    @ingest_loop.before_loop
+    async def before_ingest(self):
+        await self.bot.wait_until_ready()
+
+    @commands.hybrid_command(name="battlestatus")
+    @commands.is_owner()
+    async def battlestatus(self, ctx):
+        """Shows the background battle ingester's progress."""
+        loop = asyncio.get_running_loop()
+        stored = await loop.run_in_executor(None, self.db["battles"].estimated_document_count)
+        cycle = self.last_cycle.strftime("%H:%M:%S UTC") if self.last_cycle else "never"
+        await ctx.reply(
+            f"⚔️ **Battles:** {stored} stored | {self.ingested} ingested this run\n"
+            f"Fetched: {self.fetched} | Failed: {self.failed} | Last cycle: {cycle} | Rate: {BATTLE_INGEST_RATE:g}/s",
+            mention_author=False
+        )
+
+
+async def setup(bot):
+    await bot.add_cog(Battles(bot))
@@ -0,0 +1,88 @@
+import io
+import logging
+import discord
+from discord.ext import commands
+
+class Diagnostics(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.log = logging.getLogger("clashbot")
+
+    async def _reply_block(self, ctx, title, text, filename):
+        """Replies with a code block, or an attachment when it won't fit."""
+        if len(text) + len(title) < 1900:
+            return await ctx.reply(f"{title}\n```\n{text}\n```", mention_author=False)
+        file = discord.File(io.BytesIO(text.encode("utf-8")), filename=filename)
+        await ctx.reply(title, file=file, mention_author=False)
+
+    @commands.hybrid_command(name="profiler")
+    @commands.is_owner()
+    async def profiler(self, ctx, mode: str = "status", rate: float = 0.1, backend: str = "cprofile"):
+        """Sampled profiling. Usage: !profiler on [rate] [cprofile|yappi] / !profiler off"""
+        profiler = self.bot.tracer.profiler
+        mode = mode.lower()
+
+        if mode == "on":
+            try:
+                profiler.start(rate=rate, backend=backend.lower())
+            except RuntimeError as e:
+                return await ctx.reply(f"❌ {e}", mention_author=False)
+            self.log.info(f"🔬 Profiling enabled ({profiler.backend}, rate={profiler.rate})")
+            return await ctx.reply(f"🔬 Profiling **on** ({profiler.backend}, sampling {profiler.rate:.0%} of commands).", mention_author=False)
+
+        if mode == "off":
+            samples = profiler.samples
+            report = profiler.stop(top=20)
+            if report is None:
+                return await ctx.reply("❌ Profiler is not running.", mention_author=False)
+            return await self._reply_block(ctx, f"🔬 **Profile** ({samples} sampled commands)", report, "profile.txt")
+
+        state = f"on ({profiler.backend}, {profiler.samples} samples)" if profiler.enabled else "off"
+        await ctx.reply(f"🔬 Profiler is **{state}**.", mention_author=False)
+
+    @commands.hybrid_command(name="slowcommands")
+    @commands.is_owner()
+    async def slowcommands(self, ctx, count: int = 3):
+        """Shows the span trees of the most recent slow commands."""
+        tracer = self.bot.tracer
+        traces = list(tracer.recent_slow)[-max(1, count):]
+        if not traces:
+            return await ctx.reply(f"✅ No commands slower than {tracer.slow_threshold_ms:.0f}ms recorded.", mention_author=False)
+
+        blocks = []
+        for root in reversed(traces):
+            totals = ", ".join(f"{name} x{n} {ms:.0f}ms" for name, (n, ms) in sorted(root.totals().items(), key=lambda kv: -kv[1][1]))
+            blocks.append("\n".join(root.render()) + f"\n  => {totals}")
+        await self._reply_block(ctx, f"🐢 **Slow commands** (>{tracer.slow_threshold_ms:.0f}ms)", "\n\n".join(blocks), "slow_commands.txt")
+
+    @commands.hybrid_command(name="cachestats")
+    @commands.is_owner()
+    async def cachestats(self, ctx):
+        """Hit ratio and current adaptive TTL per API endpoint."""
+        policy = self.bot.ttl_policy
+        rows = policy.report()
+        if not rows:
+            return await ctx.reply("📭 No API calls recorded yet.", mention_author=False)
+
+        lines = [f"{'endpoint':<17}{'hit%':>6}{'hits':>7}{'miss':>6}{'stale':>6}{'chg%':>6}{'ttl':>7}"]
+        for endpoint, s, ttl in rows:
+            lines.append(f"{endpoint:<17}{s.hit_ratio:>6.0%}{s.hits:>7}{s.misses:>6}{s.stale:>6}{s.change_rate:>6.0%}{ttl:>6}s")
+        period = policy.period or "unknown"
+        title = f"🗃️ **API cache** ({len(self.bot.api_cache)} entries, war period: {period}, reset in {policy.seconds_until_reset() / 3600:.1f}h)"
+        await self._reply_block(ctx, title, "\n".join(lines), "cache_stats.txt")
+
+    @commands.hybrid_command(name="apistatus")
+    async def apistatus(self, ctx):
+        """Shows whether the Clash API circuit breaker is healthy."""
+        breaker = self.bot.api_breaker
+        if not breaker.degraded:
+            return await ctx.reply("🟢 **Clash API:** healthy.", mention_author=False)
+        retry = f" Next probe in {breaker.retry_in:.0f}s." if breaker.retry_in else ""
+        await ctx.reply(
+            f"🔴 **Clash API degraded** ({breaker.state}, {breaker.failures} consecutive failures).{retry}\n"
+            f"Commands answer from cached data where possible.",
+            mention_author=False
+        )
+
+async def setup(bot):
+    await bot.add_cog(Diagnostics(bot))
@@ -1,26 +1,31 @@
+import io
+import re
+import csv
 import discord
 import asyncio
+import logging
 from discord.ext import commands
+from pymongo import UpdateOne
+from utils import codec as schemas
+from utils import battles
+from utils.maintenance import normalize_tag
+from utils.paginator import Paginator
 
 ROLE_ID = 1464091054960803893  # Badge role ID
+LINKBULK_MAX_BYTES = 64 * 1024
+# Parallel role edits; discord.py still honours the per-route rate limits
+ROLE_CONCURRENCY = 5
 
 class Link(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.api_base = "https://proxy.royaleapi.dev/v1"
+        self.api_base = bot.api_base
         self.users = bot.db_users
 
-    async def _find_user(self, discord_id):
-        loop = asyncio.get_running_loop()
-        def blocking():
-            return self.users.find_one({"_id": str(discord_id)})
-        return await loop.run_in_executor(None, blocking)
-
     async def resolve_tag(self, ctx, tag):
         if tag:
             return tag.upper().replace("#", "")
-        user_data = await self._find_user(ctx.author.id)
-        return user_data["player_id"] if user_data else None
+        return await self.bot.identity.player_tag(ctx.author.id)
 
     @commands.hybrid_command(name="link")
     @commands.guild_only()
@@ -34,7 +39,9 @@ class Link(commands.Cog):
                 {"$set": {"player_id": clean_tag}},
                 upsert=True
             )
-        await loop.run_in_executor(None, blocking_upsert)
+        with self.bot.tracer.span("mongo.users.upsert"):
+            await loop.run_in_executor(None, blocking_upsert)
+        await self.bot.identity.invalidate(ctx.author.id)
 
         guild = ctx.guild
         member = ctx.author
@@ -55,6 +62,110 @@ class Link(commands.Cog):
         except discord.Forbidden:
             await ctx.reply("✅ Linked, but I lack permission to manage roles.", mention_author=False)
 
+    @staticmethod
+    def _parse_link_csv(text):
+        """discord_id,player_tag rows -> ({discord_id: tag}, [errors]).
+        A header row, mentions (<@id>) and '#' on tags are all accepted."""
+        pairs, errors, seen_tags = {}, [], {}
+        for lineno, row in enumerate(csv.reader(io.StringIO(text)), 1):
+            cells = [c.strip() for c in row if c.strip()]
+            if not cells:
+                continue
+            if len(cells) < 2:
+                errors.append(f"line {lineno}: expected discord_id,player_tag")
+                continue
+            m = re.fullmatch(r"<@!?(\d+)>|(\d{15,21})", cells[0])
+            if not m:
+                if lineno == 1:
+                    continue  # header
+                errors.append(f"line {lineno}: bad discord id `{cells[0]}`")
+                continue
+            discord_id = m.group(1) or m.group(2)
+            tag = normalize_tag(cells[1])
+            if not tag:
+                errors.append(f"line {lineno}: bad tag `{cells[1]}`")
+            elif discord_id in pairs:
+                errors.append(f"line {lineno}: <@{discord_id}> listed twice")
+            elif tag in seen_tags:
+                errors.append(f"line {lineno}: #{tag} already given to <@{seen_tags[tag]}>")
+            else:
+                pairs[discord_id] = tag
+                seen_tags[tag] = discord_id
+        return pairs, errors
+
+    @commands.hybrid_command(name="linkbulk")
+    @commands.guild_only()
+    async def linkbulk(self, ctx, file: discord.Attachment):
+        """Links many members at once from a CSV of discord_id,player_tag (leaders only)."""
+        if not await self.bot.identity.is_leader(ctx.author.id):
+            return await ctx.reply("❌ Access Denied (Leaders only).", mention_author=False)
+        clan_tag = await self.bot.identity.clan_tag(ctx.author.id)
+        if not clan_tag:
+            return await ctx.reply("❌ Link your account and join a clan first.", mention_author=False)
+        if file.size > LINKBULK_MAX_BYTES:
+            return await ctx.reply(f"❌ CSV too large (max {LINKBULK_MAX_BYTES // 1024} KB).", mention_author=False)
+
+        await ctx.defer()
+        try:
+            text = (await file.read()).decode("utf-8-sig")
+        except (discord.HTTPException, UnicodeDecodeError):
+            return await ctx.reply("❌ Couldn't read that file as UTF-8 CSV.", mention_author=False)
+        pairs, errors = self._parse_link_csv(text)
+
+        # One memberList fetch validates every tag
+        clan = await self.bot.fetch_api(f"{self.api_base}/clans/%23{clan_tag}", schema=schemas.Clan)
+        if not clan:
+            return await ctx.reply("❌ Failed to fetch clan." + self.bot.api_status_note(), mention_author=False)
+        members = {m.get("tag", "").lstrip("#"): m.get("name") for m in clan.get("memberList", [])}
+        for discord_id, tag in list(pairs.items()):
+            if tag not in members:
+                errors.append(f"<@{discord_id}>: #{tag} is not in {clan.get('name', 'the clan')}")
+                del pairs[discord_id]
+
+        if pairs:
+            ops = [UpdateOne({"_id": d}, {"$set": {"player_id": t}}, upsert=True) for d, t in pairs.items()]
+            loop = asyncio.get_running_loop()
+            with self.bot.tracer.span("mongo.users.bulk_write", ops=len(ops)):
+                await loop.run_in_executor(None, lambda: self.users.bulk_write(ops, ordered=False))
+            await self.bot.identity.invalidate(*pairs)
+
+        role_note = await self._assign_badges(ctx.guild, pairs)
+
+        rows = [f"✅ Linked **{len(pairs)}** members to {clan.get('name', clan_tag)}.", role_note]
+        if errors:
+            rows.append(f"⚠️ **{len(errors)} skipped:**")
+            rows.extend(errors)
+        await Paginator("🔗 Bulk Link", rows, author_id=ctx.author.id).send(ctx)
+
+    async def _assign_badges(self, guild, pairs):
+        """Gives the badge role to every newly linked member present in the
+        guild, a few at a time. Returns a one-line summary."""
+        role = guild.get_role(ROLE_ID)
+        if not role:
+            return "🏷️ Badge role not found; no roles assigned."
+        if guild.me and role.position >= guild.me.top_role.position:
+            return "🏷️ Can't assign the badge role due to role hierarchy."
+
+        targets = [m for m in (guild.get_member(int(d)) for d in pairs) if m and role not in m.roles]
+        missing = sum(1 for d in pairs if guild.get_member(int(d)) is None)
+        sem = asyncio.Semaphore(ROLE_CONCURRENCY)
+
+        async def assign(member):
+            async with sem:
+                try:
+                    await member.add_roles(role, reason="Bulk account link")
+                    return True
+                except discord.HTTPException:
+                    return False
+
+        results = await asyncio.gather(*(assign(m) for m in targets))
+        note = f"🏷️ Gave **{role.name}** to {sum(results)} members"
+        if len(results) - sum(results):
+            note += f", {len(results) - sum(results)} failed (permissions?)"
+        if missing:
+            note += f", {missing} not in this server"
+        return note + "."
+
     @commands.hybrid_command(name="stats", aliases=["profile"])
     async def stats(self, ctx, tag: str = None):
         clean_tag = await self.resolve_tag(ctx, tag)
@@ -62,14 +173,16 @@ class Link(commands.Cog):
             return await ctx.reply("❌ Link your account or provide a tag.", mention_author=False)
 
         url = f"{self.api_base}/players/%23{clean_tag}"
-        data = await self.bot.fetch_api(url, ttl=60)
+        data = await self.bot.fetch_api(url)
         if not data:
-            return await ctx.reply("❌ Could not fetch player stats.", mention_author=False)
+            return await ctx.reply("❌ Could not fetch player stats." + self.bot.api_status_note(), mention_author=False)
 
         embed = discord.Embed(title=f"{data.get('name')} (Lvl {data.get('expLevel')})", color=0x3498db)
         embed.add_field(name="🏆 Trophies", value=data.get("trophies"), inline=True)
         embed.add_field(name="🛡️ Clan", value=data.get("clan", {}).get("name", "None"), inline=True)
         embed.add_field(name="⚔️ W/L", value=f"{data.get('wins')}/{data.get('losses')}", inline=True)
+        if self.bot.api_degraded:
+            embed.set_footer(text="⚠️ Clash API degraded — this may be cached data.")
         await ctx.reply(embed=embed, mention_author=False)
 
     @commands.hybrid_command(name="chests")
@@ -79,14 +192,14 @@ class Link(commands.Cog):
             return await ctx.reply("❌ Link your account or provide a tag.", mention_author=False)
 
         url = f"{self.api_base}/players/%23{clean_tag}/upcomingchests"
-        data = await self.bot.fetch_api(url, ttl=60)
+        data = await self.bot.fetch_api(url)
         if not data:
-            return await ctx.reply("❌ Could not fetch chests.", mention_author=False)
+            return await ctx.reply("❌ Could not fetch chests." + self.bot.api_status_note(), mention_author=False)
 
         msg = "**Upcoming Chests:**\n"
         for chest in data.get("items", [])[:3]:
             msg += f"`+{chest.get('index',0) + 1}` **{chest.get('name')}**\n"
-        await ctx.reply(msg, mention_author=False)
+        await ctx.reply(msg + self.bot.api_status_note(), mention_author=False)
 
     @commands.hybrid_command(name="log", aliases=["battles", "history"])
     async def log(self, ctx, tag: str = None):
@@ -94,32 +207,44 @@ class Link(commands.Cog):
         if not clean_tag:
             return await ctx.reply("❌ Link your account or provide a tag.", mention_author=False)
 
-        url = f"{self.api_base}/players/%23{clean_tag}/battlelog"
-        data = await self.bot.fetch_api(url, ttl=30)
-        if not data:
-            return await ctx.reply("❌ Could not fetch battle log.", mention_author=False)
-
-        msg = f"📜 **Last 5 Battles for #{clean_tag}**\n\n"
-        for battle in data[:5]:
-            team = battle.get('team', [{}])[0].get('crowns', 0)
-            opp = battle.get('opponent', [{}])[0].get('crowns', 0)
-            result = "✅ Win" if team > opp else "❌ Loss" if team < opp else "🤝 Draw"
-            msg += f"{result}\n"
-        await ctx.reply(msg, mention_author=False)
-
-    @commands.hybrid_command(name="cleanup")
-    @commands.is_owner()
-    async def cleanup(self, ctx):
         loop = asyncio.get_running_loop()
-        def blocking_cleanup():
-            count = 0
-            for user in self.users.find():
-                if isinstance(user.get("_id"), int):
-                    self.users.delete_one({"_id": user["_id"]})
-                    count += 1
-            return count
-        cnt = await loop.run_in_executor(None, blocking_cleanup)
-        await ctx.reply(f"🧹 Cleaned {cnt} entries.", mention_author=False)
+        # Top up with anything newer than what's stored (only new battles are parsed)
+        url = f"{self.api_base}/players/%23{clean_tag}/battlelog"
+        data = await self.bot.fetch_api(url)
+        if data:
+            try:
+                with self.bot.tracer.span("mongo.battles.ingest", player=clean_tag):
+                    await loop.run_in_executor(None, battles.ingest, self.bot.db, clean_tag, data)
+            except Exception:
+                logging.getLogger("clashbot").exception("Battle ingest failed")
+
+        with self.bot.tracer.span("mongo.battles.find", player=clean_tag):
+            docs = await loop.run_in_executor(None, battles.load_log, self.bot.db, clean_tag)
+        if not docs:
+            return await ctx.reply("❌ Could not fetch battle log." + self.bot.api_status_note(), mention_author=False)
+
+        counts, decks = battles.summarize(docs, clean_tag)
+        played = sum(counts.values())
+        description = (
+            f"**{counts['win']}W / {counts['loss']}L / {counts['draw']}D** over {played} stored battles "
+            f"({counts['win'] / played * 100:.0f}% wins)"
+        )
+        for d in decks:
+            description += f"\n🃏 {', '.join(d['names'])} — {d['games']} games, {d['wins'] / d['games'] * 100:.0f}% wins"
+
+        def rows():
+            icons = {"win": "✅ Win", "loss": "❌ Loss", "draw": "🤝 Draw"}
+            for doc in docs:
+                mine, theirs = battles.own_side(doc, clean_tag)
+                crowns = f"{max((p.get('crowns', 0) for p in mine), default=0)}-{max((p.get('crowns', 0) for p in theirs), default=0)}"
+                opponent = " & ".join(p.get("name") or "?" for p in theirs)
+                change = next((p.get("trophy_change") for p in mine if p.get("tag") == clean_tag), None)
+                trophies = f" · {change:+d}🏆" if change else ""
+                yield (f"{icons[battles.result(doc, clean_tag)]} `{crowns}` vs **{opponent}** ({doc.get('mode') or doc.get('type')})"
+                       f"{trophies} · {doc['battle_time']:%Y-%m-%d %H:%M}")
+
+        await Paginator(f"📜 Battles for #{clean_tag}", rows(), author_id=ctx.author.id,
+                        description=description, footer=self.bot.api_status_note()).send(ctx)
 
 async def setup(bot):
     await bot.add_cog(Link(bot))
@@ -0,0 +1,168 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from discord.ext import commands, tasks
+from utils import retention
+from utils.leases import LeaseLost
+from utils.maintenance import JOBS, JOBS_BY_NAME, MaintenanceRunner
+
+PROGRESS_EVERY = 2.0  # seconds between progress message edits
+SCHEDULER_TICK_MINUTES = float(os.getenv("SCHEDULER_TICK_MINUTES", "5"))
+# Apply the retention policies (utils/retention.py) once a day
+RETENTION_SCHEDULE = os.getenv("RETENTION_SCHEDULE", "1") == "1"
+
+
+class Maintenance(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.runner = MaintenanceRunner(bot.db)
+        self.log = logging.getLogger("clashbot")
+        self._running = set()
+        self._retention_lock = asyncio.Lock()
+        if RETENTION_SCHEDULE:
+            self.retention_task.start()
+
+    def cog_unload(self):
+        self.retention_task.cancel()
+
+    def _select(self, name):
+        if name == "all":
+            return JOBS
+        job = JOBS_BY_NAME.get(name)
+        return [job] if job else None
+
+    async def _run(self, ctx, jobs, dry_run=False):
+        busy = [j.name for j in jobs if j.name in self._running]
+        if busy:
+            return await ctx.reply(f"⏳ Already running: {', '.join(busy)}", mention_author=False)
+
+        label = "🔎 Dry run" if dry_run else "🧰 Running"
+        status = await ctx.reply(f"{label}: starting {len(jobs)} job(s)...", mention_author=False)
+        last_edit = 0.0
+
+        async def on_progress(state):
+            nonlocal last_edit
+            if time.monotonic() - last_edit < PROGRESS_EVERY:
+                return
+            last_edit = time.monotonic()
+            try:
+                await status.edit(content=f"{label} `{state['job']}`: {state['matched']} scanned, {state['changed']} changed...")
+            except Exception:
+                pass
+
+        lines = []
+        for job in jobs:
+            self._running.add(job.name)
+            try:
+                with self.bot.tracer.span("maintenance.job", job=job.name, dry_run=dry_run):
+                    state = await self.runner.run(job, dry_run=dry_run, on_progress=on_progress)
+            except Exception as e:
+                self.log.exception(f"Maintenance job {job.name} failed")
+                lines.append(f"❌ `{job.name}`: {e} (rerun to resume)")
+                break
+            finally:
+                self._running.discard(job.name)
+            verb = "would change" if dry_run else "changed"
+            resumed = " *(resumed)*" if state["resumed"] else ""
+            lines.append(f"✅ `{job.name}`: {state['changed']} {verb} of {state['matched']} matched{resumed}")
+            if dry_run and state["samples"]:
+                lines.extend(f"  • `{s}`" for s in state["samples"])
+
+        report = f"{label} finished:\n" + "\n".join(lines)
+        try:
+            await status.edit(content=report[:1990])
+        except Exception:
+            await ctx.send(report[:1990])
+
+    @commands.hybrid_command(name="maintenance")
+    @commands.is_owner()
+    async def maintenance(self, ctx, mode: str = "list", job: str = "all"):
+        """Batched DB maintenance. Usage: !maintenance [list | dry <job|all> | run <job|all>]"""
+        mode = mode.lower()
+        if mode == "list":
+            loop = asyncio.get_running_loop()
+
+            def blocking_overview():
+                return [(j, self.runner.pending(j), self.runner.last_run(j)) for j in JOBS]
+
+            overview = await loop.run_in_executor(None, blocking_overview)
+            lines = ["🧰 **Maintenance jobs** (pending docs, last run)"]
+            for j, pending, last in overview:
+                when = f"{last['status']} {last['updated_at']:%Y-%m-%d %H:%M}" if last else "never"
+                lines.append(f"`{j.name}` — {pending} pending, {when}\n  {j.description}")
+            return await ctx.reply("\n".join(lines), mention_author=False)
+
+        if mode not in ("dry", "run"):
+            return await ctx.reply("❌ Usage: `!maintenance [list | dry <job|all> | run <job|all>]`", mention_author=False)
+        jobs = self._select(job)
+        if not jobs:
+            return await ctx.reply(f"❌ Unknown job `{job}`. Try `!maintenance list`.", mention_author=False)
+        await self._run(ctx, jobs, dry_run=mode == "dry")
+
+    @commands.hybrid_command(name="cleanup")
+    @commands.is_owner()
+    async def cleanup(self, ctx):
+        """Deletes legacy numeric-id user docs (shortcut for !maintenance run users.numeric_ids)."""
+        await self._run(ctx, [JOBS_BY_NAME["users.numeric_ids"]])
+
+
+    # --------------------
+    # Retention
+    # --------------------
+    async def _apply_retention(self, dry_run=False):
+        loop = asyncio.get_running_loop()
+        async with self._retention_lock:
+            with self.bot.tracer.span("maintenance.retention", dry_run=dry_run):
+                report = await loop.run_in_executor(None, lambda: retention.run(self.bot.db, self.bot.fs, dry_run=dry_run))
+        self.log.info(f"🗄️ Retention{' (dry run)' if dry_run else ''}: " + "; ".join(retention.format_report(report)))
+        return report
+
+    @tasks.loop(minutes=SCHEDULER_TICK_MINUTES)
+    async def retention_task(self):
+        """Once a day across all replicas, like the daily audit."""
+        period = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        try:
+            async with self.bot.leases.exclusive_run("retention", period) as run:
+                if run is None:
+                    return
+                await self._apply_retention()
+        except LeaseLost:
+            self.log.warning("🔒 Lost the retention lease mid-run; another replica will finish it")
+        except Exception:
+            self.log.exception("❌ Error in retention task")
+
+    @retention_task.before_loop
+    async def before_retention(self):
+        await self.bot.wait_until_ready()
+
+    @commands.hybrid_command(name="retention")
+    @commands.is_owner()
+    async def retention_cmd(self, ctx, mode: str = "report"):
+        """History retention. Usage: !retention [report | dry | run]"""
+        mode = mode.lower()
+        if mode == "report":
+            loop = asyncio.get_running_loop()
+            last = await loop.run_in_executor(None, retention.last_report, self.bot.db)
+            if not last:
+                return await ctx.reply("🗄️ Retention has not run yet. Try `!retention dry`.", mention_author=False)
+            lines = [f"🗄️ **Last retention run** ({last['finished_at']:%Y-%m-%d %H:%M} UTC)"]
+            return await ctx.reply("\n".join(lines + retention.format_report(last)), mention_author=False)
+        if mode not in ("dry", "run"):
+            return await ctx.reply("❌ Usage: `!retention [report | dry | run]`", mention_author=False)
+        if self._retention_lock.locked():
+            return await ctx.reply("⏳ Retention is already running.", mention_author=False)
+
+        status = await ctx.reply(f"🗄️ {'Dry run' if mode == 'dry' else 'Applying retention'}...", mention_author=False)
+        try:
+            report = await self._apply_retention(dry_run=mode == "dry")
+        except Exception as e:
+            self.log.exception("Retention run failed")
+            return await status.edit(content=f"❌ Retention failed: {e} (rerun to continue)")
+        label = "🔎 **Retention dry run**" if mode == "dry" else "🗄️ **Retention applied**"
+        await status.edit(content="\n".join([label] + retention.format_report(report))[:1990])
+
+
+async def setup(bot):
+    await bot.add_cog(Maintenance(bot))
@@ -0,0 +1,143 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from discord.ext import commands, tasks
+from utils import codec as schemas
+
+# Member scan of every active clan
+PREFETCH_SCAN_MINUTES = float(os.getenv("PREFETCH_SCAN_MINUTES", "2"))
+# Steady profile refresh rate (requests/second) so we never burst the API
+PREFETCH_RATE = float(os.getenv("PREFETCH_RATE", "2"))
+# Clans audited within this many days count as active
+PREFETCH_ACTIVE_DAYS = int(os.getenv("PREFETCH_ACTIVE_DAYS", "14"))
+
+# Queue priorities: members who just played first, then expiring entries
+PRIORITY_ACTIVE = 0
+PRIORITY_EXPIRING = 1
+
+
+class Prefetch(commands.Cog):
+    """Keeps /players/{tag} warm for every member of every active clan.
+
+    The scanner reads each clan's memberList and queues a profile refresh
+    when the member's lastSeen moved (they played, so cards/trophies may have
+    changed) or when the cached profile is about to expire. The drain loop
+    works the queue at PREFETCH_RATE requests per second.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.history = bot.db["clan_history"]
+        self.api_base = bot.api_base
+        self.log = logging.getLogger("clashbot")
+
+        self.queue = asyncio.PriorityQueue()
+        self.queued = set()
+        self.last_seen = {}  # player tag -> lastSeen from the last scan
+        self.refreshed = 0
+        self.failed = 0
+        self.last_scan = None
+
+        # Results land in the shared cache, so one cluster does this for all
+        if bot.is_primary:
+            self.scan.start()
+            self.drain.start()
+
+    def cog_unload(self):
+        self.scan.cancel()
+        self.drain.cancel()
+
+    def _player_url(self, tag):
+        return f"{self.api_base}/players/%23{tag.lstrip('#')}"
+
+    async def _active_clans(self):
+        loop = asyncio.get_running_loop()
+        since = datetime.now(timezone.utc) - timedelta(days=PREFETCH_ACTIVE_DAYS)
+
+        def blocking():
+            return self.history.distinct("clan_tag", {"timestamp": {"$gte": since}})
+        with self.bot.tracer.span("mongo.clan_history.distinct"):
+            audited = await loop.run_in_executor(None, blocking)
+        self.bot.active_clans.update(t.replace("#", "") for t in audited if t)
+        return sorted(self.bot.active_clans)
+
+    def _enqueue(self, priority, tag):
+        if tag in self.queued:
+            return False
+        self.queued.add(tag)
+        # time.monotonic() keeps FIFO order within a priority
+        self.queue.put_nowait((priority, time.monotonic(), tag))
+        return True
+
+    def _plan_member(self, member, horizon, seen_now):
+        """Queues a member's profile if it's stale or they've been active."""
+        tag = member.get("tag")
+        if not tag:
+            return
+        seen = member.get("lastSeen")
+        previous = self.last_seen.get(tag)
+        seen_now[tag] = seen
+
+        cached = self.bot.api_cache.get(self._player_url(tag))
+        if cached is None or (previous is not None and seen != previous):
+            self._enqueue(PRIORITY_ACTIVE, tag)
+        elif cached[0] < horizon:
+            self._enqueue(PRIORITY_EXPIRING, tag)
+
+    @tasks.loop(minutes=PREFETCH_SCAN_MINUTES)
+    async def scan(self):
+        if self.bot.api_degraded:
+            return
+        try:
+            clans = await self._active_clans()
+            # Anything expiring before the next scan gets refreshed now
+            horizon = time.time() + PREFETCH_SCAN_MINUTES * 60 * 1.5
+            seen_now = {}
+            for clan_tag in clans:
+                data = await self.bot.fetch_api(f"{self.api_base}/clans/%23{clan_tag}", schema=schemas.Clan)
+                for member in (data or {}).get("memberList", []):
+                    self._plan_member(member, horizon, seen_now)
+            # Members who left drop out here
+            self.last_seen = seen_now
+            self.last_scan = datetime.now(timezone.utc)
+        except Exception:
+            self.log.exception("❌ Prefetch scan failed")
+
+    @scan.before_loop
+    async def before_scan(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(seconds=1 / max(PREFETCH_RATE, 0.01))
+    async def drain(self):
+        # Don't spend the breaker's half-open probe on background work
+        if self.queue.empty() or self.bot.api_degraded:
+            return
+        _, _, tag = self.queue.get_nowait()
+        self.queued.discard(tag)
+        data = await self.bot.fetch_api(self._player_url(tag), force=True)
+        if data is None:
+            self.failed += 1
+        else:
+            self.refreshed += 1
+
+    @drain.before_loop
+    async def before_drain(self):
+        await self.bot.wait_until_ready()
+
+    @commands.hybrid_command(name="prefetchstatus")
+    @commands.is_owner()
+    async def prefetchstatus(self, ctx):
+        """Shows the background profile prefetcher's progress."""
+        scanned = self.last_scan.strftime("%H:%M:%S UTC") if self.last_scan else "never"
+        await ctx.reply(
+            f"♨️ **Prefetch:** {len(self.bot.active_clans)} clans, {len(self.last_seen)} members tracked\n"
+            f"Queue: {self.queue.qsize()} | Refreshed: {self.refreshed} | Failed: {self.failed}\n"
+            f"Last scan: {scanned} | Rate: {PREFETCH_RATE:g}/s",
+            mention_author=False
+        )
+
+
+async def setup(bot):
+    await bot.add_cog(Prefetch(bot))
@@ -1,7 +1,13 @@
+import os
 import asyncio
 import logging
+from datetime import datetime, timezone
 import discord
 from discord.ext import commands, tasks
+from utils.leases import LeaseLost
+
+SCHEDULER_TICK_MINUTES = float(os.getenv("SCHEDULER_TICK_MINUTES", "5"))
+REMINDER_HOURS = 12
 
 class Reminders(commands.Cog):
     def __init__(self, bot):
@@ -31,7 +37,7 @@ class Reminders(commands.Cog):
                 upsert=True
             )
         await loop.run_in_executor(None, blocking_upsert)
-        await ctx.reply(f"✅ War reminders will now be sent to {channel.mention} every 12 hours.", mention_author=False)
+        await ctx.reply(f"✅ War reminders will now be sent to {channel.mention} every {REMINDER_HOURS} hours.", mention_author=False)
 
     @commands.hybrid_command(name="stopreminders")
     @commands.has_permissions(manage_guild=True)
@@ -49,27 +55,48 @@ class Reminders(commands.Cog):
     async def testreminders(self, ctx):
         await ctx.reply("⚔️ **Reminder:** Use your war attacks! (Test successful)", mention_author=False)
 
-    @tasks.loop(hours=12)
+    @tasks.loop(minutes=SCHEDULER_TICK_MINUTES)
     async def loop(self):
+        # One reminder per guild per 12h block, whichever replica holds the lease
+        now = datetime.now(timezone.utc)
+        period = f"{now:%Y-%m-%d}T{now.hour // REMINDER_HOURS * REMINDER_HOURS:02d}"
+        # In cluster mode each process reminds only its own guilds
+        job = f"reminders:{self.bot.cluster_id}"
+        try:
+            async with self.bot.leases.exclusive_run(job, period) as run:
+                if run is None:
+                    return
+                await self._send_reminders(run)
+        except LeaseLost:
+            self.log.warning(f"🔒 Lost the {job} lease mid-run; another replica will finish it")
+        except Exception:
+            self.log.exception("❌ Error in reminders task")
+
+    async def _send_reminders(self, run):
         guild_rows = await self._fetch_guilds_list()
         for g in guild_rows:
-            if "channel_id" in g:
-                try:
-                    channel_id = g["channel_id"]
-                    channel = self.bot.get_channel(channel_id)
-                    if not channel:
-                        try:
-                            channel = await self.bot.fetch_channel(channel_id)
-                        except Exception:
-                            continue
-                    if channel:
-                        try:
-                            await channel.send("⚔️ **Reminder:** Use your war attacks! The river race is active.")
-                        except Exception:
-                            self.log.exception("Failed to send reminder to channel %s", channel_id)
-                    await asyncio.sleep(1)  # small pause to avoid mass-sends
-                except Exception:
-                    self.log.exception("Failed to process guild reminder")
+            if "channel_id" not in g or not self.bot.owns_guild(g["_id"]) or g["_id"] in run.done:
+                continue
+            try:
+                channel_id = g["channel_id"]
+                channel = self.bot.get_channel(channel_id)
+                if not channel:
+                    try:
+                        channel = await self.bot.fetch_channel(channel_id)
+                    except Exception:
+                        continue
+                if channel:
+                    try:
+                        await channel.send("⚔️ **Reminder:** Use your war attacks! The river race is active.")
+                    except Exception:
+                        self.log.exception("Failed to send reminder to channel %s", channel_id)
+                # Fenced: raises LeaseLost if another replica took over
+                await run.mark(g["_id"])
+                await asyncio.sleep(1)  # small pause to avoid mass-sends
+            except LeaseLost:
+                raise
+            except Exception:
+                self.log.exception("Failed to process guild reminder")
 
     @loop.before_loop
     async def before_loop(self):
@@ -1,6 +1,6 @@
-import asyncio
 import discord
 from discord.ext import commands
+from utils.paginator import Paginator
 
 class War(commands.Cog):
     def __init__(self, bot):
@@ -8,7 +8,7 @@ class War(commands.Cog):
         self.db = bot.db
         self.users = bot.db_users
         self.redis = bot.redis
-        self.api_base = "https://proxy.royaleapi.dev/v1"
+        self.api_base = bot.api_base
 
     async def _safe_defer(self, ctx):
         try:
@@ -39,7 +39,7 @@ class War(commands.Cog):
         if option and option.lower() == "last":
             fetch_last_war = True
         else:
-            data = await self.bot.fetch_api(current_url, ttl=30)
+            data = await self.bot.fetch_api(current_url)
             if data:
                 state = data.get("state")
                 if state == "active":
@@ -50,7 +50,7 @@ class War(commands.Cog):
 
         if fetch_last_war:
             log_url = f"{self.api_base}/clans/%23{clan_tag}/riverracelog?limit=1"
-            log_data = await self.bot.fetch_api(log_url, ttl=300)
+            log_data = await self.bot.fetch_api(log_url)
             if log_data and log_data.get("items"):
                 last_war = log_data["items"][0]
                 header_text = f"Last War Report (Season {last_war.get('seasonId')})"
@@ -66,7 +66,7 @@ class War(commands.Cog):
                     await ctx.reply("⚠️ **No active war.** Showing results from last race.", mention_author=False)
 
         if not participants:
-            return await ctx.reply("❌ No war data found (Clan might be inactive).", mention_author=False)
+            return await ctx.reply("❌ No war data found (Clan might be inactive)." + self.bot.api_status_note(), mention_author=False)
 
         # Build deck lists using raw decksUsed, treating any >=4 as perfect (4)
         deck_lists = {0: [], 1: [], 2: [], 3: [], 4: []}
@@ -77,23 +77,34 @@ class War(commands.Cog):
 
         sorted_p = sorted(participants, key=lambda x: x.get('fame', 0), reverse=True)[:5]
 
-        # Build Message
-        msg = f"📊 **{clan_name} {header_text}**\n\n"
-        def format_list(label, names, emoji):
-            if not names: return ""
-            return f"{emoji} **{label} ({len(names)}):**\n`{', '.join(names)}`\n\n"
-
-        msg += format_list("4/4 Decks (Perfect)", deck_lists.get(4, []), "✅")
-        msg += format_list("3/4 Decks (Missed One)", deck_lists.get(3, []), "⚠️")
-        msg += format_list("0/4 Decks (Sleeping)", deck_lists.get(0, []), "💤")
-
-        msg += "**🏅 Top 5 Fame Leaders:**\n"
-        for i, p in enumerate(sorted_p, 1):
-            msg += f"`{i}.` **{p.get('name')}**: {p.get('fame', 0)}\n"
-
-        if len(msg) > 2000:
-            msg = msg[:1900] + "\n...(truncated)"
-        await ctx.reply(msg, mention_author=False)
+        view = Paginator(
+            f"📊 {clan_name} {header_text}",
+            self._race_rows(deck_lists, sorted_p),
+            author_id=ctx.author.id,
+            footer=self.bot.api_status_note(),
+        )
+        await view.send(ctx)
+
+    @staticmethod
+    def _race_rows(deck_lists, top_fame, per_row=5):
+        """Yields the report line by line so the paginator only formats the
+        pages that get opened."""
+        groups = [
+            ("4/4 Decks (Perfect)", deck_lists.get(4, []), "✅"),
+            ("3/4 Decks (Missed One)", deck_lists.get(3, []), "⚠️"),
+            ("0/4 Decks (Sleeping)", deck_lists.get(0, []), "💤"),
+        ]
+        for label, names, emoji in groups:
+            if not names:
+                continue
+            yield f"{emoji} **{label} ({len(names)}):**"
+            for i in range(0, len(names), per_row):
+                yield f"`{', '.join(names[i:i + per_row])}`"
+            yield ""
+
+        yield "**🏅 Top 5 Fame Leaders:**"
+        for i, p in enumerate(top_fame, 1):
+            yield f"`{i}.` **{p.get('name')}**: {p.get('fame', 0)}"
 
     @commands.hybrid_command(name="war")
     async def war(self, ctx, tag: str = None):
@@ -108,9 +119,9 @@ class War(commands.Cog):
 
         clean_clan_tag = target_tag.replace("#", "")
         url = f"{self.api_base}/clans/%23{clean_clan_tag}/currentriverrace"
-        data = await self.bot.fetch_api(url, ttl=30)
+        data = await self.bot.fetch_api(url)
         if not data:
-            return await ctx.reply(f"❌ API Error or no data", mention_author=False)
+            return await ctx.reply(f"❌ API Error or no data" + self.bot.api_status_note(), mention_author=False)
 
         state = data.get("state", "Unknown")
         clan_name = data.get("clan", {}).get("name", "Unknown")
@@ -122,28 +133,13 @@ class War(commands.Cog):
             f"⚔️ **{clan_name}**\n"
             f"**State:** {state}\n"
             f"**Fame:** {fame}\n"
-            f"**Active:** {active}/{len(participants)}"
-        )
+            f"**Active:** {active}/{len(participants)}\n"
+            f"📺 **[Watch live]({self.bot.public_url}/live/{clean_clan_tag.upper()})**"
+        ) + self.bot.api_status_note()
         await ctx.reply(msg, mention_author=False)
 
     async def get_clan_tag(self, ctx):
-        discord_id = str(ctx.author.id)
-        if self.redis:
-            cached_tag = self.redis.get(f"clan_tag:{discord_id}")
-            if cached_tag:
-                return cached_tag
-        user_data = await asyncio.get_running_loop().run_in_executor(None, lambda: self.users.find_one({"_id": discord_id}))
-        if not user_data:
-            return None
-        clean_tag = user_data["player_id"].replace("#", "")
-        url = f"{self.api_base}/players/%23{clean_tag}"
-        data = await self.bot.fetch_api(url, ttl=3600)
-        if not data:
-            return None
-        clan_tag = data.get("clan", {}).get("tag", "").replace("#", "")
-        if clan_tag and self.redis:
-            self.redis.setex(f"clan_tag:{discord_id}", 3600, clan_tag)
-        return clan_tag
+        return await self.bot.identity.clan_tag(ctx.author.id)
 
 async def setup(bot):
     await bot.add_cog(War(bot))
@@ -0,0 +1,626 @@
+"""Flask dashboard and web reports.
+
+Imported lazily from ClashBot.setup_hook so Flask (and its imports) stay off
+the critical startup path. Routes read through the bot's runtime state.
+"""
+import os
+import asyncio
+import logging
+import threading
+from utils import rollups
+from utils import leaderboard
+from utils import storage
+from utils.live import RaceFeedHub, CLAN_TAG
+from utils.codec import codec
+
+log = logging.getLogger("clashbot")
+
+# --- TEMPLATES ---
+DASHBOARD_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Graveyard Bot Dashboard</title>
+    <style>
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #f0f2f5; padding: 20px; color: #333; }
+        h1 { text-align: center; color: #444; margin-bottom: 30px; }
+        .container { max-width: 1000px; margin: 0 auto; background: white; padding: 20px; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.1); }
+        table { border-collapse: collapse; width: 100%; margin-top: 20px; }
+        th, td { padding: 15px; text-align: left; border-bottom: 1px solid #eee; }
+        th { background-color: #4CAF50; color: white; font-weight: 600; text-transform: uppercase; font-size: 0.9em; }
+        tr:hover { background-color: #f8f9fa; }
+        .tag { font-family: monospace; color: #666; background: #eee; padding: 2px 6px; border-radius: 4px; }
+        .trophy { color: #d32f2f; font-weight: bold; }
+        .rank { font-weight: 500; color: #2c3e50; }
+        .empty { text-align: center; color: #999; padding: 40px; }
+        .filters, .pager { margin-top: 10px; color: #666; }
+        .filters a, .pager a, a.clan { color: #4CAF50; margin: 0 6px; text-decoration: none; }
+        .filters a.active { font-weight: bold; text-decoration: underline; }
+        .pager { text-align: center; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>🏆 Graveyard Bot Dashboard</h1>
+        <div class="filters">
+            Sort:
+            {% for key in sorts %}
+            <a href="?sort={{ key }}{% if clan %}&clan={{ clan }}{% endif %}" class="{{ 'active' if key == sort else '' }}">{{ key }}</a>
+            {% endfor %}
+            {% if clan %}· Clan <span class="tag">#{{ clan }}</span> <a href="?sort={{ sort }}">(all clans)</a>{% endif %}
+        </div>
+        {% if users %}
+        <table>
+            <thead>
+                <tr>
+                    <th>#</th>
+                    <th>Discord User</th>
+                    <th>Player</th>
+                    <th>Rank / Arena</th>
+                    <th>Trophies</th>
+                </tr>
+            </thead>
+            <tbody>
+                {% for user in users %}
+                <tr>
+                    <td>{{ first_rank + loop.index0 }}</td>
+                    <td><b>{{ user.discord_name }}</b></td>
+                    <td>{{ user.name }} <span class="tag">{{ user.player_tag }}</span>
+                        {% if user.clan_tag and not clan %}<a class="clan" href="?sort={{ sort }}&clan={{ user.clan_tag }}">#{{ user.clan_tag }}</a>{% endif %}</td>
+                    <td class="rank">{{ user.rank }}</td>
+                    <td class="trophy">🏆 {{ user.trophies }}</td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+        <div class="pager">
+            {% if prev_cursor %}<a href="?sort={{ sort }}{% if clan %}&clan={{ clan }}{% endif %}&before={{ prev_cursor }}&page={{ page - 1 }}">← Prev</a>{% endif %}
+            <span>Page {{ page }}</span>
+            {% if next_cursor %}<a href="?sort={{ sort }}{% if clan %}&clan={{ clan }}{% endif %}&after={{ next_cursor }}&page={{ page + 1 }}">Next →</a>{% endif %}
+        </div>
+        {% else %}
+        <div class="empty">No linked users found. Use <code>!link</code> in Discord!</div>
+        {% endif %}
+        {% if unranked %}<div class="empty">{{ unranked }} linked account(s) have no stats yet; they appear after their next audit or command.</div>{% endif %}
+    </div>
+</body>
+</html>
+"""
+
+REPORT_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Graveyard Bot Report</title>
+    <style>
+        body { font-family: 'Segoe UI', sans-serif; background-color: #e9ecef; padding: 20px; }
+        .container { max-width: 1100px; margin: 0 auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+        .header { background: #343a40; color: white; padding: 20px; display: flex; justify-content: space-between; align-items: center; }
+        .header h1 { margin: 0; font-size: 1.5em; }
+        .meta { font-size: 0.9em; color: #adb5bd; }
+        
+        table { width: 100%; border-collapse: collapse; }
+        th { background: #f8f9fa; color: #495057; font-weight: 600; text-align: left; padding: 12px 15px; border-bottom: 2px solid #dee2e6; }
+        td { padding: 12px 15px; border-bottom: 1px solid #dee2e6; vertical-align: middle; }
+        
+        /* Expandable Rows */
+        .main-row { cursor: pointer; transition: background 0.2s; }
+        .main-row:hover { background-color: #f1f3f5; }
+        .detail-row { background-color: #fafafa; display: none; }
+        .detail-content { padding: 20px; border-left: 4px solid #4CAF50; margin: 10px 0; }
+        
+        .grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(200px, 1fr)); gap: 15px; }
+        .stat-box { background: white; padding: 10px; border: 1px solid #eee; border-radius: 4px; }
+        .stat-label { font-size: 0.8em; color: #888; text-transform: uppercase; margin-bottom: 4px; }
+        .stat-value { font-weight: bold; color: #333; }
+        
+        .tag { font-family: monospace; background: #e2e6ea; padding: 2px 6px; border-radius: 4px; font-size: 0.9em; }
+        .warn { color: #dc3545; font-weight: bold; }
+        .good { color: #28a745; font-weight: bold; }
+        
+        .toggle-icon { display: inline-block; width: 20px; text-align: center; transition: transform 0.2s; }
+        .expanded .toggle-icon { transform: rotate(90deg); }
+    </style>
+    <script>
+        function toggleRow(id) {
+            var detailRow = document.getElementById('detail-' + id);
+            var mainRow = document.getElementById('main-' + id);
+            if (detailRow.style.display === 'table-row') {
+                detailRow.style.display = 'none';
+                mainRow.classList.remove('expanded');
+            } else {
+                detailRow.style.display = 'table-row';
+                mainRow.classList.add('expanded');
+            }
+        }
+    </script>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <div>
+                <h1>{{ title }}</h1>
+                <div class="meta">ID: {{ report_id }} • {{ timestamp }}</div>
+            </div>
+            <div>
+                {% if export_url %}<a href="{{ export_url }}" style="color:white; text-decoration:none; border:1px solid white; padding:5px 10px; border-radius:4px;">Download CSV</a>{% endif %}
+                <a href="/" style="color:white; text-decoration:none; border:1px solid white; padding:5px 10px; border-radius:4px;">Back to Dashboard</a>
+            </div>
+        </div>
+
+        <table>
+            <thead>
+                <tr>
+                    <th style="width: 30px;"></th>
+                    {% for col in columns %}
+                    <th>{{ col }}</th>
+                    {% endfor %}
+                </tr>
+            </thead>
+            <tbody>
+                {% for row in data %}
+                <tr id="main-{{ loop.index }}" class="main-row" onclick="toggleRow('{{ loop.index }}')">
+                    <td><span class="toggle-icon">▶</span></td>
+                    {% for cell in row.summary %}
+                    <td>{{ cell|safe }}</td>
+                    {% endfor %}
+                </tr>
+                <tr id="detail-{{ loop.index }}" class="detail-row">
+                    <td colspan="{{ columns|length + 1 }}">
+                        <div class="detail-content">
+                            <div class="grid">
+                                {% for key, val in row.details.items() %}
+                                <div class="stat-box">
+                                    <div class="stat-label">{{ key }}</div>
+                                    <div class="stat-value">{{ val }}</div>
+                                </div>
+                                {% endfor %}
+                            </div>
+                        </div>
+                    </td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+    </div>
+</body>
+</html>
+"""
+
+TREND_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Graveyard Bot Trend</title>
+    <style>
+        body { font-family: 'Segoe UI', sans-serif; background-color: #e9ecef; padding: 20px; }
+        .container { max-width: 1100px; margin: 0 auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+        .header { background: #343a40; color: white; padding: 20px; display: flex; justify-content: space-between; align-items: center; }
+        .header h1 { margin: 0; font-size: 1.5em; }
+        .meta { font-size: 0.9em; color: #adb5bd; }
+        h2 { font-size: 1.1em; color: #495057; padding: 15px 15px 0; margin: 0; }
+        table { width: 100%; border-collapse: collapse; }
+        th { background: #f8f9fa; color: #495057; font-weight: 600; text-align: left; padding: 12px 15px; border-bottom: 2px solid #dee2e6; }
+        td { padding: 10px 15px; border-bottom: 1px solid #dee2e6; vertical-align: middle; }
+        .bar { background: #e9ecef; border-radius: 4px; width: 160px; height: 12px; display: inline-block; vertical-align: middle; margin-right: 8px; }
+        .fill { background: #4CAF50; height: 12px; border-radius: 4px; }
+        .empty { text-align: center; color: #999; padding: 40px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <div>
+                <h1>{{ title }}</h1>
+                <div class="meta">Last {{ weeks }} weeks • from pre-aggregated audit rollups</div>
+            </div>
+            <a href="/" style="color:white; text-decoration:none; border:1px solid white; padding:5px 10px; border-radius:4px;">Back to Dashboard</a>
+        </div>
+        {% if weekly %}
+        <h2>Weekly</h2>
+        <table>
+            <thead><tr>{% for col in columns %}<th>{{ col }}</th>{% endfor %}</tr></thead>
+            <tbody>
+                {% for row in weekly %}
+                <tr>
+                    <td>{{ row.label }}</td>
+                    <td><span class="bar"><div class="fill" style="width: {{ row.pct }}%"></div></span>{{ row.pct }}%</td>
+                    <td>{{ row.activity }}</td>
+                    <td>{{ row.donations }}</td>
+                    <td>{{ row.fame }}</td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+        <h2>Daily</h2>
+        <table>
+            <thead><tr>{% for col in columns %}<th>{{ col }}</th>{% endfor %}</tr></thead>
+            <tbody>
+                {% for row in daily %}
+                <tr>
+                    <td>{{ row.label }}</td>
+                    <td><span class="bar"><div class="fill" style="width: {{ row.pct }}%"></div></span>{{ row.pct }}%</td>
+                    <td>{{ row.activity }}</td>
+                    <td>{{ row.donations }}</td>
+                    <td>{{ row.fame }}</td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+        {% else %}
+        <div class="empty">No audit history in this window yet.</div>
+        {% endif %}
+    </div>
+</body>
+</html>
+"""
+
+
+LIVE_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Live River Race #{{ clan_tag }}</title>
+    <style>
+        body { font-family: 'Segoe UI', sans-serif; background-color: #e9ecef; padding: 20px; }
+        .container { max-width: 900px; margin: 0 auto; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+        .header { background: #343a40; color: white; padding: 20px; display: flex; justify-content: space-between; align-items: center; }
+        .header h1 { margin: 0; font-size: 1.5em; }
+        .meta { font-size: 0.9em; color: #adb5bd; }
+        .dot { display: inline-block; width: 10px; height: 10px; border-radius: 50%; background: #adb5bd; margin-right: 6px; }
+        .dot.on { background: #28a745; }
+        h2 { font-size: 1.1em; margin: 20px 20px 0; color: #495057; }
+        table { width: 100%; border-collapse: collapse; }
+        th { background: #f8f9fa; color: #495057; font-weight: 600; text-align: left; padding: 10px 15px; border-bottom: 2px solid #dee2e6; }
+        td { padding: 8px 15px; border-bottom: 1px solid #dee2e6; }
+        tr.us { background: #e8f5e9; font-weight: bold; }
+        .flash { animation: flash 1.5s; }
+        @keyframes flash { from { background: #fff3cd; } to { background: transparent; } }
+        .error { color: #dc3545; padding: 20px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <div>
+                <h1 id="title">📺 Live River Race #{{ clan_tag }}</h1>
+                <div class="meta"><span id="dot" class="dot"></span><span id="status">Connecting...</span></div>
+            </div>
+            <a href="/" style="color:white; text-decoration:none; border:1px solid white; padding:5px 10px; border-radius:4px;">Back to Dashboard</a>
+        </div>
+        <div id="error" class="error" style="display:none"></div>
+        <h2>Standings</h2>
+        <table><thead><tr><th>Clan</th><th>Fame</th><th>Today</th></tr></thead><tbody id="standings"></tbody></table>
+        <h2>Members</h2>
+        <table><thead><tr><th>#</th><th>Name</th><th>Fame</th><th>Decks Today</th><th>Decks Total</th></tr></thead><tbody id="members"></tbody></table>
+    </div>
+    <script>
+        const tag = "#{{ clan_tag }}";
+        const fame = {};
+        function cell(text) { const td = document.createElement("td"); td.textContent = text; return td; }
+        function fill(id, rows, render) {
+            const body = document.getElementById(id);
+            body.replaceChildren(...rows.map(render));
+        }
+        const source = new EventSource("/live/{{ clan_tag }}/stream");
+        source.onopen = () => { document.getElementById("dot").className = "dot on"; };
+        source.onerror = () => {
+            document.getElementById("dot").className = "dot";
+            document.getElementById("status").textContent = "Reconnecting...";
+        };
+        source.addEventListener("race", (e) => {
+            const s = JSON.parse(e.data);
+            const err = document.getElementById("error");
+            if (s.error) { err.textContent = s.error; err.style.display = "block"; return; }
+            err.style.display = "none";
+            document.getElementById("title").textContent = `📺 ${s.clan.name} — ${s.periodType || s.state}`;
+            document.getElementById("status").textContent = `Updated ${new Date(s.updated).toLocaleTimeString()}`;
+            fill("standings", s.standings, (c) => {
+                const tr = document.createElement("tr");
+                if (c.tag === tag) tr.className = "us";
+                tr.append(cell(c.name), cell(c.fame), cell(c.periodPoints));
+                return tr;
+            });
+            fill("members", s.participants, (p, i) => {
+                const tr = document.createElement("tr");
+                if (fame[p.name] !== undefined && fame[p.name] !== p.fame) tr.className = "flash";
+                fame[p.name] = p.fame;
+                tr.append(cell(i + 1), cell(p.name), cell(p.fame), cell(`${p.decksUsedToday}/4`), cell(p.decksUsed));
+                return tr;
+            });
+        });
+    </script>
+</body>
+</html>
+"""
+
+
+def _json_provider():
+    from flask.json.provider import DefaultJSONProvider
+
+    class CodecJSONProvider(DefaultJSONProvider):
+        """jsonify()/request.json through utils.codec (orjson when installed).
+        Unknown types (ObjectId, datetime) fall back to str()."""
+
+        def dumps(self, obj, **kwargs):
+            return codec.encode(obj).decode("utf-8")
+
+        def loads(self, s, **kwargs):
+            return codec.decode(s)
+
+    return CodecJSONProvider
+
+
+REPORT_COLLECTIONS = {"audit": "clan_history", "scout": "scout_history"}
+
+
+def create_app(bot):
+    from flask import Flask, Response, render_template_string, request
+    from bson import ObjectId
+
+    app = Flask(__name__)
+    app.json = _json_provider()(app)
+    # One upstream poller per watched clan, shared by every /live viewer
+    live = RaceFeedHub(bot)
+
+    # --- ROUTES ---
+
+    @app.route("/")
+    def home():
+        if not bot or not (bot.standalone or bot.is_ready()):
+            return "<h1>Bot is starting...</h1><p>Please wait a moment for the data to load.</p>", 503
+
+        sort = request.args.get("sort", "trophies")
+        if sort not in leaderboard.SORTS:
+            sort = "trophies"
+        clan = request.args.get("clan", "").upper().lstrip("#") or None
+        after = leaderboard.decode_cursor(request.args["after"]) if request.args.get("after") else None
+        before = leaderboard.decode_cursor(request.args["before"]) if request.args.get("before") and not after else None
+        try:
+            page = max(1, int(request.args.get("page", 1)))
+        except ValueError:
+            page = 1
+        if not (after or before):
+            page = 1
+
+        try:
+            docs, has_prev, has_next = leaderboard.load_page(bot.db_users, sort, clan, after=after, before=before)
+            unranked = leaderboard.unranked_count(bot.db_users, clan) if page == 1 else 0
+
+            dashboard_data = []
+            for user in docs:
+                try:
+                    discord_obj = bot.get_user(int(user["_id"]))
+                except (TypeError, ValueError):
+                    discord_obj = None
+                dashboard_data.append({
+                    "discord_name": discord_obj.name if discord_obj else f"Unknown ({user['_id']})",
+                    "name": user.get("name", ""),
+                    "player_tag": user.get("player_id", ""),
+                    "clan_tag": user.get("clan_tag"),
+                    "rank": user.get("arena") or "N/A",
+                    "trophies": user.get("trophies", "N/A"),
+                })
+
+            return render_template_string(
+                DASHBOARD_TEMPLATE,
+                users=dashboard_data,
+                sorts=list(leaderboard.SORTS),
+                sort=sort,
+                clan=clan,
+                page=page,
+                first_rank=(page - 1) * leaderboard.PAGE_SIZE + 1,
+                prev_cursor=leaderboard.encode_cursor(docs[0], sort) if docs and has_prev else None,
+                next_cursor=leaderboard.encode_cursor(docs[-1], sort) if docs and has_next else None,
+                unranked=unranked,
+            )
+
+        except Exception:
+            log.exception("Dashboard: Critical error in home route")
+            return "<h1>Internal Server Error</h1>", 500
+
+    @app.route("/report/<rtype>/<rid>")
+    def view_report(rtype, rid):
+        if not ObjectId.is_valid(rid):
+            return "Report not found", 404
+        try:
+            if rtype == "audit":
+                doc = bot.db["clan_history"].find_one({"_id": ObjectId(rid)})
+                if not doc: return "Report not found", 404
+
+                title = f"🛡️ Audit Log: {doc.get('clan_tag')}"
+                columns = ["Name", "Role", "War Decks", "Status"]
+                data = []
+
+                for m in storage.members_of(doc):
+                    used = m.get('war_decks', 0)
+                    expected = m.get('expected_decks', 0)
+
+                    # Logic for status color
+                    if expected > 0 and used < expected:
+                        status = f"<span class='warn'>Missed ({used}/{expected})</span>"
+                    else:
+                        status = "<span class='good'>OK</span>"
+
+                    data.append({
+                        "summary": [
+                            m.get('name', 'Unknown'), 
+                            m.get('role', 'Member').capitalize(),
+                            f"{used} / {expected}",
+                            status
+                        ],
+                        "details": {
+                            "Tag": f"#{m.get('tag')}",
+                            "Trophies": m.get('trophies', 0),
+                            "Arena": m.get('arena', 'Unknown'),
+                            "Donations Sent": m.get('donations', 0),
+                            "Donations Received": m.get('donations_received', 0),
+                            "Fame Earned": m.get('fame', 0),
+                            "Last Seen": (m.get('last_seen') or 'Unknown').replace('T', ' ')[:16],
+                            "Days Inactive": m.get('days_since_seen', 'N/A')
+                        }
+                    })
+
+                export_url = f"/report/audit/{rid}/csv" if doc.get("csv_gridfs_id") else None
+                return render_template_string(REPORT_TEMPLATE, title=title, report_id=rid, timestamp=doc.get('timestamp'), columns=columns, data=data, export_url=export_url)
+
+            elif rtype == "scout":
+                doc = bot.db["scout_history"].find_one({"_id": ObjectId(rid)})
+                if not doc: return "Report not found", 404
+
+                title = f"⚔️ Scout Report: {doc.get('clan_tag')}"
+                columns = ["Opponent", "Trophies", "Deck Archetype"]
+                data = []
+
+                for battle in doc.get("battles", []):
+                    cards = battle.get("cards", [])
+                    # Simple archetype guess based on first 3 cards
+                    archetype = ", ".join(cards[:3]) + "..." if cards else "Unknown"
+
+                    data.append({
+                        "summary": [
+                            battle.get('opponent', 'Unknown'),
+                            f"🏆 {battle.get('trophies', 0)}",
+                            archetype
+                        ],
+                        "details": {
+                            "Full Deck": ", ".join(cards),
+                            "Result": "Analyzed from Recent Battles"
+                        }
+                    })
+
+                return render_template_string(REPORT_TEMPLATE, title=title, report_id=rid, timestamp=doc.get('timestamp'), columns=columns, data=data)
+
+        except Exception:
+            log.exception("Error rendering report")
+            return "Internal Server Error", 500
+
+    @app.route("/trend/<kind>/<tag>")
+    def view_trend(kind, tag):
+        if kind not in ("player", "clan"):
+            return "Unknown trend type", 404
+        tag = tag.lstrip("#").upper()
+        try:
+            weeks = max(1, min(int(request.args.get("weeks", 8)), 26))
+        except ValueError:
+            weeks = 8
+        try:
+            weekly = rollups.load_trend(bot.db, kind, tag, weeks)
+            daily = rollups.load_daily(bot.db, kind, tag, weeks)
+        except Exception:
+            log.exception("Error loading trend")
+            return "Internal Server Error", 500
+
+        def row(r, label):
+            if kind == "clan":
+                activity = f"{r.get('avg_active_members', r.get('active_members')) or 0:.1f} active / {r.get('avg_members', r.get('members')) or 0:.0f}"
+            elif "days_active" in r:
+                activity = f"{r['days_active']}/{r.get('days_sampled', 0)} days active"
+            else:
+                seen = r.get("days_since_seen")
+                activity = "N/A" if seen is None else f"seen {seen}d ago"
+            return {
+                "label": label,
+                "pct": round((r.get("avg_completion", r.get("deck_completion_pct")) or 0) * 100),
+                "activity": activity,
+                "donations": r.get("donations") or 0,
+                "fame": r.get("fame") or 0,
+            }
+
+        name = next((r.get("name") for r in reversed(weekly) if r.get("name")), None)
+        title = f"📈 Clan #{tag}" if kind == "clan" else f"📈 {name or '#' + tag}"
+        return render_template_string(
+            TREND_TEMPLATE, title=title, weeks=weeks,
+            columns=["Period", "Deck Completion", "Activity", "Donations", "Fame"],
+            weekly=[row(r, r["week"]) for r in weekly],
+            daily=[row(r, r["day"]) for r in reversed(daily)],
+        )
+
+    @app.route("/live/<clan_tag>")
+    def live_race(clan_tag):
+        clan_tag = clan_tag.lstrip("#").upper()
+        if not CLAN_TAG.fullmatch(clan_tag):
+            return "Invalid clan tag", 404
+        return render_template_string(LIVE_TEMPLATE, clan_tag=clan_tag)
+
+    @app.route("/live/<clan_tag>/stream")
+    def live_stream(clan_tag):
+        clan_tag = clan_tag.lstrip("#").upper()
+        if not CLAN_TAG.fullmatch(clan_tag):
+            return "Invalid clan tag", 404
+        feed = live.subscribe(clan_tag)
+        if feed is None:
+            return "Too many live viewers, try again later", 503
+        resp = Response(live.stream(feed), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        resp.call_on_close(lambda: live.unsubscribe(feed))
+        return resp
+
+    @app.route("/api/report/<rtype>/<rid>")
+    def report_json(rtype, rid):
+        """Raw report document, encoded once without going through Jinja."""
+        collection = REPORT_COLLECTIONS.get(rtype)
+        if not collection:
+            return {"error": "unknown report type"}, 404
+        if not ObjectId.is_valid(rid):
+            return {"error": "report not found"}, 404
+        try:
+            doc = bot.db[collection].find_one({"_id": ObjectId(rid)})
+        except Exception:
+            log.exception("Error loading report")
+            return {"error": "internal error"}, 500
+        if not doc:
+            return {"error": "report not found"}, 404
+        if "members_packed" in doc:
+            doc["members"] = storage.members_of(doc)
+            del doc["members_packed"]
+        return Response(codec.encode(doc), mimetype="application/json")
+
+    @app.route("/report/audit/<rid>/csv")
+    def audit_csv(rid):
+        """The audit's CSV from GridFS, decompressed on the way out."""
+        if not ObjectId.is_valid(rid):
+            return "CSV not found", 404
+        try:
+            doc = bot.db["clan_history"].find_one({"_id": ObjectId(rid)}, {"csv_gridfs_id": 1, "clan_tag": 1})
+            if not doc or not doc.get("csv_gridfs_id"):
+                return "CSV not found", 404
+            data = storage.get_blob(bot.fs, doc["csv_gridfs_id"])
+        except Exception:
+            log.exception("Error exporting audit CSV")
+            return "Internal Server Error", 500
+        return Response(data, mimetype="text/csv", headers={
+            "Content-Disposition": f"attachment; filename=audit_{doc.get('clan_tag')}_{rid}.csv",
+        })
+
+    return app
+
+def run_dashboard(app):
+    port = int(os.getenv("PORT", 10000))
+    try:
+        app.run(host="0.0.0.0", port=port)
+    except OSError:
+        app.run(host="0.0.0.0", port=5001)
+
+def start_dashboard(bot):
+    """Builds the app and serves it from a daemon thread. Returns the app."""
+    app = create_app(bot)
+    threading.Thread(target=run_dashboard, args=(app,), daemon=True).start()
+    return app
+
+
+def run_standalone():
+    """`python dashboard.py`: the dashboard as its own process (cluster mode),
+    with its own runtime reading the shared Mongo and Redis cache."""
+    import bot as bot_module
+
+    b = bot_module.bot
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True, name="dashboard-runtime").start()
+    asyncio.run_coroutine_threadsafe(b.start_runtime(), loop).result()
+    log.info("🌐 Dashboard running standalone")
+    run_dashboard(create_app(b))
+
+
+if __name__ == "__main__":
+    run_standalone()
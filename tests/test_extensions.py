@@ -0,0 +1,21 @@
+"""Every extension in bot.EXTENSIONS loads together.
+
+Command names and aliases share one namespace, so a clash between two cogs
+only shows up as a CommandRegistrationError when both are loaded.
+"""
+import asyncio
+
+from benchmarks.fakes import build_bot
+
+
+def test_all_extensions_load():
+    async def run():
+        bot_module, b = await build_bot("http://127.0.0.1:9")
+        try:
+            assert sorted(b.extensions) == sorted(bot_module.EXTENSIONS)
+            names = [name for c in b.commands for name in (c.name, *c.aliases)]
+            assert len(names) == len(set(names))
+        finally:
+            await b.close()
+
+    asyncio.run(run())
@@ -0,0 +1,102 @@
+"""CircuitBreaker transitions, including probes that never report back."""
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+import bot as bot_module
+from utils import http
+from utils.http import CircuitBreaker
+from utils.tracing import Tracer
+from utils.ttl import TTLPolicy
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(http.time, "monotonic", lambda: now[0])
+    return now
+
+
+def tripped(clock):
+    breaker = CircuitBreaker(threshold=2, reset_after=30.0, max_reset=120.0)
+    breaker.record_failure("timeout")
+    breaker.record_failure("timeout")
+    return breaker
+
+
+def test_trips_after_threshold(clock):
+    breaker = CircuitBreaker(threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = tripped(clock)
+    clock[0] += 30
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_doubles_cool_down(clock):
+    breaker = tripped(clock)
+    for expected in (60.0, 120.0, 120.0):
+        clock[0] += breaker.reset_after
+        assert breaker.allow()
+        breaker.record_failure("HTTP 503")
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.reset_after == expected
+
+
+def test_lost_probe_rearms_after_deadline(clock):
+    breaker = tripped(clock)
+    clock[0] += 30
+    assert breaker.allow()
+    # The probe never records an outcome
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+class HangingSession:
+    """http_session whose requests never complete."""
+
+    def get(self, url):
+        return self
+
+    async def __aenter__(self):
+        await asyncio.Event().wait()
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_cancelled_probe_is_released(clock):
+    async def run():
+        breaker = tripped(clock)
+        clock[0] += 30
+        fake = SimpleNamespace(
+            tracer=Tracer(), api_cache={}, api_cache_hits=Counter(), shared_cache=None,
+            ttl_policy=TTLPolicy(), api_breaker=breaker, api_semaphore=asyncio.Semaphore(1),
+            http_session=HangingSession(),
+        )
+        probe = asyncio.create_task(bot_module.ClashBot.fetch_api(fake, "http://api/v1/clans/%23X"))
+        await asyncio.sleep(0.01)
+        assert breaker.state == CircuitBreaker.HALF_OPEN and not breaker.allow()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert breaker.allow()
+
+    asyncio.run(run())
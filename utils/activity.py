@@ -0,0 +1,144 @@
+"""Per-clan hour-of-week activity, built from every clan fetch.
+
+Whenever a fresh /clans/<tag> payload arrives (audits, the prefetch
+scanner, commands), each member whose lastSeen moved adds one observation
+to the hour-of-week (0 = Monday 00:00 UTC) it falls in:
+
+    activity {_id: clan_tag, members: {tag: {name, seen, h: {"<hour>": weight}}}}
+
+Only hours that were ever observed are stored. Weights use forward decay:
+an observation at time t is stored as 2 ** ((t - EPOCH) / half-life), so
+updates are plain $inc's (commutative, safe across replicas). Readers
+divide by the same factor for "now", which makes old activity fade with
+ACTIVITY_HALF_LIFE_DAYS without ever rewriting the stored buckets.
+
+A member's `seen` (their last counted lastSeen) makes the update
+conditional, so a lastSeen is counted once however many replicas or
+commands fetch the clan.
+"""
+import os
+import re
+import asyncio
+import logging
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+
+log = logging.getLogger("clashbot")
+
+ACTIVITY_HALF_LIFE_DAYS = float(os.getenv("ACTIVITY_HALF_LIFE_DAYS", "28"))
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+HOURS = 24 * 7
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+API_TIME_FORMAT = "%Y%m%dT%H%M%S.000Z"
+
+CLAN_URL = re.compile(r"/clans/%23([0-9A-Z]+)$")
+
+
+def hour_of_week(ts):
+    return ts.weekday() * 24 + ts.hour
+
+
+def hour_label(h):
+    return f"{DAYS[h // 24]} {h % 24:02d}:00"
+
+
+def _weight(ts):
+    return 2.0 ** ((ts - EPOCH).total_seconds() / 86400 / ACTIVITY_HALF_LIFE_DAYS)
+
+
+def _parse(last_seen):
+    try:
+        return datetime.strptime(last_seen, API_TIME_FORMAT).replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+class ActivityTracker:
+    def __init__(self, db):
+        self.coll = db["activity"]
+        # clan -> {tag: lastSeen} already sent, so unchanged members cost nothing
+        self._sent = {}
+
+    def _updates(self, clan_tag, members):
+        """(update ops, {tag: lastSeen} to mark sent once they're written)."""
+        sent = self._sent.get(clan_tag, {})
+        ops, pending = [], {}
+        for m in members:
+            tag = (m.get("tag") or "").lstrip("#")
+            seen = m.get("lastSeen")
+            ts = _parse(seen)
+            if not tag or ts is None or sent.get(tag) == seen or tag in pending:
+                continue
+            pending[tag] = seen
+            field = f"members.{tag}"
+            ops.append(UpdateOne(
+                {"_id": clan_tag, "$or": [{f"{field}.seen": {"$lt": seen}}, {f"{field}.seen": {"$exists": False}}]},
+                {"$set": {f"{field}.seen": seen, f"{field}.name": m.get("name")},
+                 "$inc": {f"{field}.h.{hour_of_week(ts)}": _weight(ts)}},
+            ))
+        return ops, pending
+
+    def record(self, clan_tag, data):
+        """Blocking. Folds a /clans/<tag> payload in; returns observations added."""
+        ops, pending = self._updates(clan_tag, (data or {}).get("memberList", []))
+        if not ops:
+            return 0
+        self.coll.update_one({"_id": clan_tag}, {"$setOnInsert": {"members": {}}}, upsert=True)
+        modified = self.coll.bulk_write(ops, ordered=False).modified_count
+        # Only now, so a failed write is retried on the next fetch
+        self._sent.setdefault(clan_tag, {}).update(pending)
+        return modified
+
+    def observe_url(self, url, data):
+        """Hook for fetch_api: schedules record() for fresh clan payloads."""
+        match = CLAN_URL.search(url)
+        if not match or not data:
+            return
+        loop = asyncio.get_running_loop()
+        fut = loop.run_in_executor(None, self.record, match.group(1), data)
+
+        def done(f):
+            if not f.cancelled() and f.exception():
+                log.warning(f"Activity record failed for {match.group(1)}: {f.exception()!r}")
+        fut.add_done_callback(done)
+
+    async def observe(self, clan_tag, data):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.record, clan_tag, data)
+
+    def load(self, clan_tag, now=None):
+        """Blocking. (clan buckets [168], {tag: (name, buckets [168])}) in
+        decayed observation counts as of `now`."""
+        doc = self.coll.find_one({"_id": clan_tag}) or {}
+        scale = 1.0 / _weight(now or datetime.now(timezone.utc))
+        clan = [0.0] * HOURS
+        members = {}
+        for tag, m in (doc.get("members") or {}).items():
+            buckets = [0.0] * HOURS
+            for h, w in (m.get("h") or {}).items():
+                buckets[int(h)] = w * scale
+                clan[int(h)] += w * scale
+            members[tag] = (m.get("name") or tag, buckets)
+        return clan, members
+
+
+def heatmap(buckets):
+    """7 lines (Mon..Sun) of 24 shaded cells, one per UTC hour."""
+    shades = " ░▒▓█"
+    top = max(buckets) or 1.0
+    header = [" "] * 24
+    for h in (0, 6, 12, 18):
+        header[h:h + len(str(h))] = str(h)
+    lines = ["    " + "".join(header)]
+    for d, day in enumerate(DAYS):
+        row = buckets[d * 24:(d + 1) * 24]
+        lines.append(f"{day} " + "".join(shades[min(len(shades) - 1, int(v / top * (len(shades) - 1) + 0.5))] for v in row))
+    return "\n".join(lines)
+
+
+def peak(buckets):
+    """(hour of week, hour of day) with the most activity, or None."""
+    if not any(buckets):
+        return None
+    by_hour = [sum(buckets[d * 24 + h] for d in range(7)) for h in range(24)]
+    return max(range(HOURS), key=buckets.__getitem__), max(range(24), key=by_hour.__getitem__)
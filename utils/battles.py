@@ -0,0 +1,145 @@
+"""Stored battle history, ingested from /players/<tag>/battlelog.
+
+    battles        {_id: "<battleTime>:<sorted player tags>", battle_time, type, mode,
+                    players: [tags], winners: [tags], sides: [[{tag, name, crowns,
+                    trophies, trophy_change, cards: [ids], card_names}], ...]}
+    battle_cursors {_id: player tag, last_time, ingested, updated_at}
+
+The _id is unique per battle, so a battle seen from both players' logs (or
+by two replicas) is stored once. Each player's cursor remembers the newest
+battleTime already ingested; a fetch only parses and inserts the battles
+after it, and duplicate-key errors from races are ignored.
+
+All functions here are blocking; run them in an executor.
+"""
+import os
+from datetime import datetime, timezone
+from pymongo import DESCENDING
+from pymongo.errors import BulkWriteError
+
+BATTLE_TIME_FORMAT = "%Y%m%dT%H%M%S.000Z"
+LOG_MAX_BATTLES = int(os.getenv("LOG_MAX_BATTLES", "1000"))
+DUPLICATE_KEY = 11000
+
+
+def ensure_indexes(db):
+    db["battles"].create_index([("players", 1), ("battle_time", DESCENDING)])
+    db["battles"].create_index([("battle_time", DESCENDING)])
+
+
+def parse_time(s):
+    try:
+        return datetime.strptime(s, BATTLE_TIME_FORMAT).replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+def _side(players):
+    return [{
+        "tag": (p.get("tag") or "").lstrip("#"),
+        "name": p.get("name"),
+        "crowns": p.get("crowns", 0),
+        "trophies": p.get("startingTrophies"),
+        "trophy_change": p.get("trophyChange"),
+        "cards": [c.get("id") for c in p.get("cards", [])],
+        "card_names": [c.get("name") for c in p.get("cards", [])],
+    } for p in players or []]
+
+
+def battle_doc(battle):
+    """A battlelog entry as a `battles` document, or None if it can't be keyed."""
+    ts = parse_time(battle.get("battleTime"))
+    team, opponent = _side(battle.get("team")), _side(battle.get("opponent"))
+    players = sorted(p["tag"] for p in team + opponent if p["tag"])
+    if ts is None or not players:
+        return None
+    team_crowns = max((p["crowns"] for p in team), default=0)
+    opp_crowns = max((p["crowns"] for p in opponent), default=0)
+    winners = team if team_crowns > opp_crowns else opponent if opp_crowns > team_crowns else []
+    return {
+        "_id": f"{battle['battleTime']}:{','.join(players)}",
+        "battle_time": ts,
+        "type": battle.get("type"),
+        "mode": (battle.get("gameMode") or {}).get("name"),
+        "arena": (battle.get("arena") or {}).get("name"),
+        "players": players,
+        "winners": [p["tag"] for p in winners],
+        "sides": [team, opponent],
+    }
+
+
+def ingest(db, player_tag, log):
+    """Stores the battles in `log` newer than the player's cursor. Returns
+    the number of new battle documents."""
+    player_tag = player_tag.lstrip("#")
+    cursors = db["battle_cursors"]
+    cursor = cursors.find_one({"_id": player_tag}) or {}
+    last = cursor.get("last_time")
+    if last is not None and last.tzinfo is None:
+        last = last.replace(tzinfo=timezone.utc)
+
+    docs = []
+    for battle in log or []:
+        ts = parse_time(battle.get("battleTime"))
+        # The log is newest first; everything past the cursor is already stored
+        if ts is None or (last is not None and ts <= last):
+            continue
+        doc = battle_doc(battle)
+        if doc:
+            docs.append(doc)
+    if not docs:
+        return 0
+
+    inserted = len(docs)
+    try:
+        db["battles"].insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != DUPLICATE_KEY for err in errors):
+            raise
+        inserted -= len(errors)
+    cursors.update_one(
+        {"_id": player_tag},
+        {"$max": {"last_time": max(d["battle_time"] for d in docs)},
+         "$inc": {"ingested": inserted},
+         "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    return inserted
+
+
+def load_log(db, player_tag, limit=LOG_MAX_BATTLES):
+    """The player's stored battles, newest first."""
+    return list(db["battles"].find({"players": player_tag}).sort("battle_time", DESCENDING).limit(limit))
+
+
+def own_side(doc, player_tag):
+    """(player's side, opponent side) of a stored battle."""
+    sides = doc.get("sides") or [[], []]
+    if any(p.get("tag") == player_tag for p in sides[0]):
+        return sides[0], sides[1]
+    return sides[1], sides[0]
+
+
+def result(doc, player_tag):
+    if player_tag in doc.get("winners", []):
+        return "win"
+    return "draw" if not doc.get("winners") else "loss"
+
+
+def summarize(docs, player_tag, top_decks=3):
+    """Win/loss/draw counts and the most played decks with their win rates."""
+    counts = {"win": 0, "loss": 0, "draw": 0}
+    decks = {}
+    for doc in docs:
+        outcome = result(doc, player_tag)
+        counts[outcome] += 1
+        mine = next((p for p in own_side(doc, player_tag)[0] if p.get("tag") == player_tag), None)
+        if not mine or len(mine.get("cards", [])) != 8:
+            continue
+        key = tuple(sorted(mine["cards"]))
+        entry = decks.setdefault(key, {"names": mine.get("card_names", []), "games": 0, "wins": 0})
+        entry["games"] += 1
+        entry["wins"] += outcome == "win"
+    ranked = sorted(decks.values(), key=lambda d: d["games"], reverse=True)[:top_decks]
+    return counts, ranked
@@ -0,0 +1,94 @@
+import os
+import json
+import time
+import zlib
+import logging
+
+log = logging.getLogger("clashbot")
+
+REDIS_PREFIX = "apicache:"
+
+
+def _dumps(obj):
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def as_bytes(value):
+    """Redis hands back str with decode_responses=True; the cache holds bytes."""
+    return value.encode("utf-8") if isinstance(value, str) else value
+
+
+class CacheSnapshotStore:
+    """Persists the hottest api_cache entries across restarts.
+
+    Entries hold the raw JSON body as returned by the API, so nothing is
+    re-encoded on save or decoded on load.
+
+    Redis (when configured): one key per URL, the body as-is, with the
+    entry's remaining TTL as the key TTL so Redis expires it for us.
+    Otherwise a zlib-compressed JSON file with absolute expiry times.
+    """
+
+    def __init__(self, redis_conn=None, path=None, max_entries=500, min_ttl=5):
+        self.redis = redis_conn
+        self.path = path
+        self.max_entries = max_entries
+        self.min_ttl = min_ttl
+
+    def pick_hottest(self, cache, hits, now=None):
+        """[(url, expires_at, raw)] for the most-hit entries still alive."""
+        now = now or time.time()
+        alive = [(url, entry) for url, entry in cache.items() if entry[0] - now >= self.min_ttl]
+        alive.sort(key=lambda kv: hits.get(kv[0], 0), reverse=True)
+        return [(url, entry[0], entry[1]) for url, entry in alive[:self.max_entries]]
+
+    def save(self, entries, now=None):
+        """Blocking. Returns the number of entries written."""
+        now = now or time.time()
+        if not entries:
+            return 0
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=False)
+            for url, expires_at, raw in entries:
+                pipe.setex(f"{REDIS_PREFIX}{url}", max(1, int(expires_at - now)), raw)
+            pipe.execute()
+            return len(entries)
+        if self.path:
+            rows = [(url, exp, raw.decode("utf-8")) for url, exp, raw in entries]
+            blob = zlib.compress(_dumps({"v": 2, "saved": now, "entries": rows}).encode("utf-8"), 6)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, self.path)
+            return len(entries)
+        return 0
+
+    def load(self, now=None):
+        """Blocking. Returns [(url, expires_at, raw)] that haven't expired."""
+        now = now or time.time()
+        if self.redis:
+            keys = list(self.redis.scan_iter(match=f"{REDIS_PREFIX}*", count=500))
+            if not keys:
+                return []
+            pipe = self.redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.get(key)
+                pipe.ttl(key)
+            raw = pipe.execute()
+            out = []
+            for key, value, ttl in zip(keys, raw[0::2], raw[1::2]):
+                if value is None or ttl is None or ttl < self.min_ttl:
+                    continue
+                out.append((key[len(REDIS_PREFIX):], now + ttl, as_bytes(value)))
+            return out
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "rb") as f:
+                    payload = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+            except Exception:
+                log.exception("Cache snapshot unreadable, ignoring")
+                return []
+            # v1 snapshots stored decoded objects
+            encode = (lambda d: d.encode("utf-8")) if payload.get("v", 1) >= 2 else (lambda d: _dumps(d).encode("utf-8"))
+            return [(url, exp, encode(data)) for url, exp, data in payload.get("entries", []) if exp - now >= self.min_ttl]
+        return []
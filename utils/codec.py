@@ -0,0 +1,142 @@
+import os
+import json
+import logging
+from typing import List, TypedDict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+log = logging.getLogger("clashbot")
+
+
+# --- Schemas ---
+# Only the fields the cogs read. With msgspec, decoding into these skips
+# everything else in the payload (and the result is still a plain dict,
+# so cogs keep using .get()). Without msgspec they are ignored.
+
+class Arena(TypedDict, total=False):
+    name: str
+
+class ClanRef(TypedDict, total=False):
+    tag: str
+    name: str
+
+class Member(TypedDict, total=False):
+    tag: str
+    name: str
+    role: str
+    lastSeen: str
+    expLevel: int
+    trophies: int
+    arena: Arena
+    clanRank: int
+    donations: int
+    donationsReceived: int
+
+class Clan(TypedDict, total=False):
+    tag: str
+    name: str
+    description: str
+    clanScore: int
+    clanWarTrophies: int
+    location: Arena
+    requiredTrophies: int
+    members: int
+    memberList: List[Member]
+
+class Participant(TypedDict, total=False):
+    tag: str
+    name: str
+    fame: int
+    repairPoints: int
+    decksUsed: int
+    decksUsedToday: int
+
+class RaceClan(TypedDict, total=False):
+    tag: str
+    name: str
+    fame: int
+    participants: List[Participant]
+
+class RiverRace(TypedDict, total=False):
+    state: str
+    periodType: str
+    periodIndex: int
+    sectionIndex: int
+    seasonId: int
+    startTime: str
+    clan: RaceClan
+
+class Card(TypedDict, total=False):
+    name: str
+    id: int
+    level: int
+    maxLevel: int
+
+class PlayerCards(TypedDict, total=False):
+    tag: str
+    name: str
+    cards: List[Card]
+
+class Player(TypedDict, total=False):
+    tag: str
+    name: str
+    expLevel: int
+    trophies: int
+    wins: int
+    losses: int
+    role: str
+    clan: ClanRef
+    arena: Arena
+
+
+class JSONCodec:
+    """Decodes API bodies straight from bytes with the fastest backend
+    available (orjson > msgspec > stdlib json) and encodes dashboard JSON."""
+
+    def __init__(self, backend="auto"):
+        if backend == "auto":
+            backend = "orjson" if orjson else "msgspec" if msgspec else "json"
+        if backend == "orjson" and orjson is None or backend == "msgspec" and msgspec is None:
+            log.warning(f"JSON backend {backend} not installed, using stdlib json")
+            backend = "json"
+        self.backend = backend
+        self._typed = {}
+
+        if backend == "orjson":
+            self._loads = orjson.loads
+            self._dumps = lambda obj: orjson.dumps(obj, default=str)
+        elif backend == "msgspec":
+            self._loads = msgspec.json.decode
+            self._dumps = lambda obj: msgspec.json.encode(obj, enc_hook=str)
+        else:
+            self._loads = json.loads
+            self._dumps = lambda obj: json.dumps(obj, separators=(",", ":"), default=str).encode("utf-8")
+
+    def decode(self, raw, schema=None):
+        """bytes -> dict/list. With a schema and msgspec installed, only the
+        schema's fields are materialised."""
+        if schema is not None and msgspec is not None:
+            decoder = self._typed.get(schema)
+            if decoder is None:
+                decoder = self._typed[schema] = msgspec.json.Decoder(schema)
+            try:
+                return decoder.decode(raw)
+            except msgspec.ValidationError:
+                # Upstream changed a type; fall back to the untyped path
+                pass
+        return self._loads(raw)
+
+    def encode(self, obj):
+        """obj -> UTF-8 JSON bytes (ObjectId/datetime via str())."""
+        return self._dumps(obj)
+
+
+codec = JSONCodec(os.getenv("JSON_CODEC", "auto"))
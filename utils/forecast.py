@@ -0,0 +1,192 @@
+"""Monte Carlo river-race forecast.
+
+Each participant gets a fame-per-deck distribution and a play rate:
+
+    samples     per-deck fame from day-over-day deltas in player_rollup_daily
+                (last FORECAST_HISTORY_WEEKS), plus this race's fame/decksUsed;
+                players with few samples borrow the clan's pooled ones
+    play rate   their mean deck completion over the same window
+
+simulate() plays out every remaining war day for FORECAST_SIMS races in one
+batched array computation: decks played ~ Binomial(decks left that day,
+play rate), each player-day's fame per deck drawn from their samples.
+Results are cached per race state (fame, period, every participant's deck
+counts), so repeated !forecast calls between battles cost nothing.
+"""
+import os
+import hashlib
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from utils import rollups
+
+GOAL = 10000
+DECKS_PER_DAY = 4
+WAR_DAYS = 4
+FORECAST_SIMS = int(os.getenv("FORECAST_SIMS", "4000"))
+FORECAST_HISTORY_WEEKS = int(os.getenv("FORECAST_HISTORY_WEEKS", "8"))
+FORECAST_CACHE_SIZE = 64
+# Below this many samples a player's distribution is padded with the clan's
+MIN_SAMPLES = 4
+DEFAULT_PLAY_RATE = 0.75
+DEFAULT_FAME_PER_DECK = 150.0
+
+
+def war_days_left(data):
+    """War days remaining including today (periodIndex counts 7 days a
+    week, the last 4 of them war days)."""
+    idx = data.get("periodIndex")
+    if idx is None:
+        return WAR_DAYS
+    return max(1, min(WAR_DAYS, 7 - idx % 7))
+
+
+def state_key(clan_tag, data):
+    clan = data.get("clan") or {}
+    parts = [clan_tag, data.get("periodType"), data.get("periodIndex"), clan.get("fame", 0)]
+    parts += sorted((p.get("tag"), p.get("decksUsed", 0), p.get("decksUsedToday", 0), p.get("fame", 0))
+                    for p in clan.get("participants", []))
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def load_history(db, tags, weeks=FORECAST_HISTORY_WEEKS):
+    """Blocking. {tag: (fame-per-deck samples, completion values)} from daily rollups."""
+    since = rollups.day_key(datetime.now(timezone.utc) - timedelta(weeks=weeks))
+    rows = db[rollups.PLAYER_DAILY].find(
+        {"player_tag": {"$in": list(tags)}, "day": {"$gte": since}},
+        {"player_tag": 1, "day": 1, "week": 1, "war_decks": 1, "fame": 1, "deck_completion_pct": 1},
+    ).sort([("player_tag", 1), ("day", 1)])
+
+    out = {}
+    prev = None
+    for r in rows:
+        samples, completion = out.setdefault(r["player_tag"], ([], []))
+        decks, fame = r.get("war_decks") or 0, r.get("fame") or 0
+        # decks and fame are running totals within a week
+        if prev and prev["player_tag"] == r["player_tag"] and prev.get("week") == r.get("week"):
+            d_decks, d_fame = decks - (prev.get("war_decks") or 0), fame - (prev.get("fame") or 0)
+        else:
+            d_decks, d_fame = decks, fame
+        if d_decks > 0 and d_fame >= 0:
+            samples.append(d_fame / d_decks)
+        if r.get("deck_completion_pct") is not None and decks:
+            completion.append(r["deck_completion_pct"])
+        prev = r
+    return out
+
+
+def build_inputs(data, history):
+    """Per-participant arrays for simulate(): (tags, decks left today,
+    play rates, padded samples, sample counts)."""
+    participants = (data.get("clan") or {}).get("participants", [])
+    tags = [p.get("tag", "").lstrip("#") for p in participants]
+
+    per_player = []
+    for p, tag in zip(participants, tags):
+        samples, completion = history.get(tag, ([], []))
+        samples = list(samples)
+        used = p.get("decksUsed", 0)
+        if used:
+            # This race counts once per war day already played
+            samples += [p.get("fame", 0) / used] * max(1, used // DECKS_PER_DAY)
+        per_player.append((samples, completion))
+
+    pooled = [s for samples, _ in per_player for s in samples] or [DEFAULT_FAME_PER_DECK]
+    rates = [np.mean(c) for _, c in per_player if c]
+    clan_rate = float(np.mean(rates)) if rates else DEFAULT_PLAY_RATE
+
+    k = max([max(len(s), MIN_SAMPLES) for s, _ in per_player] + [len(pooled)])
+    samples = np.zeros((len(tags), k))
+    counts = np.zeros(len(tags), dtype=np.int64)
+    play = np.zeros(len(tags))
+    for i, (s, completion) in enumerate(per_player):
+        if len(s) < MIN_SAMPLES:
+            s = s + pooled
+        s = s[:k]
+        samples[i, :len(s)] = s
+        counts[i] = len(s)
+        play[i] = min(1.0, max(0.0, float(np.mean(completion)) if completion else clan_rate))
+
+    left_today = np.array([max(0, DECKS_PER_DAY - p.get("decksUsedToday", 0)) for p in participants])
+    return tags, left_today, play, samples, counts
+
+
+def simulate(fame, days, left_today, play, samples, counts, sims=FORECAST_SIMS, goal=GOAL, seed=None):
+    """Plays out `days` war days `sims` times. Returns
+    {p_by_day: [P(finished by end of day d)], p_finish, decks: (p10, p50, p90) or None,
+     fame_end: (p10, p50, p90)}."""
+    rng = np.random.default_rng(seed)
+    players = len(play)
+    if not players:
+        return {"p_by_day": [0.0] * days, "p_finish": 0.0, "decks": None, "fame_end": (fame, fame, fame)}
+
+    avail = np.full((players, days), DECKS_PER_DAY)
+    avail[:, 0] = left_today
+    # (sims, players, days)
+    played = rng.binomial(avail[None, :, :], play[None, :, None], size=(sims, players, days))
+    pick = (rng.random((sims, players, days)) * counts[None, :, None]).astype(np.int64)
+    per_deck = samples[np.arange(players)[None, :, None], pick]
+
+    day_fame = (played * per_deck).sum(axis=1)  # (sims, days)
+    day_decks = played.sum(axis=1)
+    cum_fame = fame + np.cumsum(day_fame, axis=1)
+    cum_decks = np.cumsum(day_decks, axis=1)
+    finished = cum_fame >= goal
+
+    done = finished.any(axis=1)
+    decks = None
+    if done.any():
+        # Decks into the finishing day, at that day's simulated fame per deck
+        day = finished[done].argmax(axis=1)[:, None]
+        fame_before = np.take_along_axis(cum_fame[done] - day_fame[done], day, axis=1)[:, 0]
+        decks_before = np.take_along_axis(cum_decks[done] - day_decks[done], day, axis=1)[:, 0]
+        rate = np.take_along_axis(day_fame[done], day, axis=1)[:, 0] / np.maximum(
+            np.take_along_axis(day_decks[done], day, axis=1)[:, 0], 1)
+        needed = decks_before + np.ceil(np.maximum(goal - fame_before, 0) / np.maximum(rate, 1e-9))
+        decks = tuple(int(x) for x in np.percentile(needed, [10, 50, 90]))
+
+    return {
+        "p_by_day": finished.mean(axis=0).tolist(),
+        "p_finish": float(done.mean()),
+        "decks": decks,
+        "fame_end": tuple(int(x) for x in np.percentile(cum_fame[:, -1], [10, 50, 90])),
+    }
+
+
+class RaceForecaster:
+    def __init__(self, bot, sims=FORECAST_SIMS):
+        self.bot = bot
+        self.sims = sims
+        self._cache = OrderedDict()
+
+    async def forecast(self, clan_tag, data):
+        """Forecast for a /currentriverrace payload, cached per race state."""
+        key = state_key(clan_tag, data)
+        hit = self._cache.get(key)
+        if hit is not None:
+            self._cache.move_to_end(key)
+            return hit
+
+        loop = asyncio.get_running_loop()
+        participants = (data.get("clan") or {}).get("participants", [])
+        tags = [p.get("tag", "").lstrip("#") for p in participants]
+        with self.bot.tracer.span("mongo.rollups.find", kind="forecast", players=len(tags)):
+            history = await loop.run_in_executor(None, load_history, self.bot.db, tags)
+
+        days = war_days_left(data)
+        fame = (data.get("clan") or {}).get("fame", 0)
+
+        def run():
+            _, left_today, play, samples, counts = build_inputs(data, history)
+            return simulate(fame, days, left_today, play, samples, counts, self.sims, seed=int(key[:8], 16))
+
+        with self.bot.tracer.span("forecast.simulate", sims=self.sims, days=days):
+            result = await loop.run_in_executor(None, run)
+        result.update({"fame": fame, "goal": GOAL, "days": days, "first_day": WAR_DAYS - days + 1,
+                       "sims": self.sims, "players": len(tags)})
+
+        self._cache[key] = result
+        while len(self._cache) > FORECAST_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return result
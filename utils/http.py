@@ -0,0 +1,114 @@
+import os
+import time
+import logging
+import aiohttp
+
+log = logging.getLogger("clashbot")
+
+# --- TRANSPORT CONFIG ---
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "10"))
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "8"))
+HTTP_TOTAL_TIMEOUT = float(os.getenv("HTTP_TOTAL_TIMEOUT", "12"))
+
+
+def build_session(headers):
+    """ClientSession tuned for a single upstream host: bounded keep-alive
+    pool, cached DNS and per-request timeouts so a hung call can't hold an
+    api_semaphore slot forever."""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_SIZE,
+        limit_per_host=HTTP_POOL_PER_HOST,
+        ttl_dns_cache=300,
+        keepalive_timeout=HTTP_KEEPALIVE,
+        enable_cleanup_closed=True,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=HTTP_TOTAL_TIMEOUT,
+        connect=HTTP_CONNECT_TIMEOUT,
+        sock_connect=HTTP_CONNECT_TIMEOUT,
+        sock_read=HTTP_READ_TIMEOUT,
+    )
+    return aiohttp.ClientSession(headers=headers, connector=connector, timeout=timeout)
+
+
+class CircuitBreaker:
+    """Trips after `threshold` consecutive upstream failures (timeouts,
+    connection errors, 429/5xx). While open, calls fail fast; after the
+    cool-down one probe is let through (half-open). Each failed probe
+    doubles the cool-down up to `max_reset`. A probe that never reports
+    back (cancelled, or released) doesn't wedge the breaker: another is let
+    through once it's been out for the cool-down."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold=5, reset_after=30.0, max_reset=300.0):
+        self.threshold = threshold
+        self.base_reset = reset_after
+        self.max_reset = max_reset
+        self.reset_after = reset_after
+        self.failures = 0
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+    @property
+    def degraded(self):
+        return self.state != self.CLOSED
+
+    @property
+    def retry_in(self):
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_after - time.monotonic())
+
+    def allow(self):
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and self.retry_in <= 0:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and self._probe_in_flight:
+            # Lost probe: give up on it after the cool-down
+            if time.monotonic() - self._probe_started >= self.reset_after:
+                self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            self._probe_started = time.monotonic()
+            return True
+        return False
+
+    def release_probe(self):
+        """The call allow() let through ended without an outcome (e.g. it
+        was cancelled); let the next one probe."""
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            log.info("🟢 Clash API circuit closed again")
+        self.failures = 0
+        self.state = self.CLOSED
+        self.reset_after = self.base_reset
+        self._probe_in_flight = False
+
+    def record_failure(self, reason=None):
+        self.failures += 1
+        if self.state == self.HALF_OPEN:
+            self.reset_after = min(self.max_reset, self.reset_after * 2)
+            self._trip(reason)
+        elif self.state == self.CLOSED and self.failures >= self.threshold:
+            self._trip(reason)
+
+    def _trip(self, reason):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        self._probe_in_flight = False
+        log.warning(f"🔴 Clash API circuit open for {self.reset_after:.0f}s after {self.failures} failures ({reason})")
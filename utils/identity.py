@@ -0,0 +1,203 @@
+"""Resolves a Discord user to their linked player tag, clan tag and clan role.
+
+    L1  bounded in-process LRU (IDENTITY_CACHE_SIZE entries, IDENTITY_TTL s)
+    L2  Redis identity:<discord_id>, shared by replicas (IDENTITY_REDIS_TTL s)
+        users collection + /players/<tag>
+
+Entries are dropped when !link changes a user's tag and rewritten when an
+audit sees a linked member's role or clan change. The TTLs only bound how
+long changes nobody observed stay visible (including another replica's L1
+after an invalidation).
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from utils import codec as schemas
+from utils.codec import codec
+from utils import leaderboard
+
+log = logging.getLogger("clashbot")
+
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "5000"))
+IDENTITY_TTL = float(os.getenv("IDENTITY_TTL", "300"))
+IDENTITY_REDIS_TTL = int(os.getenv("IDENTITY_REDIS_TTL", "3600"))
+REDIS_PREFIX = "identity:"
+LEADER_ROLES = ("leader", "coLeader")
+
+_MISSING = object()
+
+
+class IdentityResolver:
+    def __init__(self, bot, maxsize=IDENTITY_CACHE_SIZE, ttl=IDENTITY_TTL):
+        self.bot = bot
+        self.users = bot.db_users
+        self.redis = bot.redis
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+    # --- L1 ---
+
+    def _get_local(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return _MISSING
+        expires, ident = entry
+        if expires < time.monotonic():
+            del self._cache[key]
+            return _MISSING
+        self._cache.move_to_end(key)
+        return ident
+
+    def _set_local(self, key, ident):
+        self._cache[key] = (time.monotonic() + self.ttl, ident)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    # --- L2 (blocking; Redis errors count as a miss) ---
+
+    def _get_redis(self, key):
+        if not self.redis:
+            return None
+        try:
+            raw = self.redis.get(f"{REDIS_PREFIX}{key}")
+        except Exception as e:
+            log.warning(f"Identity cache read failed: {e}")
+            return None
+        return codec.decode(raw) if raw else None
+
+    def _set_redis(self, idents):
+        if not self.redis or not idents:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for ident in idents:
+                pipe.setex(f"{REDIS_PREFIX}{ident['discord_id']}", IDENTITY_REDIS_TTL, codec.encode(ident))
+            pipe.execute()
+        except Exception as e:
+            log.warning(f"Identity cache write failed: {e}")
+
+    def _delete_redis(self, keys):
+        if not self.redis or not keys:
+            return
+        try:
+            self.redis.delete(*(f"{REDIS_PREFIX}{k}" for k in keys))
+        except Exception as e:
+            log.warning(f"Identity cache delete failed: {e}")
+
+    # --- lookup ---
+
+    async def resolve(self, discord_id):
+        """{"discord_id", "player_tag", "clan_tag", "role", "name"} or None
+        if the user hasn't linked. clan_tag and role are None when the player
+        has no clan or the API could not be reached."""
+        key = str(discord_id)
+        ident = self._get_local(key)
+        if ident is not _MISSING:
+            self.hits += 1
+            return ident
+        self.misses += 1
+
+        # Concurrent commands from one user share a single lookup
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, key):
+        loop = asyncio.get_running_loop()
+        ident = await loop.run_in_executor(None, self._get_redis, key)
+        if ident is not None:
+            self._set_local(key, ident)
+            return ident
+
+        with self.bot.tracer.span("mongo.users.find_one"):
+            user = await loop.run_in_executor(None, self.users.find_one, {"_id": key})
+        if not user or not user.get("player_id"):
+            # Cached locally only, so a !link on any replica shows up within IDENTITY_TTL
+            self._set_local(key, None)
+            return None
+
+        player_tag = user["player_id"].replace("#", "")
+        data = await self.bot.fetch_api(f"{self.bot.api_base}/players/%23{player_tag}", schema=schemas.Player)
+        clan_tag = ((data or {}).get("clan") or {}).get("tag", "").replace("#", "") or None
+        ident = {
+            "discord_id": key,
+            "player_tag": player_tag,
+            "clan_tag": clan_tag,
+            "role": data.get("role") if data and clan_tag else None,
+            "name": (data or {}).get("name"),
+        }
+        if data:
+            # Don't cache an API failure as "no clan"
+            self._set_local(key, ident)
+            await loop.run_in_executor(None, self._set_redis, [ident])
+            # Keeps the dashboard leaderboard current for users who use commands
+            await loop.run_in_executor(None, leaderboard.store, self.users, {key: leaderboard.player_fields(data)})
+        return ident
+
+    async def player_tag(self, discord_id):
+        ident = await self.resolve(discord_id)
+        return ident["player_tag"] if ident else None
+
+    async def clan_tag(self, discord_id):
+        ident = await self.resolve(discord_id)
+        return ident["clan_tag"] if ident else None
+
+    async def is_leader(self, discord_id):
+        ident = await self.resolve(discord_id)
+        return bool(ident and ident["role"] in LEADER_ROLES)
+
+    # --- invalidation ---
+
+    async def invalidate(self, *discord_ids):
+        """Forgets users everywhere; call after their link changes."""
+        keys = [str(d) for d in discord_ids]
+        for key in keys:
+            self._cache.pop(key, None)
+        await asyncio.get_running_loop().run_in_executor(None, self._delete_redis, keys)
+
+    async def observe_members(self, clan_tag, members, linked):
+        """Reconciles cached identities with a fresh member list.
+
+        `members` are audit rows ({"tag", "name", "role"}, tags without #)
+        and `linked` maps player tag -> discord id. Linked members whose
+        cached clan or role differs are rewritten; cached users who claimed
+        this clan but are no longer in it are dropped. Returns how many
+        identities changed.
+        """
+        in_clan = {m["tag"]: m for m in members}
+        fresh, changed = [], 0
+        for player_tag, discord_id in linked.items():
+            m = in_clan.get(player_tag)
+            if m is None:
+                continue
+            key = str(discord_id)
+            ident = {"discord_id": key, "player_tag": player_tag, "clan_tag": clan_tag,
+                     "role": m.get("role"), "name": m.get("name")}
+            cached = self._get_local(key)
+            if cached not in (_MISSING, None) and any(cached.get(f) != ident[f] for f in ("clan_tag", "role")):
+                changed += 1
+            # Written through either way: the audit is the freshest source we have
+            self._set_local(key, ident)
+            fresh.append(ident)
+
+        departed = [k for k, (_, ident) in self._cache.items()
+                    if ident and ident.get("clan_tag") == clan_tag and ident["player_tag"] not in in_clan]
+        for key in departed:
+            del self._cache[key]
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._set_redis, fresh)
+        await loop.run_in_executor(None, self._delete_redis, departed)
+        if changed or departed:
+            log.info(f"🪪 Identity refresh for {clan_tag}: {changed} role/clan changes, {len(departed)} left the clan")
+        return changed + len(departed)
@@ -0,0 +1,128 @@
+"""Persistent audit job queue in Mongo.
+
+    audit_jobs {_id: "CLAN:YYYY-MM-DD", clan_tag, day, status, force,
+                subscribers: [{channel_id, user_id}], attempts, worker,
+                lease_until, snapshot_id, error}
+
+The _id is the coalescing key: every request for the same clan and day
+lands on one document, and each requester is added as a subscriber to be
+notified when it finishes. Workers in any process claim jobs atomically;
+a job whose worker died is reclaimed once its lease runs out.
+
+All methods are blocking; run them in an executor.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from utils.leases import instance_id
+
+AUDIT_JOB_TIMEOUT = int(os.getenv("AUDIT_JOB_TIMEOUT", "600"))
+AUDIT_MAX_ATTEMPTS = int(os.getenv("AUDIT_MAX_ATTEMPTS", "3"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class AuditJobQueue:
+    def __init__(self, db, worker_id=None):
+        self.jobs = db["audit_jobs"]
+        self.worker_id = worker_id or instance_id()
+
+    @staticmethod
+    def job_id(clan_tag, day):
+        return f"{clan_tag}:{day}"
+
+    def ensure_indexes(self):
+        self.jobs.create_index([("status", 1), ("created_at", 1)])
+
+    def submit(self, clan_tag, subscriber=None, force=False, now=None):
+        """Queues (or joins) today's audit for clan_tag. Returns the job
+        document; status DONE means today's report already exists (and
+        force wasn't set) so the subscriber was not added."""
+        now = now or datetime.now(timezone.utc)
+        day = now.strftime("%Y-%m-%d")
+        _id = self.job_id(clan_tag, day)
+
+        try:
+            job = self.jobs.find_one_and_update(
+                {"_id": _id},
+                {"$setOnInsert": {
+                    "clan_tag": clan_tag, "day": day, "status": QUEUED, "force": force,
+                    "subscribers": [], "attempts": 0, "created_at": now,
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Lost a concurrent upsert race; the other request created it
+            job = self.jobs.find_one({"_id": _id})
+
+        if job["status"] == FAILED or (job["status"] == DONE and force):
+            # Retry a failed day or re-run a finished one, unless someone
+            # re-queued it meanwhile
+            job = self.jobs.find_one_and_update(
+                {"_id": _id, "status": job["status"]},
+                {"$set": {"status": QUEUED, "force": force, "attempts": 0, "created_at": now},
+                 "$unset": {"error": "", "snapshot_id": ""}},
+                return_document=ReturnDocument.AFTER,
+            ) or self.jobs.find_one({"_id": _id})
+        elif job["status"] == QUEUED and force and not job.get("force"):
+            self.jobs.update_one({"_id": _id, "status": QUEUED}, {"$set": {"force": True}})
+
+        if subscriber is None or job["status"] == DONE:
+            return job
+        # Only attach while the job can still notify us
+        res = self.jobs.update_one(
+            {"_id": _id, "status": {"$in": [QUEUED, RUNNING]}},
+            {"$addToSet": {"subscribers": subscriber}}
+        )
+        if not res.matched_count:
+            return self.jobs.find_one({"_id": _id})
+        return job
+
+    def position(self, job):
+        """How many queued jobs are ahead of this one."""
+        return self.jobs.count_documents({"status": QUEUED, "created_at": {"$lt": job["created_at"]}})
+
+    def claim(self, now=None):
+        """Takes the oldest runnable job, or None."""
+        now = now or datetime.now(timezone.utc)
+        return self.jobs.find_one_and_update(
+            {"$or": [
+                {"status": QUEUED},
+                {"status": RUNNING, "lease_until": {"$lt": now}},
+            ]},
+            {"$set": {"status": RUNNING, "worker": self.worker_id, "started_at": now,
+                      "lease_until": now + timedelta(seconds=AUDIT_JOB_TIMEOUT)},
+             "$inc": {"attempts": 1}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def complete(self, job, snapshot_id):
+        """Marks the job done. Returns the subscribers to notify (empty if
+        another worker reclaimed it)."""
+        before = self.jobs.find_one_and_update(
+            {"_id": job["_id"], "worker": self.worker_id, "status": RUNNING},
+            {"$set": {"status": DONE, "snapshot_id": snapshot_id, "subscribers": [],
+                      "finished_at": datetime.now(timezone.utc)}},
+            return_document=ReturnDocument.BEFORE,
+        )
+        return before.get("subscribers", []) if before else []
+
+    def fail(self, job, error):
+        """Requeues the job, or marks it failed after AUDIT_MAX_ATTEMPTS.
+        Returns the subscribers to notify on final failure."""
+        final = job.get("attempts", 1) >= AUDIT_MAX_ATTEMPTS
+        update = {"$set": {"status": FAILED if final else QUEUED, "error": str(error)[:500]}}
+        if final:
+            update["$set"]["subscribers"] = []
+        before = self.jobs.find_one_and_update(
+            {"_id": job["_id"], "worker": self.worker_id, "status": RUNNING},
+            update,
+            return_document=ReturnDocument.BEFORE,
+        )
+        return before.get("subscribers", []) if before and final else []
@@ -0,0 +1,119 @@
+"""Player stats stored on user documents for the dashboard leaderboard.
+
+    users {_id: discord_id, player_id, name, name_lower, trophies, arena,
+           clan_tag, stats_updated_at}
+
+Audits, identity lookups and the startup prefetch write these fields from
+data they already fetched, so the dashboard never calls the API. Pages are
+read with keyset range queries on (sort field, _id) over the indexes below;
+a page costs the same whether it's the first or the thousandth.
+"""
+import os
+import base64
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from utils.codec import codec
+
+PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "50"))
+
+# sort name -> (field, direction); ties break on _id ascending
+SORTS = {
+    "trophies": ("trophies", -1),
+    "name": ("name_lower", 1),
+}
+
+PROJECTION = {"player_id": 1, "name": 1, "trophies": 1, "arena": 1, "clan_tag": 1}
+
+
+def ensure_indexes(db):
+    users = db["users"]
+    for field, direction in SORTS.values():
+        users.create_index([(field, direction), ("_id", 1)])
+        users.create_index([("clan_tag", 1), (field, direction), ("_id", 1)])
+
+
+def player_fields(data, now=None):
+    """$set fields from a /players payload."""
+    name = data.get("name") or ""
+    return {
+        "name": name,
+        "name_lower": name.lower(),
+        "trophies": int(data.get("trophies") or 0),
+        "arena": (data.get("arena") or {}).get("name"),
+        "clan_tag": ((data.get("clan") or {}).get("tag") or "").replace("#", "") or None,
+        "stats_updated_at": now or datetime.now(timezone.utc),
+    }
+
+
+def member_fields(member, clan_tag, now=None):
+    """$set fields from an audit member row."""
+    name = member.get("name") or ""
+    return {
+        "name": name,
+        "name_lower": name.lower(),
+        "trophies": int(member.get("trophies") or 0),
+        "arena": member.get("arena"),
+        "clan_tag": clan_tag,
+        "stats_updated_at": now or datetime.now(timezone.utc),
+    }
+
+
+def store(users, updates):
+    """Blocking. `updates` is {discord_id: fields}; one unordered bulk_write."""
+    if not updates:
+        return 0
+    ops = [UpdateOne({"_id": str(d)}, {"$set": fields}) for d, fields in updates.items()]
+    return users.bulk_write(ops, ordered=False).modified_count
+
+
+def encode_cursor(doc, sort):
+    field, _ = SORTS[sort]
+    return base64.urlsafe_b64encode(codec.encode([doc.get(field), doc["_id"]])).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        value, _id = codec.decode(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return value, _id
+    except Exception:
+        return None
+
+
+def load_page(users, sort="trophies", clan=None, after=None, before=None, limit=PAGE_SIZE):
+    """Blocking. One page of ranked users.
+
+    `after`/`before` are decoded cursors (value, _id) of the last/first row
+    of the neighbouring page. Returns (docs, has_prev, has_next).
+    """
+    field, direction = SORTS[sort]
+    base = {field: {"$exists": True}}
+    if clan:
+        base["clan_tag"] = clan
+
+    forward = before is None
+    cursor = after if forward else before
+    d = direction if forward else -direction
+    flt = base
+    if cursor:
+        value, _id = cursor
+        past = "$lt" if d < 0 else "$gt"
+        flt = {"$and": [base, {"$or": [
+            {field: {past: value}},
+            {field: value, "_id": {"$gt" if forward else "$lt": _id}},
+        ]}]}
+
+    docs = list(users.find(flt, PROJECTION).sort([(field, d), ("_id", 1 if forward else -1)]).limit(limit + 1))
+    more = len(docs) > limit
+    docs = docs[:limit]
+    if forward:
+        return docs, cursor is not None, more
+    docs.reverse()
+    return docs, more, True
+
+
+def unranked_count(users, clan=None):
+    """Linked users with no stats stored yet."""
+    flt = {"trophies": {"$exists": False}}
+    if clan:
+        flt["clan_tag"] = clan
+    return users.count_documents(flt)
@@ -0,0 +1,189 @@
+"""Mongo-backed leader leases with fencing tokens for scheduled jobs.
+
+    leases    {_id: name, holder, token, expires_at}
+    job_runs  {_id: "job:period", token, holder, status, done: [...]}
+
+A lease is held until `expires_at`; the holder renews it while working and
+any replica may take it over once it lapses. Every takeover increments
+`token`. Writes to job_runs are conditional on the writer's token, so a
+holder that stalled past expiry (GC pause, network partition) cannot mark
+steps or finish a run the new holder now owns.
+"""
+import os
+import uuid
+import socket
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+log = logging.getLogger("clashbot")
+
+LEASE_TTL = int(os.getenv("LEASE_TTL", "60"))
+
+
+class LeaseLost(Exception):
+    """A fenced write found that another holder has taken over."""
+
+
+def instance_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class JobRun:
+    """Handle for one claimed (job, period). `done` holds the steps a
+    previous, interrupted holder already completed."""
+
+    def __init__(self, manager, job, period, token, done):
+        self.manager = manager
+        self.job = job
+        self.period = period
+        self.token = token
+        self.done = set(done)
+        self.lost = False
+
+    async def mark(self, step):
+        """Records a finished step; raises LeaseLost if we've been fenced out."""
+        if self.lost:
+            raise LeaseLost(self.job)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.manager._mark_step, self, step)
+        self.done.add(step)
+
+
+class LeaseManager:
+    def __init__(self, db, holder=None, ttl=LEASE_TTL):
+        self.leases = db["leases"]
+        self.runs = db["job_runs"]
+        self.holder = holder or instance_id()
+        self.ttl = ttl
+        self.tokens = {}
+
+    # --- blocking primitives (run in an executor) ---
+
+    def _acquire(self, name):
+        """Acquires or renews `name`. Returns the fencing token or None."""
+        now = datetime.now(timezone.utc)
+        expires = now + timedelta(seconds=self.ttl)
+        token = self.tokens.get(name)
+        if token is not None:
+            res = self.leases.update_one(
+                {"_id": name, "holder": self.holder, "token": token},
+                {"$set": {"expires_at": expires}}
+            )
+            if res.matched_count:
+                return token
+            self.tokens.pop(name, None)
+            log.warning(f"🔒 Lost lease {name} (token {token})")
+        try:
+            doc = self.leases.find_one_and_update(
+                {"_id": name, "expires_at": {"$lt": now}},
+                {"$set": {"holder": self.holder, "expires_at": expires, "acquired_at": now}, "$inc": {"token": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Exists and hasn't expired: someone else holds it
+            return None
+        self.tokens[name] = doc["token"]
+        log.info(f"🔒 Acquired lease {name} (token {doc['token']})")
+        return doc["token"]
+
+    def _release(self, name):
+        token = self.tokens.pop(name, None)
+        if token is not None:
+            self.leases.update_one(
+                {"_id": name, "holder": self.holder, "token": token},
+                {"$set": {"expires_at": datetime.now(timezone.utc)}}
+            )
+
+    def _is_done(self, job, period):
+        return self.runs.find_one({"_id": f"{job}:{period}", "status": "done"}, {"_id": 1}) is not None
+
+    def _claim(self, job, period, token):
+        """Starts (or takes over) the run for this period. Returns the done
+        steps, or None if the period is finished or owned by a newer token."""
+        run_id = f"{job}:{period}"
+        now = datetime.now(timezone.utc)
+        try:
+            self.runs.insert_one({
+                "_id": run_id, "job": job, "period": period, "token": token, "holder": self.holder,
+                "status": "running", "started_at": now, "done": [],
+            })
+            return []
+        except DuplicateKeyError:
+            pass
+        # A previous holder died mid-run: continue it under our newer token
+        doc = self.runs.find_one_and_update(
+            {"_id": run_id, "status": "running", "token": {"$lt": token}},
+            {"$set": {"token": token, "holder": self.holder, "resumed_at": now}},
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc.get("done", []) if doc else None
+
+    def _mark_step(self, run, step):
+        res = self.runs.update_one(
+            {"_id": f"{run.job}:{run.period}", "token": run.token},
+            {"$addToSet": {"done": step}}
+        )
+        if not res.matched_count:
+            run.lost = True
+            raise LeaseLost(run.job)
+
+    def _finish(self, run):
+        res = self.runs.update_one(
+            {"_id": f"{run.job}:{run.period}", "token": run.token},
+            {"$set": {"status": "done", "finished_at": datetime.now(timezone.utc)}}
+        )
+        if not res.matched_count:
+            raise LeaseLost(run.job)
+
+    # --- async API ---
+
+    async def _renew_loop(self, run):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                token = await loop.run_in_executor(None, self._acquire, run.job)
+            except Exception:
+                log.exception(f"Lease renewal failed for {run.job}")
+                continue
+            if token != run.token:
+                run.lost = True
+                return
+
+    @asynccontextmanager
+    async def exclusive_run(self, job, period):
+        """Yields a JobRun if this process should run `job` for `period`,
+        otherwise None (already done, or another replica is on it). The
+        lease is renewed while the body runs and released afterwards; the
+        run is only marked done if the body completes while still fenced in.
+        """
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, self._is_done, job, period):
+            yield None
+            return
+        token = await loop.run_in_executor(None, self._acquire, job)
+        if token is None:
+            yield None
+            return
+
+        renew = None
+        try:
+            done = await loop.run_in_executor(None, self._claim, job, period, token)
+            if done is None:
+                yield None
+                return
+            run = JobRun(self, job, period, token, done)
+            renew = asyncio.create_task(self._renew_loop(run))
+            yield run
+            if run.lost:
+                raise LeaseLost(job)
+            await loop.run_in_executor(None, self._finish, run)
+        finally:
+            if renew:
+                renew.cancel()
+            await loop.run_in_executor(None, self._release, job)
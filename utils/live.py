@@ -0,0 +1,145 @@
+"""Live river-race feeds for the dashboard's /live pages.
+
+One poller per clan runs on the bot's event loop while anyone is watching
+and publishes the race state only when it changes. Viewers are Flask
+response threads blocked on the feed's condition variable. They always
+read the latest state and skip intermediate ones, so N viewers cost one
+upstream poll per interval and no per-viewer buffering.
+"""
+import os
+import re
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+from utils.codec import codec
+
+log = logging.getLogger("clashbot")
+
+LIVE_POLL_SECONDS = float(os.getenv("LIVE_POLL_SECONDS", "30"))
+# Keep polling this long after the last viewer leaves, so reloads don't restart it
+LIVE_IDLE_SECONDS = float(os.getenv("LIVE_IDLE_SECONDS", "60"))
+LIVE_MAX_CLANS = int(os.getenv("LIVE_MAX_CLANS", "50"))
+LIVE_MAX_VIEWERS = int(os.getenv("LIVE_MAX_VIEWERS", "500"))
+HEARTBEAT_SECONDS = 15
+
+CLAN_TAG = re.compile(r"[0-9A-Z]{3,12}")
+
+
+def race_state(data):
+    """The parts of /currentriverrace the live page shows."""
+    clan = data.get("clan") or {}
+    participants = sorted(clan.get("participants", []), key=lambda p: p.get("fame", 0), reverse=True)
+    standings = sorted(data.get("clans", []), key=lambda c: c.get("fame", 0), reverse=True)
+    return {
+        "state": data.get("state"),
+        "periodType": data.get("periodType"),
+        "clan": {
+            "name": clan.get("name"),
+            "tag": clan.get("tag"),
+            "fame": clan.get("fame", 0),
+            "repairPoints": clan.get("repairPoints", 0),
+            "periodPoints": clan.get("periodPoints", 0),
+        },
+        "participants": [
+            {"name": p.get("name"), "fame": p.get("fame", 0),
+             "decksUsed": p.get("decksUsed", 0), "decksUsedToday": p.get("decksUsedToday", 0)}
+            for p in participants
+        ],
+        "standings": [
+            {"name": c.get("name"), "tag": c.get("tag"), "fame": c.get("fame", 0), "periodPoints": c.get("periodPoints", 0)}
+            for c in standings
+        ],
+    }
+
+
+class ClanFeed:
+    def __init__(self, clan_tag):
+        self.clan_tag = clan_tag
+        self.cond = threading.Condition()
+        self.version = 0
+        self.payload = None
+        self.state = None
+        self.viewers = 0
+        self.idle_since = None
+        self.polls = 0
+
+
+class RaceFeedHub:
+    def __init__(self, bot, interval=LIVE_POLL_SECONDS):
+        self.bot = bot
+        self.interval = interval
+        self.feeds = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, clan_tag):
+        """Registers a viewer (call from a request thread). Returns the feed,
+        or None when the clan or viewer limit is reached."""
+        with self.lock:
+            feed = self.feeds.get(clan_tag)
+            if feed is None:
+                if len(self.feeds) >= LIVE_MAX_CLANS:
+                    return None
+                feed = self.feeds[clan_tag] = ClanFeed(clan_tag)
+                asyncio.run_coroutine_threadsafe(self._poll(feed), self.bot.loop)
+                log.info(f"📺 Live feed started for {clan_tag}")
+            if feed.viewers >= LIVE_MAX_VIEWERS:
+                return None
+            feed.viewers += 1
+            feed.idle_since = None
+            return feed
+
+    def unsubscribe(self, feed):
+        with self.lock:
+            feed.viewers -= 1
+            if feed.viewers <= 0:
+                feed.idle_since = time.monotonic()
+
+    def _retire_if_idle(self, feed):
+        with self.lock:
+            if feed.viewers <= 0 and feed.idle_since and time.monotonic() - feed.idle_since >= LIVE_IDLE_SECONDS:
+                self.feeds.pop(feed.clan_tag, None)
+                return True
+            return False
+
+    def _publish(self, feed, body):
+        with feed.cond:
+            feed.version += 1
+            feed.payload = codec.encode(body).decode("utf-8")
+            feed.cond.notify_all()
+
+    async def _poll(self, feed):
+        url = f"{self.bot.api_base}/clans/%23{feed.clan_tag}/currentriverrace"
+        while not self._retire_if_idle(feed):
+            try:
+                with self.bot.tracer.span("live.poll", clan=feed.clan_tag):
+                    data = await self.bot.fetch_api(url, force=True)
+                feed.polls += 1
+                if data:
+                    state = race_state(data)
+                    if state != feed.state:
+                        feed.state = state
+                        self._publish(feed, {**state, "updated": datetime.now(timezone.utc).isoformat()})
+                elif feed.version == 0:
+                    self._publish(feed, {"error": "Race data unavailable (bad tag or API down); retrying."})
+            except Exception:
+                log.exception(f"Live poll failed for {feed.clan_tag}")
+            await asyncio.sleep(self.interval)
+        log.info(f"📺 Live feed stopped for {feed.clan_tag} after {feed.polls} polls")
+
+    def stream(self, feed):
+        """SSE generator for one viewer. The caller unsubscribes when the
+        response closes (a generator that never started has no finally)."""
+        seen = 0
+        yield "retry: 5000\n\n"
+        while True:
+            with feed.cond:
+                feed.cond.wait_for(lambda: feed.version != seen, timeout=HEARTBEAT_SECONDS)
+                version, payload = feed.version, feed.payload
+            if version != seen and payload is not None:
+                seen = version
+                yield f"id: {version}\nevent: race\ndata: {payload}\n\n"
+            else:
+                # Comment line: keeps proxies from timing out and detects closed clients
+                yield ": keepalive\n\n"
@@ -0,0 +1,197 @@
+"""Batched, resumable maintenance jobs (cleanups, tag normalisation,
+schema migrations).
+
+Each job names a collection, a filter selecting the documents that still
+need work, and what to do with them:
+
+    delete    delete_many on the batch
+    update    update_many on the batch with a server-side update/pipeline
+    rewrite   a Python transform per document, sent as one bulk_write
+
+Batches are keyset-paged on _id, so a job makes progress even when a
+document can't be fixed, and a fixed document drops out of the filter. The
+last _id and counters are checkpointed in maintenance_runs after every
+batch; an interrupted run resumes from there. Dry runs page through the
+same batches and report what would change without writing.
+
+All collection access is blocking; MaintenanceRunner.run keeps it in an
+executor, one batch at a time.
+"""
+import os
+import re
+import asyncio
+import logging
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from utils import rollups
+
+log = logging.getLogger("clashbot")
+
+MAINTENANCE_BATCH = int(os.getenv("MAINTENANCE_BATCH", "1000"))
+# Pause between batches so a long job leaves Mongo headroom for commands
+MAINTENANCE_PAUSE = float(os.getenv("MAINTENANCE_PAUSE", "0.05"))
+SAMPLES = 5
+
+_NOT_TAG = "[^0-9A-Z]"
+
+
+def normalize_tag(tag):
+    """'#p2 qy8' -> 'P2QY8' (the form every collection stores)."""
+    return re.sub(_NOT_TAG, "", str(tag).upper())
+
+
+def _tag_fields(*fields):
+    def transform(doc):
+        changes = {}
+        for f in fields:
+            value = doc.get(f)
+            if isinstance(value, str):
+                fixed = normalize_tag(value)
+                if fixed and fixed != value:
+                    changes[f] = fixed
+        return changes
+    return transform
+
+
+class MaintenanceJob:
+    def __init__(self, name, collection, description, filter, kind, update=None, transform=None, projection=None):
+        self.name = name
+        self.collection = collection
+        self.description = description
+        self.filter = filter
+        self.kind = kind
+        self.update = update
+        self.transform = transform
+        self.projection = projection
+
+
+JOBS = [
+    # Listed in run order: later jobs page string _ids, so numeric ones go first
+    MaintenanceJob(
+        "users.numeric_ids", "users",
+        "Delete legacy user docs keyed by a numeric Discord id",
+        {"_id": {"$type": "number"}}, "delete",
+    ),
+    MaintenanceJob(
+        "users.tags", "users",
+        "Normalise player_id (uppercase, no # or spaces)",
+        {"player_id": {"$regex": _NOT_TAG}}, "rewrite",
+        transform=_tag_fields("player_id"), projection={"player_id": 1},
+    ),
+    MaintenanceJob(
+        "clan_history.tags", "clan_history",
+        "Normalise clan_tag on audit snapshots",
+        {"clan_tag": {"$regex": _NOT_TAG}}, "rewrite",
+        transform=_tag_fields("clan_tag"), projection={"clan_tag": 1},
+    ),
+    MaintenanceJob(
+        "player_history.tags", "player_history",
+        "Normalise player_tag / clan_tag on player history rows",
+        {"$or": [{"player_tag": {"$regex": _NOT_TAG}}, {"clan_tag": {"$regex": _NOT_TAG}}]}, "rewrite",
+        transform=_tag_fields("player_tag", "clan_tag"), projection={"player_tag": 1, "clan_tag": 1},
+    ),
+    MaintenanceJob(
+        "player_history.day_week", "player_history",
+        "Stamp day/week keys on rows written before trend rollups",
+        {"day": {"$exists": False}}, "update",
+        update=rollups.HISTORY_KEYS_PIPELINE,
+    ),
+]
+JOBS_BY_NAME = {job.name: job for job in JOBS}
+
+
+class MaintenanceRunner:
+    def __init__(self, db, batch_size=MAINTENANCE_BATCH):
+        self.db = db
+        self.runs = db["maintenance_runs"]
+        self.batch_size = batch_size
+
+    # --- blocking ---
+
+    def pending(self, job):
+        return self.db[job.collection].count_documents(job.filter)
+
+    def last_run(self, job):
+        return self.runs.find_one({"_id": job.name})
+
+    def _checkpoint(self, job, state, status):
+        self.runs.update_one(
+            {"_id": job.name},
+            {"$set": {
+                "status": status, "last_id": state["last_id"], "matched": state["matched"],
+                "changed": state["changed"], "batches": state["batches"],
+                "started_at": state["started_at"], "updated_at": datetime.now(timezone.utc),
+            }},
+            upsert=True
+        )
+
+    def _batch(self, job, last_id, dry_run, samples):
+        """Processes one batch. Returns (last _id, matched, changed)."""
+        coll = self.db[job.collection]
+        flt = job.filter if last_id is None else {"$and": [job.filter, {"_id": {"$gt": last_id}}]}
+        projection = job.projection if job.kind == "rewrite" else {"_id": 1}
+        docs = list(coll.find(flt, projection).sort("_id", 1).limit(self.batch_size))
+        if not docs:
+            return None, 0, 0
+        ids = [d["_id"] for d in docs]
+        # Re-checked at write time in case a document was fixed meanwhile
+        scoped = {"$and": [job.filter, {"_id": {"$in": ids}}]}
+
+        if job.kind == "rewrite":
+            ops = []
+            for d in docs:
+                changes = job.transform(d)
+                if changes:
+                    ops.append(UpdateOne({"_id": d["_id"]}, {"$set": changes}))
+                    if len(samples) < SAMPLES:
+                        samples.append(f"{d['_id']}: " + ", ".join(f"{k} {d.get(k)!r} → {v!r}" for k, v in changes.items()))
+            if dry_run or not ops:
+                return ids[-1], len(docs), len(ops)
+            res = coll.bulk_write(ops, ordered=False)
+            return ids[-1], len(docs), res.modified_count
+
+        if len(samples) < SAMPLES:
+            samples.extend(str(i) for i in ids[:SAMPLES - len(samples)])
+        if dry_run:
+            return ids[-1], len(docs), len(docs)
+        if job.kind == "delete":
+            return ids[-1], len(docs), coll.delete_many(scoped).deleted_count
+        return ids[-1], len(docs), coll.update_many(scoped, job.update).modified_count
+
+    # --- async ---
+
+    async def run(self, job, dry_run=False, restart=False, on_progress=None):
+        """Runs `job` to completion. `on_progress(state)` is awaited after
+        each batch. Returns the final state dict."""
+        loop = asyncio.get_running_loop()
+        state = {
+            "job": job.name, "dry_run": dry_run, "last_id": None, "matched": 0, "changed": 0,
+            "batches": 0, "samples": [], "resumed": False, "started_at": datetime.now(timezone.utc),
+        }
+        if not dry_run and not restart:
+            prev = await loop.run_in_executor(None, self.last_run, job)
+            if prev and prev.get("status") == "running":
+                state.update({k: prev.get(k, state[k]) for k in ("last_id", "matched", "changed", "batches", "started_at")})
+                state["resumed"] = True
+                log.info(f"🧰 Resuming {job.name} after _id {state['last_id']!r}")
+
+        while True:
+            last_id, matched, changed = await loop.run_in_executor(
+                None, self._batch, job, state["last_id"], dry_run, state["samples"]
+            )
+            if last_id is None:
+                break
+            state["last_id"] = last_id
+            state["matched"] += matched
+            state["changed"] += changed
+            state["batches"] += 1
+            if not dry_run:
+                await loop.run_in_executor(None, self._checkpoint, job, state, "running")
+            if on_progress:
+                await on_progress(state)
+            await asyncio.sleep(MAINTENANCE_PAUSE)
+
+        if not dry_run:
+            await loop.run_in_executor(None, self._checkpoint, job, state, "done")
+        log.info(f"🧰 {job.name}{' (dry run)' if dry_run else ''}: {state['changed']} of {state['matched']} documents changed")
+        return state
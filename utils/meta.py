@@ -0,0 +1,306 @@
+"""Card meta over every stored scout battle.
+
+MetaEngine keeps NumPy count matrices indexed by card id:
+
+    freq[b, i]      battles in trophy bracket b with card i
+    pair[i, j]      battles with both i and j (all brackets; diagonal = freq)
+    recent[b, i]    freq with exponential decay (META_HALF_LIFE_DAYS)
+    battles[b]      battles per bracket (recent_battles decayed likewise)
+
+It is folded forward one scout_history document at a time, in _id order,
+and checkpointed to meta_state, so it never rescans the collection.
+Queries read only these arrays: their cost depends on the number of
+cards (~120), not on how many battles were scouted.
+
+Replicas each catch up from the shared checkpoint and save only if theirs
+is further along. Documents younger than SETTLE_SECONDS are left for the
+next refresh, so one inserted late with a smaller _id isn't skipped.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+log = logging.getLogger("clashbot")
+
+META_HALF_LIFE_DAYS = float(os.getenv("META_HALF_LIFE_DAYS", "7"))
+SETTLE_SECONDS = 5
+# Lower edges of the trophy brackets
+BRACKETS = [0, 5000, 6000, 7000, 8000, 9000]
+# Scouts re-read the same recent battlelogs; battles seen within this window are deduped
+DEDUPE_HOURS = 72
+STATE_ID = "scout_meta"
+CAPACITY_STEP = 64
+
+WIN_CONDITIONS = {
+    "Hog Rider", "Golem", "Giant", "Royal Giant", "X-Bow", "Mortar", "Balloon",
+    "Graveyard", "Miner", "Goblin Barrel", "Lava Hound", "Electro Giant",
+    "Goblin Giant", "Ram Rider", "Battle Ram", "Elixir Golem", "Wall Breakers",
+    "Three Musketeers", "Royal Hogs", "Skeleton Barrel", "Goblin Drill",
+    "Giant Skeleton", "Sparky", "P.E.K.K.A", "Mega Knight", "Rocket",
+}
+
+
+def bracket_of(trophies):
+    return int(np.searchsorted(BRACKETS, trophies or 0, side="right")) - 1
+
+
+def bracket_label(b):
+    lo = BRACKETS[b]
+    return f"{lo}+" if b == len(BRACKETS) - 1 else f"{lo}-{BRACKETS[b + 1] - 1}"
+
+
+def _aware(ts):
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+class MetaEngine:
+    def __init__(self, bot):
+        self.bot = bot
+        self.scouts = bot.db["scout_history"]
+        self.states = bot.db["meta_state"]
+        self._lock = asyncio.Lock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        nb = len(BRACKETS)
+        self.ids = []
+        self.index = {}
+        self.names = {}
+        self.by_name = {}
+        self.freq = np.zeros((nb, CAPACITY_STEP), dtype=np.int32)
+        self.pair = np.zeros((CAPACITY_STEP, CAPACITY_STEP), dtype=np.int32)
+        self.recent = np.zeros((nb, CAPACITY_STEP), dtype=np.float64)
+        self.battles = np.zeros(nb, dtype=np.int64)
+        self.recent_battles = np.zeros(nb, dtype=np.float64)
+        self.decay_at = None
+        self.last_id = None
+        self.seen = {}
+        self.skipped = 0
+
+    # --- vocabulary ---
+
+    def _grow(self, n):
+        cap = self.pair.shape[0]
+        if n <= cap:
+            return
+        new = cap + CAPACITY_STEP * ((n - cap) // CAPACITY_STEP + 1)
+        pair = np.zeros((new, new), dtype=self.pair.dtype)
+        pair[:cap, :cap] = self.pair
+        self.pair = pair
+        self.freq = np.pad(self.freq, ((0, 0), (0, new - cap)))
+        self.recent = np.pad(self.recent, ((0, 0), (0, new - cap)))
+
+    def register(self, card_id, name=None):
+        """Row index for `card_id`, adding the card if it's new."""
+        i = self.index.get(card_id)
+        if i is None:
+            i = self.index[card_id] = len(self.ids)
+            self.ids.append(card_id)
+            self._grow(len(self.ids))
+        if name:
+            self.names[card_id] = name
+            self.by_name[name] = card_id
+        return i
+
+    def _name(self, i):
+        card_id = self.ids[i]
+        return self.names.get(card_id, str(card_id))
+
+    # --- folding ---
+
+    def _decay_to(self, ts):
+        if self.decay_at is None:
+            self.decay_at = ts
+        elif ts > self.decay_at:
+            factor = 0.5 ** ((ts - self.decay_at).total_seconds() / 86400 / META_HALF_LIFE_DAYS)
+            self.recent *= factor
+            self.recent_battles *= factor
+            self.decay_at = ts
+
+    def _battle_cards(self, battle):
+        ids = battle.get("card_ids")
+        if ids:
+            return [self.register(c, n) for c, n in zip(ids, battle.get("cards", []))]
+        # Scouts stored before card ids: only names we can map
+        idx = []
+        for name in battle.get("cards", []):
+            card_id = self.by_name.get(name)
+            if card_id is None:
+                return None
+            idx.append(self.index[card_id])
+        return idx
+
+    def apply(self, doc):
+        """Folds one scout_history document in."""
+        ts = _aware(doc.get("timestamp") or datetime.now(timezone.utc))
+        self._decay_to(ts)
+        horizon = ts - timedelta(hours=DEDUPE_HOURS)
+        for battle in doc.get("battles", []):
+            key = battle.get("key")
+            if key:
+                if key in self.seen:
+                    continue
+                self.seen[key] = ts
+            idx = self._battle_cards(battle)
+            if not idx:
+                self.skipped += 1
+                continue
+            idx = np.unique(idx)
+            b = bracket_of(battle.get("trophies"))
+            self.freq[b, idx] += 1
+            self.pair[np.ix_(idx, idx)] += 1
+            self.recent[b, idx] += 1.0
+            self.battles[b] += 1
+            self.recent_battles[b] += 1.0
+        self.seen = {k: t for k, t in self.seen.items() if t >= horizon}
+        self.last_id = doc["_id"]
+
+    # --- persistence (blocking) ---
+
+    def _state_doc(self):
+        n = len(self.ids)
+        return {
+            "ids": self.ids,
+            "names": [self.names.get(c) for c in self.ids],
+            "freq": self.freq[:, :n].tobytes(),
+            "pair": self.pair[:n, :n].tobytes(),
+            "recent": self.recent[:, :n].tobytes(),
+            "battles": self.battles.tolist(),
+            "recent_battles": self.recent_battles.tolist(),
+            "brackets": BRACKETS,
+            "decay_at": self.decay_at,
+            "last_id": self.last_id,
+            "seen": [[k, t] for k, t in self.seen.items()],
+            "skipped": self.skipped,
+            "updated_at": datetime.now(timezone.utc),
+        }
+
+    def _load_state(self):
+        doc = self.states.find_one({"_id": STATE_ID})
+        if not doc or doc.get("brackets") != BRACKETS:
+            return False
+        self._reset()
+        for card_id, name in zip(doc["ids"], doc["names"]):
+            self.register(card_id, name)
+        n, nb = len(self.ids), len(BRACKETS)
+        self.freq[:, :n] = np.frombuffer(doc["freq"], dtype=np.int32).reshape(nb, n)
+        self.pair[:n, :n] = np.frombuffer(doc["pair"], dtype=np.int32).reshape(n, n)
+        self.recent[:, :n] = np.frombuffer(doc["recent"], dtype=np.float64).reshape(nb, n)
+        self.battles[:] = doc["battles"]
+        self.recent_battles[:] = doc["recent_battles"]
+        self.decay_at = _aware(doc["decay_at"]) if doc.get("decay_at") else None
+        self.last_id = doc.get("last_id")
+        self.seen = {k: _aware(t) for k, t in doc.get("seen", [])}
+        self.skipped = doc.get("skipped", 0)
+        return True
+
+    def _save_state(self):
+        """Saves unless another replica's checkpoint is already further along."""
+        flt = {"_id": STATE_ID, "$or": [
+            {"last_id": {"$lt": self.last_id}}, {"last_id": None}, {"brackets": {"$ne": BRACKETS}},
+        ]}
+        try:
+            self.states.update_one(flt, {"$set": self._state_doc()}, upsert=True)
+        except DuplicateKeyError:
+            pass
+
+    def _catch_up(self):
+        """Folds in every settled scout doc after last_id. Returns how many."""
+        settled = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(seconds=SETTLE_SECONDS))
+        id_range = {"$lt": settled}
+        if self.last_id is not None:
+            id_range["$gt"] = self.last_id
+        applied = 0
+        for doc in self.scouts.find({"_id": id_range}).sort("_id", 1):
+            self.apply(doc)
+            applied += 1
+        return applied
+
+    # --- async ---
+
+    async def refresh(self):
+        """Brings the matrices up to date with scout_history."""
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            if not self._loaded:
+                loaded = await loop.run_in_executor(None, self._load_state)
+                self._loaded = True
+                if not loaded:
+                    await self._seed_catalog()
+            # Another replica may be ahead of us
+            newer = await loop.run_in_executor(None, self.states.find_one, {"_id": STATE_ID}, {"last_id": 1})
+            if newer and newer.get("last_id") is not None and (self.last_id is None or newer["last_id"] > self.last_id):
+                await loop.run_in_executor(None, self._load_state)
+            with self.bot.tracer.span("meta.catch_up"):
+                applied = await loop.run_in_executor(None, self._catch_up)
+            if applied:
+                await loop.run_in_executor(None, self._save_state)
+                log.info(f"🃏 Meta folded in {applied} scout report(s) ({int(self.battles.sum())} battles)")
+        return applied
+
+    async def _seed_catalog(self):
+        """Registers every card from /cards so legacy name-only scouts map to ids."""
+        data = await self.bot.fetch_api(f"{self.bot.api_base}/cards")
+        for card in (data or {}).get("items", []):
+            if card.get("id") is not None:
+                self.register(card["id"], card.get("name"))
+
+    # --- queries (O(cards²) at most; no collection access) ---
+
+    def total_battles(self, bracket=None):
+        return int(self.battles.sum() if bracket is None else self.battles[bracket])
+
+    def top_cards(self, k=10, bracket=None):
+        """[(name, usage share)]"""
+        n = len(self.ids)
+        counts = self.freq[:, :n].sum(axis=0) if bracket is None else self.freq[bracket, :n]
+        total = max(self.total_battles(bracket), 1)
+        order = np.argsort(counts)[::-1][:k]
+        return [(self._name(i), counts[i] / total) for i in order if counts[i]]
+
+    def top_pairs(self, k=10):
+        """[(name, name, battles together, share of battles)]"""
+        n = len(self.ids)
+        if n < 2:
+            return []
+        upper = np.triu(self.pair[:n, :n], k=1)
+        flat = upper.ravel()
+        k = min(k, int(np.count_nonzero(flat)))
+        if not k:
+            return []
+        top = np.argpartition(flat, -k)[-k:]
+        top = top[np.argsort(flat[top])[::-1]]
+        total = max(self.total_battles(), 1)
+        return [(self._name(i // n), self._name(i % n), int(flat[i]), flat[i] / total) for i in top]
+
+    def clusters(self, k=5, support=3):
+        """Win-condition archetypes: [(win con, usage share, [(card, P(card | win con))])]"""
+        n = len(self.ids)
+        total = max(self.total_battles(), 1)
+        out = []
+        wincons = [self.index[self.by_name[w]] for w in WIN_CONDITIONS if w in self.by_name]
+        wincons = [w for w in wincons if self.pair[w, w]]
+        wincons.sort(key=lambda w: self.pair[w, w], reverse=True)
+        for w in wincons[:k]:
+            row = self.pair[w, :n].astype(np.float64) / self.pair[w, w]
+            row[w] = 0
+            order = np.argsort(row)[::-1][:support]
+            out.append((self._name(w), self.pair[w, w] / total, [(self._name(i), row[i]) for i in order if row[i]]))
+        return out
+
+    def trending(self, bracket, k=5, min_battles=20):
+        """Cards whose recent (decayed) usage share most exceeds their
+        all-time share in `bracket`: [(name, recent share, change)]"""
+        n = len(self.ids)
+        if self.battles[bracket] < min_battles or not self.recent_battles[bracket]:
+            return []
+        recent = self.recent[bracket, :n] / self.recent_battles[bracket]
+        overall = self.freq[bracket, :n] / self.battles[bracket]
+        delta = recent - overall
+        order = np.argsort(delta)[::-1][:k]
+        return [(self._name(i), recent[i], delta[i]) for i in order if delta[i] > 0]
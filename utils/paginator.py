@@ -0,0 +1,131 @@
+import logging
+import discord
+
+log = logging.getLogger("clashbot")
+
+# Embed descriptions allow 4096 chars; smaller pages read better on mobile
+PAGE_CHARS = 1800
+PAGE_LINES = 20
+# Between description, page body and footer
+SEPARATOR = "\n\n"
+
+
+class Paginator(discord.ui.View):
+    """Shows rows as embed pages with ◀ / ▶ buttons.
+
+    `rows` may be any iterable (including a generator); it is consumed only
+    as far as the pages a user actually opens, and each page is rendered
+    once, when first shown. Nothing is truncated: rows that don't fit go to
+    the next page, and a single row longer than a page is split.
+    """
+
+    def __init__(self, title, rows, author_id=None, description="", footer="",
+                 color=0x3498db, page_chars=PAGE_CHARS, page_lines=PAGE_LINES, timeout=180):
+        super().__init__(timeout=timeout)
+        self.title = title
+        self.description = description
+        self.footer = footer
+        self.color = color
+        self.author_id = author_id
+        self.page_chars = max(100, page_chars - len(description) - len(footer) - 2 * len(SEPARATOR))
+        self.page_lines = page_lines
+        self._rows = iter(rows)
+        self._pending = None
+        self._exhausted = False
+        self._pages = []
+        self.index = 0
+        self.message = None
+
+    # --- lazy page building ---
+
+    def _next_row(self):
+        if self._pending is not None:
+            row, self._pending = self._pending, None
+            return row
+        try:
+            return str(next(self._rows))
+        except StopIteration:
+            self._exhausted = True
+            return None
+
+    def _build_page(self):
+        lines, size = [], 0
+        while len(lines) < self.page_lines:
+            row = self._next_row()
+            if row is None:
+                break
+            if len(row) > self.page_chars:
+                # Oversized row: emit what fits, carry the rest over
+                row, self._pending = row[:self.page_chars], row[self.page_chars:]
+            if lines and size + len(row) + 1 > self.page_chars:
+                self._pending = row if self._pending is None else row + self._pending
+                break
+            lines.append(row)
+            size += len(row) + 1
+        if lines:
+            self._pages.append("\n".join(lines))
+        if self._pending is None and not self._exhausted:
+            # Peek so we know whether a ▶ button is needed
+            self._pending = self._next_row()
+        return bool(lines)
+
+    def _has_page(self, index):
+        while len(self._pages) <= index and not self._exhausted:
+            if not self._build_page():
+                break
+        return index < len(self._pages)
+
+    @property
+    def known_pages(self):
+        """Total page count once all rows are consumed, else None."""
+        return len(self._pages) if self._exhausted and self._pending is None else None
+
+    # --- rendering ---
+
+    def render(self):
+        body = self._pages[self.index] if self._pages else "*(nothing to show)*"
+        text = SEPARATOR.join(part for part in (self.description.strip(), body, self.footer.strip()) if part)
+        embed = discord.Embed(title=self.title, description=text, color=self.color)
+        total = self.known_pages
+        embed.set_footer(text=f"Page {self.index + 1}" if total is None else f"Page {self.index + 1}/{max(total, 1)}")
+        self.prev_page.disabled = self.index == 0
+        # The peeked row tells us whether another page exists without building it
+        self.next_page.disabled = self.index + 1 >= len(self._pages) and self._pending is None
+        return embed
+
+    async def send(self, ctx):
+        """Replies with the first page; buttons are only attached when there
+        is more than one."""
+        self._has_page(0)
+        embed = self.render()
+        if self.next_page.disabled:
+            self.stop()
+            return await ctx.reply(embed=embed, mention_author=False)
+        self.message = await ctx.reply(embed=embed, view=self, mention_author=False)
+        return self.message
+
+    async def interaction_check(self, interaction):
+        if self.author_id is None or interaction.user.id == self.author_id:
+            return True
+        await interaction.response.send_message("❌ Only the person who ran the command can turn pages.", ephemeral=True)
+        return False
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                log.debug("Could not disable paginator buttons", exc_info=True)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def prev_page(self, interaction, button):
+        self.index = max(0, self.index - 1)
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        if self._has_page(self.index + 1):
+            self.index += 1
+        await interaction.response.edit_message(embed=self.render(), view=self)
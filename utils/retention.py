@@ -0,0 +1,339 @@
+"""Retention for the history collections and GridFS.
+
+    clan_history     archive   audit snapshots older than RETAIN_CLAN_HISTORY_DAYS
+    player_history   archive   raw per-audit rows older than RETAIN_PLAYER_HISTORY_DAYS
+                               (only after the days are in player_rollup_daily)
+    scout_history    ttl       TTL index on timestamp, RETAIN_SCOUT_DAYS
+    audit CSVs       delete    GridFS CSVs of audits older than RETAIN_AUDIT_CSV_DAYS
+    orphans          delete    GridFS files nothing references
+
+A value of 0 disables that policy. Archiving works a whole calendar month
+per clan at a time: the month's documents are written to GridFS as one
+compressed NDJSON file (storage.put_blob), recorded in `archives`, and
+only then deleted. If a run dies between the two, the next one merges the
+leftover documents into the existing archive instead of duplicating it.
+
+    archives {_id: "collection:clan:YYYY-MM", collection, clan_tag, month,
+              file_id, docs, ndjson_bytes, stored_bytes, updated_at}
+
+All functions here are blocking; run them in an executor.
+"""
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+import bson
+from utils import rollups
+from utils import storage
+from utils.codec import codec
+
+log = logging.getLogger("clashbot")
+
+RETAIN_CLAN_HISTORY_DAYS = int(os.getenv("RETAIN_CLAN_HISTORY_DAYS", "365"))
+RETAIN_PLAYER_HISTORY_DAYS = int(os.getenv("RETAIN_PLAYER_HISTORY_DAYS", "180"))
+RETAIN_SCOUT_DAYS = int(os.getenv("RETAIN_SCOUT_DAYS", "90"))
+RETAIN_AUDIT_CSV_DAYS = int(os.getenv("RETAIN_AUDIT_CSV_DAYS", "90"))
+# A file is only an orphan once it's older than this; audits put the CSV
+# before inserting the snapshot that references it
+ORPHAN_GRACE_HOURS = int(os.getenv("ORPHAN_GRACE_HOURS", "24"))
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", "500"))
+
+ARCHIVES = "archives"
+ARCHIVED = {
+    "clan_history": RETAIN_CLAN_HISTORY_DAYS,
+    "player_history": RETAIN_PLAYER_HISTORY_DAYS,
+}
+TTL = {
+    "scout_history": ("timestamp", RETAIN_SCOUT_DAYS),
+}
+
+
+def month_key(ts):
+    return ts.strftime("%Y-%m")
+
+
+def _month_start(ts):
+    return datetime(ts.year, ts.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(start):
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def _aware(ts):
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def archive_limit(days, now=None):
+    """Start of the newest month that may not be archived yet: a month is
+    archived only once all of it is older than `days`."""
+    return _month_start((now or datetime.now(timezone.utc)) - timedelta(days=days))
+
+
+# --- indexes ---
+
+def ensure_indexes(db):
+    db["clan_history"].create_index([("clan_tag", 1), ("timestamp", 1)])
+    db["clan_history"].create_index("csv_gridfs_id", sparse=True)
+    db[ARCHIVES].create_index("file_id")
+    for collection, (field, days) in TTL.items():
+        ensure_ttl(db, collection, field, days)
+
+
+def ensure_ttl(db, collection, field, days):
+    """Creates, retunes (collMod) or drops the TTL index on `field` so it
+    matches `days` (0 drops it). Returns what it did."""
+    coll = db[collection]
+    existing = next((
+        (name, info) for name, info in coll.index_information().items()
+        if info.get("key") == [(field, 1)]
+    ), None)
+    seconds = days * 86400
+    if existing is None:
+        if not days:
+            return "off"
+        coll.create_index(field, expireAfterSeconds=seconds)
+        return "created"
+    name, info = existing
+    if not days:
+        if "expireAfterSeconds" in info:
+            coll.drop_index(name)
+            return "dropped"
+        return "off"
+    if info.get("expireAfterSeconds") == seconds:
+        return "unchanged"
+    db.command("collMod", collection, index={"keyPattern": {field: 1}, "expireAfterSeconds": seconds})
+    return "updated"
+
+
+# --- archives ---
+
+def _month_filter(collection, clan_tag, start, end):
+    return {"clan_tag": clan_tag, **_before(collection, end, since=start)}
+
+
+def _before(collection, end, since=None):
+    if collection == "player_history":
+        # day keys sort as dates and are indexed with clan_tag; rows
+        # without one are stamped by !maintenance run player_history.day_week
+        rng = {"$lt": rollups.day_key(end)}
+        if since:
+            rng["$gte"] = rollups.day_key(since)
+        return {"day": rng}
+    rng = {"$lt": end}
+    if since:
+        rng["$gte"] = since
+    return {"timestamp": rng}
+
+
+def archive_candidates(db, collection, days, now=None):
+    """[(clan_tag, month start)] with documents old enough to archive."""
+    limit = archive_limit(days, now)
+    coll = db[collection]
+    out = []
+    for clan_tag in coll.distinct("clan_tag", _before(collection, limit)):
+        oldest = list(coll.find({"clan_tag": clan_tag, **_before(collection, limit)}, {"timestamp": 1})
+                      .sort("timestamp", 1).limit(1))
+        if not oldest:
+            continue
+        start = _month_start(_aware(oldest[0]["timestamp"]))
+        while start < limit:
+            out.append((clan_tag, start))
+            start = _next_month(start)
+    return out
+
+
+def _ensure_rolled_up(db, clan_tag, start, end):
+    """Raw player rows may only go once their days are in the daily rollup."""
+    flt = _month_filter("player_history", clan_tag, start, end)
+    raw_days = set(db["player_history"].distinct("day", flt))
+    rolled = set(db[rollups.PLAYER_DAILY].distinct("day", flt))
+    if raw_days - rolled:
+        log.info(f"🗄️ Rolling up {clan_tag} from {start:%Y-%m-%d} before archiving ({len(raw_days - rolled)} days missing)")
+        rollups.update_rollups(db, clan_tag, start)
+
+
+def archive_month(db, fs, collection, clan_tag, start, dry_run=False):
+    """Moves one clan-month of `collection` into a GridFS archive. Returns
+    {docs, raw_bytes, stored_bytes, csv_files, csv_bytes}."""
+    end = _next_month(start)
+    if collection == "player_history" and not dry_run:
+        _ensure_rolled_up(db, clan_tag, start, end)
+
+    coll = db[collection]
+    docs = list(coll.find(_month_filter(collection, clan_tag, start, end)).sort("_id", 1))
+    stats = {"docs": len(docs), "raw_bytes": sum(len(bson.encode(d)) for d in docs),
+             "stored_bytes": 0, "csv_files": 0, "csv_bytes": 0}
+    csv_ids = [d["csv_gridfs_id"] for d in docs if d.get("csv_gridfs_id")]
+    if csv_ids:
+        stats["csv_files"] = len(csv_ids)
+        stats["csv_bytes"] = _file_bytes(db, csv_ids)
+    if not docs:
+        return stats
+    if dry_run:
+        stats["stored_bytes"] = len(storage.compress(b"\n".join(codec.encode(d) for d in docs))[0])
+        return stats
+
+    archives = db[ARCHIVES]
+    key = f"{collection}:{clan_tag}:{month_key(start)}"
+    previous = archives.find_one({"_id": key})
+    lines = [codec.encode(d) for d in docs]
+    if previous:
+        # Leftovers of an interrupted run: fold them into the existing file
+        seen = {str(d["_id"]) for d in docs}
+        kept = [line for line in storage.get_blob(fs, previous["file_id"]).splitlines()
+                if line and codec.decode(line)["_id"] not in seen]
+        lines = kept + lines
+
+    data = b"\n".join(lines) + b"\n"
+    filename = f"archive/{collection}/{clan_tag}/{month_key(start)}.ndjson"
+    file_id = storage.put_blob(fs, data, filename, content_type="application/x-ndjson")
+    stats["stored_bytes"] = _file_bytes(db, [file_id])
+    archives.update_one({"_id": key}, {"$set": {
+        "collection": collection, "clan_tag": clan_tag, "month": month_key(start),
+        "file_id": file_id, "docs": len(lines), "ndjson_bytes": len(data),
+        "stored_bytes": stats["stored_bytes"], "updated_at": datetime.now(timezone.utc),
+    }}, upsert=True)
+    if previous:
+        fs.delete(previous["file_id"])
+
+    # Archived; now drop the originals (and their audit CSVs)
+    for file in csv_ids:
+        fs.delete(file)
+    coll.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+    return stats
+
+
+# --- GridFS ---
+
+def _file_bytes(db, file_ids):
+    return sum(f.get("length", 0) for f in db["fs.files"].find({"_id": {"$in": list(file_ids)}}, {"length": 1}))
+
+
+def expire_audit_csvs(db, fs, days, dry_run=False, now=None, since=None):
+    """Deletes GridFS CSVs of audits older than `days` (and not before
+    `since`) and unsets the reference. Returns {files, bytes}."""
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=days)
+    history = db["clan_history"]
+    flt = {"timestamp": {"$lt": cutoff}, "csv_gridfs_id": {"$exists": True}}
+    if since:
+        flt["timestamp"]["$gte"] = since
+    stats = {"files": 0, "bytes": 0}
+    last_id = None
+    while True:
+        page = flt if last_id is None else {"$and": [flt, {"_id": {"$gt": last_id}}]}
+        docs = list(history.find(page, {"csv_gridfs_id": 1}).sort("_id", 1).limit(RETENTION_BATCH))
+        if not docs:
+            return stats
+        last_id = docs[-1]["_id"]
+        ids = [d["csv_gridfs_id"] for d in docs]
+        stats["files"] += len(ids)
+        stats["bytes"] += _file_bytes(db, ids)
+        if dry_run:
+            continue
+        for file_id in ids:
+            fs.delete(file_id)
+        history.update_many({"_id": {"$in": [d["_id"] for d in docs]}}, {"$unset": {"csv_gridfs_id": ""}})
+
+
+def delete_orphans(db, fs, dry_run=False, now=None):
+    """Deletes GridFS files that no audit or archive references. Returns
+    {files, bytes}."""
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(hours=ORPHAN_GRACE_HOURS)
+    files = db["fs.files"]
+    stats = {"files": 0, "bytes": 0}
+    last_id = None
+    while True:
+        flt = {"uploadDate": {"$lt": cutoff}}
+        if last_id is not None:
+            flt["_id"] = {"$gt": last_id}
+        batch = list(files.find(flt, {"length": 1}).sort("_id", 1).limit(RETENTION_BATCH))
+        if not batch:
+            return stats
+        last_id = batch[-1]["_id"]
+        ids = [f["_id"] for f in batch]
+        used = set(db["clan_history"].distinct("csv_gridfs_id", {"csv_gridfs_id": {"$in": ids}}))
+        used.update(db[ARCHIVES].distinct("file_id", {"file_id": {"$in": ids}}))
+        for f in batch:
+            if f["_id"] in used:
+                continue
+            stats["files"] += 1
+            stats["bytes"] += f.get("length", 0)
+            if not dry_run:
+                fs.delete(f["_id"])
+
+
+# --- runs ---
+
+def run(db, fs, dry_run=False, now=None):
+    """Applies every policy once. Returns a report:
+    {archived: {collection: stats}, csvs, orphans, ttl: {collection: action}}."""
+    now = now or datetime.now(timezone.utc)
+    report = {"dry_run": dry_run, "archived": {}, "ttl": {}, "started_at": now}
+
+    for collection, days in ARCHIVED.items():
+        totals = {"months": 0, "docs": 0, "raw_bytes": 0, "stored_bytes": 0, "csv_files": 0, "csv_bytes": 0}
+        if days:
+            for clan_tag, start in archive_candidates(db, collection, days, now):
+                stats = archive_month(db, fs, collection, clan_tag, start, dry_run=dry_run)
+                if stats["docs"]:
+                    totals["months"] += 1
+                for k, v in stats.items():
+                    totals[k] += v
+        report["archived"][collection] = totals
+
+    report["csvs"] = {"files": 0, "bytes": 0}
+    if RETAIN_AUDIT_CSV_DAYS:
+        # CSVs of archived months are already counted (and gone, unless dry run)
+        since = archive_limit(RETAIN_CLAN_HISTORY_DAYS, now) if RETAIN_CLAN_HISTORY_DAYS else None
+        report["csvs"] = expire_audit_csvs(db, fs, RETAIN_AUDIT_CSV_DAYS, dry_run, now, since)
+    report["orphans"] = delete_orphans(db, fs, dry_run, now)
+
+    for collection, (field, days) in TTL.items():
+        if dry_run:
+            report["ttl"][collection] = f"{days}d" if days else "off"
+        else:
+            report["ttl"][collection] = ensure_ttl(db, collection, field, days)
+        if days:
+            cutoff = now - timedelta(days=days)
+            report["ttl"][collection] += f", {db[collection].count_documents({field: {'$lt': cutoff}})} expired docs pending"
+
+    report["reclaimed_bytes"] = (
+        sum(t["raw_bytes"] - t["stored_bytes"] + t["csv_bytes"] for t in report["archived"].values())
+        + report["csvs"]["bytes"] + report["orphans"]["bytes"]
+    )
+    report["finished_at"] = datetime.now(timezone.utc)
+    if not dry_run:
+        db["maintenance_runs"].replace_one({"_id": "retention"}, {"_id": "retention", **report}, upsert=True)
+    return report
+
+
+def last_report(db):
+    return db["maintenance_runs"].find_one({"_id": "retention"})
+
+
+def format_report(report):
+    """Discord lines for a run() report."""
+    def size(n):
+        for unit in ("B", "KiB", "MiB"):
+            if abs(n) < 1024:
+                return f"{n:.0f} {unit}"
+            n /= 1024
+        return f"{n:.1f} GiB"
+
+    lines = []
+    for collection, t in report["archived"].items():
+        days = ARCHIVED[collection]
+        if not days:
+            lines.append(f"`{collection}`: retention off")
+            continue
+        lines.append(
+            f"`{collection}` (>{days}d): {t['docs']} docs from {t['months']} clan-months, "
+            f"{size(t['raw_bytes'])} → {size(t['stored_bytes'])}"
+            + (f", {t['csv_files']} CSVs ({size(t['csv_bytes'])})" if t["csv_files"] else "")
+        )
+    lines.append(f"audit CSVs (>{RETAIN_AUDIT_CSV_DAYS}d): {report['csvs']['files']} files, {size(report['csvs']['bytes'])}")
+    lines.append(f"orphaned GridFS files: {report['orphans']['files']}, {size(report['orphans']['bytes'])}")
+    for collection, action in report["ttl"].items():
+        lines.append(f"`{collection}` TTL: {action}")
+    lines.append(f"**Space {'reclaimable' if report.get('dry_run') else 'reclaimed'}: {size(report['reclaimed_bytes'])}**")
+    return lines
@@ -0,0 +1,200 @@
+"""Pre-aggregated trend data built from player_history.
+
+After every audit, update_rollups() re-aggregates only the affected day
+and ISO week with $merge (whenMatched: replace). Re-running it is
+therefore idempotent, and !forceaudit simply overwrites the day.
+
+    player_history       raw per-audit rows (day/week stamped on insert)
+    player_rollup_daily  one row per player per day (last audit of the day)
+    player_rollup_weekly one row per player per ISO week
+    clan_rollup_daily    one row per clan per day
+    clan_rollup_weekly   one row per clan per ISO week
+
+All functions here are blocking; run them in an executor.
+"""
+from datetime import datetime, timedelta, timezone
+
+PLAYER_DAILY = "player_rollup_daily"
+PLAYER_WEEKLY = "player_rollup_weekly"
+CLAN_DAILY = "clan_rollup_daily"
+CLAN_WEEKLY = "clan_rollup_weekly"
+
+# A member counts as active on a day if they were seen within this many days
+ACTIVE_WITHIN_DAYS = 1
+
+
+def day_key(ts):
+    return ts.strftime("%Y-%m-%d")
+
+
+def week_key(ts):
+    year, week, _ = ts.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _merge(into):
+    return {"$merge": {"into": into, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+
+
+def _active(field):
+    # null sorts below numbers in BSON, so bound both sides
+    return {"$cond": [{"$and": [{"$gte": [field, 0]}, {"$lte": [field, ACTIVE_WITHIN_DAYS]}]}, 1, 0]}
+
+
+def ensure_indexes(db):
+    db["player_history"].create_index([("clan_tag", 1), ("day", 1)])
+    db["player_history"].create_index([("player_tag", 1), ("timestamp", -1)])
+    db[PLAYER_DAILY].create_index([("clan_tag", 1), ("day", 1)])
+    db[PLAYER_DAILY].create_index([("player_tag", 1), ("week", 1)])
+    db[PLAYER_WEEKLY].create_index([("player_tag", 1), ("week", -1)])
+    db[CLAN_DAILY].create_index([("clan_tag", 1), ("week", 1)])
+    db[CLAN_WEEKLY].create_index([("clan_tag", 1), ("week", -1)])
+
+
+def update_rollups(db, clan_tag, since=None):
+    """Rebuilds the rollups touched by clan_tag's audits on/after `since`
+    (a datetime; None rebuilds the clan's whole history)."""
+    day_filter = {"$gte": day_key(since)} if since else {"$exists": True}
+    week_filter = {"$gte": week_key(since)} if since else {"$exists": True}
+
+    # 1. player_history -> player_rollup_daily
+    db["player_history"].aggregate([
+        {"$match": {"clan_tag": clan_tag, "day": day_filter}},
+        {"$sort": {"timestamp": 1}},
+        {"$group": {
+            "_id": {"player": "$player_tag", "day": "$day"},
+            "week": {"$last": "$week"},
+            "name": {"$last": "$name"},
+            "discord_id": {"$last": "$discord_id"},
+            "war_decks": {"$last": "$war_decks"},
+            "expected_decks": {"$last": "$expected_decks"},
+            "deck_completion_pct": {"$last": "$deck_completion_pct"},
+            "donations": {"$last": "$donations"},
+            "fame": {"$last": "$fame"},
+            "days_since_seen": {"$last": "$days_since_seen"},
+            "timestamp": {"$last": "$timestamp"},
+        }},
+        {"$project": {
+            "_id": {"$concat": ["$_id.player", ":", "$_id.day"]},
+            "player_tag": "$_id.player",
+            "day": "$_id.day",
+            "clan_tag": {"$literal": clan_tag},
+            "week": 1, "name": 1, "discord_id": 1, "war_decks": 1, "expected_decks": 1,
+            "deck_completion_pct": 1, "donations": 1, "fame": 1, "days_since_seen": 1, "timestamp": 1,
+        }},
+        _merge(PLAYER_DAILY),
+    ])
+
+    # 2. player_rollup_daily -> clan_rollup_daily
+    db[PLAYER_DAILY].aggregate([
+        {"$match": {"clan_tag": clan_tag, "day": day_filter}},
+        {"$group": {
+            "_id": "$day",
+            "week": {"$last": "$week"},
+            "members": {"$sum": 1},
+            "active_members": {"$sum": _active("$days_since_seen")},
+            "avg_completion": {"$avg": "$deck_completion_pct"},
+            "war_decks": {"$sum": "$war_decks"},
+            "expected_decks": {"$sum": "$expected_decks"},
+            "donations": {"$sum": "$donations"},
+            "fame": {"$sum": "$fame"},
+        }},
+        {"$project": {
+            "_id": {"$concat": [clan_tag, ":", "$_id"]},
+            "clan_tag": {"$literal": clan_tag},
+            "day": "$_id",
+            "week": 1, "members": 1, "active_members": 1, "avg_completion": 1,
+            "war_decks": 1, "expected_decks": 1, "donations": 1, "fame": 1,
+        }},
+        _merge(CLAN_DAILY),
+    ])
+
+    # 3. player_rollup_daily -> player_rollup_weekly, for this clan's players.
+    # A player's week may span clans, so match on players rather than clan.
+    players = db[PLAYER_DAILY].distinct("player_tag", {"clan_tag": clan_tag, "day": day_filter})
+    if players:
+        db[PLAYER_DAILY].aggregate([
+            {"$match": {"player_tag": {"$in": players}, "week": week_filter}},
+            {"$sort": {"day": 1}},
+            {"$group": {
+                "_id": {"player": "$player_tag", "week": "$week"},
+                "name": {"$last": "$name"},
+                "clan_tag": {"$last": "$clan_tag"},
+                "days_sampled": {"$sum": 1},
+                "days_active": {"$sum": _active("$days_since_seen")},
+                "avg_completion": {"$avg": "$deck_completion_pct"},
+                # decksUsed, donations and fame are running totals within a week
+                "war_decks": {"$max": "$war_decks"},
+                "expected_decks": {"$max": "$expected_decks"},
+                "donations": {"$max": "$donations"},
+                "fame": {"$max": "$fame"},
+            }},
+            {"$project": {
+                "_id": {"$concat": ["$_id.player", ":", "$_id.week"]},
+                "player_tag": "$_id.player",
+                "week": "$_id.week",
+                "name": 1, "clan_tag": 1, "days_sampled": 1, "days_active": 1, "avg_completion": 1,
+                "war_decks": 1, "expected_decks": 1, "donations": 1, "fame": 1,
+            }},
+            _merge(PLAYER_WEEKLY),
+        ])
+
+    # 4. clan_rollup_daily -> clan_rollup_weekly
+    db[CLAN_DAILY].aggregate([
+        {"$match": {"clan_tag": clan_tag, "week": week_filter}},
+        {"$group": {
+            "_id": "$week",
+            "days_sampled": {"$sum": 1},
+            "avg_members": {"$avg": "$members"},
+            "avg_active_members": {"$avg": "$active_members"},
+            "avg_completion": {"$avg": "$avg_completion"},
+            "war_decks": {"$max": "$war_decks"},
+            "expected_decks": {"$max": "$expected_decks"},
+            "donations": {"$max": "$donations"},
+            "fame": {"$max": "$fame"},
+        }},
+        {"$project": {
+            "_id": {"$concat": [clan_tag, ":", "$_id"]},
+            "clan_tag": {"$literal": clan_tag},
+            "week": "$_id",
+            "days_sampled": 1, "avg_members": 1, "avg_active_members": 1, "avg_completion": 1,
+            "war_decks": 1, "expected_decks": 1, "donations": 1, "fame": 1,
+        }},
+        _merge(CLAN_WEEKLY),
+    ])
+
+
+# Update pipeline deriving day/week server-side from timestamp
+HISTORY_KEYS_PIPELINE = [{"$set": {
+    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+    "week": {"$dateToString": {"format": "%G-W%V", "date": "$timestamp"}},
+}}]
+
+
+def backfill_history(db):
+    """Stamps day/week on player_history rows written before rollups
+    existed. Returns the clan tags that need a full rebuild."""
+    db["player_history"].update_many({"day": {"$exists": False}}, HISTORY_KEYS_PIPELINE)
+    return db["player_history"].distinct("clan_tag")
+
+
+def load_trend(db, kind, tag, weeks=8):
+    """Weekly rollup rows, oldest first, for the last `weeks` ISO weeks."""
+    since = week_key(datetime.now(timezone.utc) - timedelta(weeks=max(1, weeks) - 1))
+    if kind == "clan":
+        coll, flt = db[CLAN_WEEKLY], {"clan_tag": tag}
+    else:
+        coll, flt = db[PLAYER_WEEKLY], {"player_tag": tag}
+    flt["week"] = {"$gte": since}
+    return list(coll.find(flt).sort("week", 1))
+
+
+def load_daily(db, kind, tag, weeks=8):
+    """Daily rollup rows, oldest first, covering the same window as load_trend."""
+    since = day_key(datetime.now(timezone.utc) - timedelta(weeks=max(1, weeks)))
+    if kind == "clan":
+        coll, flt = db[CLAN_DAILY], {"clan_tag": tag}
+    else:
+        coll, flt = db[PLAYER_DAILY], {"player_tag": tag}
+    flt["day"] = {"$gte": since}
+    return list(coll.find(flt).sort("day", 1))
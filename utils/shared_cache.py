@@ -0,0 +1,49 @@
+import time
+import logging
+
+from utils.cache_store import REDIS_PREFIX, as_bytes
+
+log = logging.getLogger("clashbot")
+
+
+class SharedCache:
+    """Redis-backed second level behind each process's api_cache.
+
+    Uses the same keys and format as CacheSnapshotStore (raw body, key TTL =
+    remaining freshness), so snapshots and cluster peers read each other's
+    entries. Blocking; call from an executor. Redis errors are logged and
+    treated as a miss so a flaky Redis never fails a command.
+    """
+
+    def __init__(self, redis_conn):
+        self.redis = redis_conn
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, url):
+        """(expires_at, raw) or None."""
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(f"{REDIS_PREFIX}{url}")
+            pipe.ttl(f"{REDIS_PREFIX}{url}")
+            value, ttl = pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            log.warning(f"Shared cache read failed: {e}")
+            return None
+        if value is None or ttl is None or ttl <= 0:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return time.time() + ttl, as_bytes(value)
+
+    def set(self, url, expires_at, raw):
+        ttl = int(expires_at - time.time())
+        if ttl <= 0:
+            return
+        try:
+            self.redis.setex(f"{REDIS_PREFIX}{url}", ttl, raw)
+        except Exception as e:
+            self.errors += 1
+            log.warning(f"Shared cache write failed: {e}")
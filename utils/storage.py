@@ -0,0 +1,156 @@
+"""Compact storage for audit snapshots.
+
+GridFS payloads are compressed (zstd when `zstandard` is installed, zlib
+otherwise) and tagged with metadata.encoding. get_blob() reverses
+whichever was used and returns files written before this unchanged.
+
+clan_history stores members column-packed under short field codes
+instead of an array of long-keyed documents:
+
+    members_packed: {"v": 1, "n": 50, "cols": {"t": [...], "r": {"d": [...], "i": [...]}, "e": {"k": 12}}}
+
+Each column is a plain list, a dictionary encoding ({"d": distinct
+values, "i": indexes}) when few values repeat, or a constant ({"k": v}).
+last_seen is kept as epoch seconds; deck_completion_pct and last_seen_ts
+are derived again on read. members_of() reads either layout.
+"""
+import os
+import zlib
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "10"))
+ZLIB_LEVEL = 9
+
+# Audit member field -> stored code
+MEMBER_FIELDS = {
+    "tag": "t",
+    "name": "n",
+    "role": "r",
+    "exp_level": "x",
+    "trophies": "tr",
+    "arena": "a",
+    "clan_rank": "cr",
+    "donations": "d",
+    "donations_received": "dr",
+    "war_decks": "w",
+    "expected_decks": "e",
+    "fame": "f",
+    "repair_points": "rp",
+    "last_seen": "ls",
+    "days_since_seen": "ds",
+}
+API_TIME_FORMAT = "%Y%m%dT%H%M%S.000Z"
+
+
+# --- GridFS ---
+
+def compress(data):
+    """bytes -> (payload, encoding)."""
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data), "zstd"
+    return zlib.compress(data, ZLIB_LEVEL), "zlib"
+
+
+def decompress(payload, encoding):
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this file")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if encoding == "zlib":
+        return zlib.decompress(payload)
+    return payload
+
+
+def put_blob(fs, data, filename, content_type="text/csv"):
+    """Blocking. Stores `data` compressed; returns the GridFS file id."""
+    payload, encoding = compress(data)
+    return fs.put(payload, filename=filename, metadata={
+        "encoding": encoding, "content_type": content_type, "raw_length": len(data),
+    })
+
+
+def get_blob(fs, file_id):
+    """Blocking. Original bytes for a put_blob (or legacy, uncompressed) file."""
+    out = fs.get(file_id)
+    encoding = (getattr(out, "metadata", None) or {}).get("encoding")
+    return decompress(out.read(), encoding)
+
+
+# --- member arrays ---
+
+def _encode_column(values):
+    first = values[0]
+    if all(v == first for v in values):
+        return {"k": first}
+    distinct = []
+    index = {}
+    for v in values:
+        if isinstance(v, (str, int)) and not isinstance(v, bool) and v not in index:
+            index[v] = len(distinct)
+            distinct.append(v)
+    if len(distinct) <= len(values) // 2 and all(isinstance(v, (str, int)) for v in values):
+        return {"d": distinct, "i": [index[v] for v in values]}
+    return list(values)
+
+
+def _decode_column(col, n):
+    if isinstance(col, list):
+        return col
+    if "k" in col:
+        return [col["k"]] * n
+    return [col["d"][i] for i in col["i"]]
+
+
+def _to_epoch(s):
+    try:
+        return int(datetime.strptime(s, API_TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp())
+    except (TypeError, ValueError):
+        return s
+
+
+def _from_epoch(v):
+    if isinstance(v, int):
+        return datetime.fromtimestamp(v, timezone.utc).strftime(API_TIME_FORMAT)
+    return v
+
+
+def pack_members(members):
+    if not members:
+        return {"v": 1, "n": 0, "cols": {}}
+    cols = {}
+    for field, code in MEMBER_FIELDS.items():
+        values = [m.get(field) for m in members]
+        if field == "last_seen":
+            values = [_to_epoch(v) for v in values]
+        cols[code] = _encode_column(values)
+    return {"v": 1, "n": len(members), "cols": cols}
+
+
+def unpack_members(packed):
+    n = packed.get("n", 0)
+    cols = {code: _decode_column(col, n) for code, col in packed.get("cols", {}).items()}
+    members = []
+    for i in range(n):
+        m = {field: cols[code][i] for field, code in MEMBER_FIELDS.items() if code in cols}
+        m["last_seen"] = _from_epoch(m.get("last_seen"))
+        expected = m.get("expected_decks") or 0
+        m["deck_completion_pct"] = round(min(1.0, (m.get("war_decks") or 0) / expected), 4) if expected > 0 else 0
+        ls = m.get("last_seen")
+        try:
+            m["last_seen_ts"] = datetime.strptime(ls, API_TIME_FORMAT).replace(tzinfo=timezone.utc) if ls else None
+        except ValueError:
+            m["last_seen_ts"] = None
+        members.append(m)
+    return members
+
+
+def members_of(doc):
+    """Audit members from a clan_history doc in either layout."""
+    if "members_packed" in doc:
+        return unpack_members(doc["members_packed"])
+    return doc.get("members", [])
@@ -0,0 +1,196 @@
+import io
+import time
+import random
+import logging
+import cProfile
+import pstats
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import yappi
+except ImportError:
+    yappi = None
+
+slow_log = logging.getLogger("clashbot.slow_commands")
+
+# The span currently open in this task (None when nothing is being traced)
+_current_span = contextvars.ContextVar("clashbot_current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "tags", "start", "end", "children", "error", "profile")
+
+    def __init__(self, name, **tags):
+        self.name = name
+        self.tags = tags
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+        self.error = None
+        self.profile = None
+
+    @property
+    def duration_ms(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def render(self, depth=0):
+        """Indented tree of this span and its children, one line per span."""
+        tags = " ".join(f"{k}={v}" for k, v in self.tags.items())
+        flag = f" ❌ {self.error}" if self.error else ""
+        lines = [f"{'  ' * depth}{self.name} {self.duration_ms:.1f}ms {tags}{flag}".rstrip()]
+        for child in self.children:
+            lines.extend(child.render(depth + 1))
+        return lines
+
+    def totals(self):
+        """Total time per span name below this one (direct + nested)."""
+        out = {}
+        stack = list(self.children)
+        while stack:
+            s = stack.pop()
+            count, ms = out.get(s.name, (0, 0.0))
+            out[s.name] = (count + 1, ms + s.duration_ms)
+            stack.extend(s.children)
+        return out
+
+
+class Tracer:
+    """Very small span tracer. One trace per command invocation, nested spans
+    for API/DB/Discord calls. Spans outside of a trace are free no-ops."""
+
+    def __init__(self, slow_threshold_ms=2000, keep=25):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.recent_slow = deque(maxlen=keep)
+        self.profiler = SampledProfiler()
+
+    def start_trace(self, name, **tags):
+        root = Span(name, **tags)
+        _current_span.set(root)
+        root.profile = self.profiler.maybe_begin()
+        return root
+
+    def finish_trace(self, root, error=None):
+        if root is None:
+            return
+        root.finish()
+        root.error = error
+        self.profiler.end(root.profile)
+        if _current_span.get() is root:
+            _current_span.set(None)
+
+        if root.duration_ms >= self.slow_threshold_ms:
+            self.recent_slow.append(root)
+            slow_log.warning("🐢 Slow command %s (%.0fms)\n%s", root.name, root.duration_ms, "\n".join(root.render()))
+
+    @contextmanager
+    def span(self, name, **tags):
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        s = Span(name, **tags)
+        parent.children.append(s)
+        token = _current_span.set(s)
+        try:
+            yield s
+        except BaseException as e:
+            s.error = type(e).__name__
+            raise
+        finally:
+            s.finish()
+            _current_span.reset(token)
+
+    def current(self):
+        return _current_span.get()
+
+
+class SampledProfiler:
+    """Toggleable profiler.
+
+    cProfile backend: profiles a random sample of command invocations
+    (only one at a time, cProfile can't nest) and merges their stats.
+    yappi backend: coroutine-aware wall clock profile of the whole process
+    while enabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.backend = None
+        self.rate = 0.0
+        self.samples = 0
+        self._active = None
+        self._stats = None
+
+    def start(self, rate=0.1, backend="cprofile"):
+        if self.enabled:
+            self.stop()
+        if backend == "yappi" and yappi is None:
+            raise RuntimeError("yappi is not installed")
+        self.enabled = True
+        self.backend = backend
+        self.rate = max(0.0, min(1.0, rate))
+        self.samples = 0
+        self._stats = None
+        if backend == "yappi":
+            yappi.clear_stats()
+            yappi.set_clock_type("wall")
+            yappi.start()
+
+    def maybe_begin(self):
+        if not self.enabled or self.backend != "cprofile" or self._active is not None:
+            return None
+        if random.random() >= self.rate:
+            return None
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) owns the hook
+            return None
+        self._active = prof
+        return prof
+
+    def end(self, prof):
+        if prof is None or prof is not self._active:
+            return
+        prof.disable()
+        self._active = None
+        self.samples += 1
+        if self._stats is None:
+            self._stats = pstats.Stats(prof)
+        else:
+            self._stats.add(prof)
+
+    def stop(self, top=15):
+        """Stops profiling and returns a text table of the top functions."""
+        if not self.enabled:
+            return None
+        self.enabled = False
+        if self._active is not None:
+            self._active.disable()
+            self._active = None
+
+        if self.backend == "yappi":
+            yappi.stop()
+            stats = yappi.get_func_stats()
+            stats.sort("ttot", "desc")
+            lines = [f"{'ttot(s)':>9} {'calls':>7}  function"]
+            for fs in list(stats)[:top]:
+                lines.append(f"{fs.ttot:9.3f} {fs.ncall:7d}  {fs.module.split('/')[-1]}:{fs.lineno}({fs.name})")
+            yappi.clear_stats()
+            return "\n".join(lines)
+
+        if self._stats is None:
+            return "No samples captured."
+        out = io.StringIO()
+        self._stats.stream = out
+        self._stats.strip_dirs().sort_stats("cumulative").print_stats(top)
+        self._stats = None
+        return out.getvalue()
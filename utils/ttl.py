@@ -0,0 +1,135 @@
+import os
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+log = logging.getLogger("clashbot")
+
+# endpoint: (base, min, max) seconds
+DEFAULT_TTLS = {
+    "players": (600, 60, 3600),
+    "battlelog": (120, 30, 900),
+    "upcomingchests": (1800, 300, 21600),
+    "clans": (120, 30, 900),
+    "currentriverrace": (60, 15, 600),
+    "riverracelog": (1800, 300, 21600),
+    "other": (300, 30, 3600),
+}
+
+# Endpoints whose content follows the river race schedule
+WAR_ENDPOINTS = {"currentriverrace", "riverracelog"}
+
+# Daily war reset (UTC) and how long before it we stop trusting cached war data
+WAR_RESET_UTC = os.getenv("WAR_RESET_UTC", "10:00")
+WAR_RESET_WINDOW = int(os.getenv("WAR_RESET_WINDOW_MIN", "30")) * 60
+
+# AIMD steps: unchanged on refetch -> grow, changed -> shrink. Settles where
+# roughly a quarter of refetches see new data.
+GROW = 1.1
+SHRINK = 0.75
+
+
+def classify(url):
+    """Endpoint type from an API URL (query string ignored)."""
+    path = url.split("?", 1)[0].rstrip("/")
+    parts = path.split("/v1/", 1)[-1].split("/")
+    if parts[0] == "players":
+        return parts[2] if len(parts) > 2 and parts[2] in ("battlelog", "upcomingchests") else "players"
+    if parts[0] == "clans":
+        return parts[2] if len(parts) > 2 and parts[2] in ("currentriverrace", "riverracelog") else "clans"
+    return "other"
+
+
+class EndpointStats:
+    __slots__ = ("hits", "misses", "stale", "fetches", "changes", "change_rate", "scale")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.fetches = 0
+        self.changes = 0
+        self.change_rate = 0.0  # EWMA of "refetch returned different data"
+        self.scale = 1.0
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses + self.stale
+        return self.hits / total if total else 0.0
+
+
+class TTLPolicy:
+    """Central cache TTLs per endpoint type.
+
+    Each endpoint starts at its base TTL and is scaled by how often a
+    refetch actually returns new data. War endpoints are additionally
+    stretched on training days, shortened close to the daily reset and
+    never cached across it.
+    """
+
+    def __init__(self, ttls=None):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.stats = defaultdict(EndpointStats)
+        self.period = None  # last periodType seen on currentriverrace
+        hour, minute = WAR_RESET_UTC.split(":")
+        self.reset_time = (int(hour), int(minute))
+
+    def seconds_until_reset(self, now=None):
+        now = now or datetime.now(timezone.utc)
+        reset = now.replace(hour=self.reset_time[0], minute=self.reset_time[1], second=0, microsecond=0)
+        if reset <= now:
+            reset += timedelta(days=1)
+        return (reset - now).total_seconds()
+
+    def period_factor(self, endpoint, now=None):
+        if endpoint not in WAR_ENDPOINTS:
+            return 1.0
+        if self.seconds_until_reset(now) <= WAR_RESET_WINDOW:
+            return 0.25
+        if self.period == "training":
+            return 4.0
+        return 1.0
+
+    def endpoint_ttl(self, endpoint, now=None):
+        base, lo, hi = self.ttls.get(endpoint, self.ttls["other"])
+        scale = self.stats[endpoint].scale if endpoint in self.stats else 1.0
+        ttl = base * scale * self.period_factor(endpoint, now)
+        ttl = min(hi, max(lo, ttl))
+        if endpoint in WAR_ENDPOINTS:
+            ttl = min(ttl, max(lo, self.seconds_until_reset(now)))
+        return int(ttl)
+
+    def ttl_for(self, url, now=None):
+        return self.endpoint_ttl(classify(url), now)
+
+    def record(self, url, outcome):
+        """outcome: 'hit', 'miss' or 'stale'."""
+        stats = self.stats[classify(url)]
+        if outcome == "hit":
+            stats.hits += 1
+        elif outcome == "stale":
+            stats.stale += 1
+        else:
+            stats.misses += 1
+
+    def observe(self, url, changed, data=None):
+        """Feeds back a network fetch. `changed` is None when there was
+        nothing cached to compare against."""
+        endpoint = classify(url)
+        stats = self.stats[endpoint]
+        stats.fetches += 1
+        if endpoint == "currentriverrace" and isinstance(data, dict) and data.get("periodType"):
+            if data["periodType"] != self.period:
+                log.info(f"⚔️ River race period is now {data['periodType']}")
+            self.period = data["periodType"]
+        if changed is None:
+            return
+        stats.changes += int(changed)
+        stats.change_rate = 0.9 * stats.change_rate + 0.1 * int(changed)
+        base, lo, hi = self.ttls.get(endpoint, self.ttls["other"])
+        # Keep the scale inside the range that can still move the clamped TTL
+        stats.scale = min(hi / base, max(lo / base, stats.scale * (SHRINK if changed else GROW)))
+
+    def report(self):
+        """Rows of (endpoint, stats, current ttl) for every endpoint seen."""
+        return [(ep, self.stats[ep], self.endpoint_ttl(ep)) for ep in self.ttls if ep in self.stats]